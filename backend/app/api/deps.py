@@ -1,11 +1,14 @@
 # Path: app/api/deps.py
+import asyncio
 import json
 import uuid
+from contextlib import aclosing
 from datetime import datetime
 from pathlib import Path  # noqa
 from sre_constants import SUCCESS
-from typing import Any, Sequence
+from typing import Any, AsyncIterator, Sequence
 
+import anyio
 from fastapi import BackgroundTasks, Depends, HTTPException, Query  # noqa
 from pydantic import UUID4
 from sqlalchemy import select
@@ -20,24 +23,36 @@ from app.core.db import (  # noqa
     get_async_session,
     session_context,
 )
+from app.core.embeddings import embedding_cache  # noqa
+from app.core.governor import governed, governor, llm_user  # noqa
 from app.core.langchain import (  # noqa
     extract_text_from_url,
     generate_cover_letter,
     generate_resume,
 )
+from app.core.metrics import llm_metrics, set_llm_labels  # noqa
+from app.core.queue import enqueue_job
+from app.core.readability import boilerplate_report  # noqa
 from app.core.security import (  # noqa
     create_user,
     fastapi_users,
     get_current_superuser,
     get_current_user,
 )
-from app.extractor.extraction_runnable import extract_entire_document  # noqa
+from app.core.web import url_cache  # noqa
+from app.extractor.cache import extraction_cache, parsed_document_cache  # noqa
+from app.extractor.extraction_runnable import (  # noqa
+    extract_entire_document,
+    stream_entire_document,
+)
 from app.extractor.parsing import (  # noqa
     MAX_FILE_SIZE_MB,
     SUPPORTED_MIMETYPES,
+    aparse_binary_input,
     parse_binary_input,
 )
 from app.extractor.retrieval import extract_from_content  # noqa
+from app.extractor.vector_index import vector_index_cache  # noqa
 from app.logging import console_log, get_async_logger
 
 log = get_async_logger(__name__)
@@ -167,10 +182,16 @@ async def create_skill(
     payload: schemas.SkillCreate,
     db: AsyncSession = Depends(get_async_session),
     user: schemas.UserRead = Depends(get_current_user),
+    commit: bool = True,
 ) -> models.Skill:
+    """Create a skill. Without commit it is only flushed, for the caller to
+    commit it together with other changes."""
     skill = models.Skill(**payload.dict(), user_id=user.id)
     db.add(skill)
-    await db.commit()
+    if commit:
+        await db.commit()
+    else:
+        await db.flush()
     await db.refresh(skill)
     await log.info(f"create_skill: {skill}")
     return skill
@@ -456,15 +477,11 @@ async def create_extractor(
     return extractor
 
 
-async def run_extractor(
+async def _get_or_create_extractor_pipeline(
     extractor: schemas.ExtractorRead,
-    payload: schemas.ExtractorRun,
     user: schemas.UserRead,
-    db: AsyncSession = Depends(get_async_session),
-) -> schemas.ExtractorResponse:
-
-    await log.info(f"Running extractor {extractor.name} with payload {payload}")
-
+    db: AsyncSession,
+) -> models.OrchestrationPipeline:
     # Check if there is an orchestration pipeline registered for this extractor
     try:
         pipeline = await get_orchestration_pipeline_by_name(
@@ -481,7 +498,10 @@ async def run_extractor(
         db.add(pipeline)
         await db.commit()
         await db.refresh(pipeline)
+    return pipeline
+
 
+async def _load_extraction_text(payload: schemas.ExtractorRun) -> str:
     # Load text to run extraction on
     text = payload.text
     if text:
@@ -489,7 +509,9 @@ async def run_extractor(
     elif payload.url:
         text = await extract_text_from_url(str(payload.url))
     elif payload.file:
-        documents = parse_binary_input(payload.file.file)  # type: ignore
+        documents = await aparse_binary_input(
+            payload.file.file, payload.file.filename  # type: ignore
+        )
         text = "\n".join([document.page_content for document in documents])
 
     if not text:
@@ -497,13 +519,39 @@ async def run_extractor(
             status_code=400,
             detail="No text to run extraction on. Provide either text, url or file.",
         )
+    return text
+
+
+def _destination_uri(destination: str) -> schemas.URI:
+    return schemas.URI(
+        name=f"{conf.settings.DEFAULT_SQLALCHEMY_DATABASE_URI}#{destination}",
+        type=schemas.URIType.DATABASE,
+    )
+
+
+def _source_name(index: int, payload: schemas.ExtractorRun) -> str:
+    if payload.url:
+        return str(payload.url)
+    if payload.file and payload.file.filename:
+        return payload.file.filename
+    return f"text[{index}]"
 
+
+async def _create_extraction_event(
+    extractor: schemas.ExtractorRead,
+    payload: schemas.ExtractorRun,
+    text: str,
+    pipeline: models.OrchestrationPipeline,
+    db: AsyncSession,
+    status: schemas.OrchestrationEventStatusType = schemas.OrchestrationEventStatusType.RUNNING,
+    destination: str = "leads",
+) -> models.OrchestrationEvent:
     # Create a new event for this extraction run
     source_uri_name = str(payload.url) or str(payload.file)
     source_uri_type = (
         schemas.URIType.URL if "http" in source_uri_name else schemas.URIType.FILE
     )
-    event = await create_orchestration_event(
+    return await create_orchestration_event(
         schemas.OrchestrationEventCreate(
             message=f"Running extractor {extractor.name} with payload {payload}",
             payload={
@@ -517,38 +565,353 @@ async def run_extractor(
             # type: ignore
             environment=conf.settings.ENVIRONMENT,
             source_uri=schemas.URI(name=source_uri_name, type=source_uri_type),
-            destination_uri=schemas.URI(
-                name=f"{conf.settings.DEFAULT_SQLALCHEMY_DATABASE_URI}#leads",
-                type=schemas.URIType.DATABASE,
-            ),
-            status=schemas.OrchestrationEventStatusType.RUNNING,
+            destination_uri=_destination_uri(destination),
+            status=status,
             pipeline_id=pipeline.id,  # type: ignore
         ),
         db=db,
     )
+
+
+async def execute_extraction(
+    extractor: schemas.ExtractorRead,
+    mode: str,
+    text: str,
+    llm: str,
+    semaphore: asyncio.Semaphore | None = None,
+    *,
+    single_entity: bool = False,
+    required_fields: Sequence[str] | None = None,
+) -> dict[str, Any]:
+    """Run an extractor over text in the given mode.
+
+    A semaphore shared by several runs bounds their chunks in flight together.
+    With single_entity, an entire document run stops at the first record with
+    every required field, see stream_entire_document.
+    """
+    if mode == "entire_document":
+        return await extract_entire_document(
+            text,
+            extractor,
+            llm,
+            semaphore,
+            single_entity=single_entity,
+            required_fields=required_fields,
+        )
+    elif mode == "retrieval":
+        if semaphore is None:
+            return await extract_from_content(text, extractor, llm)
+        async with semaphore:
+            return await extract_from_content(text, extractor, llm)
+    raise ValueError(
+        f"Invalid mode {mode}. Expected one of 'entire_document', 'retrieval'."
+    )
+
+
+async def run_extractor(
+    extractor: schemas.ExtractorRead,
+    payload: schemas.ExtractorRun,
+    user: schemas.UserRead,
+    db: AsyncSession = Depends(get_async_session),
+    single_entity: bool = False,
+    required_fields: Sequence[str] | None = None,
+) -> schemas.ExtractorResponse:
+    """
+    Run an extractor and record the run as an orchestration event.
+
+    Routes saving a single record pass single_entity, so extraction stops at
+    the first record with every required field instead of going through the
+    whole document.
+    """
+    await log.info(f"Running extractor {extractor.name} with payload {payload}")
+    llm_user.set(user.id)
+
+    pipeline = await _get_or_create_extractor_pipeline(extractor, user, db)
+    text = await _load_extraction_text(payload)
+    event = await _create_extraction_event(extractor, payload, text, pipeline, db)
+    set_llm_labels(extractor=extractor.id, event=event.id)
+
     # Run the extraction event, TODO, cleanup
     try:
         llm = payload.llm or conf.openai.COMPLETION_MODEL
-        if payload.mode == "entire_document":
-            res = await extract_entire_document(text, extractor, llm)
-        elif payload.mode == "retrieval":
-            res = await extract_from_content(text, extractor, llm)
-        else:
-            raise ValueError(
-                f"Invalid mode {payload.mode}. Expected one of 'entire_document', 'retrieval'."
-            )
+        res = await execute_extraction(
+            extractor,
+            payload.mode,
+            text,
+            llm,
+            single_entity=single_entity,
+            required_fields=required_fields,
+        )
     except Exception as e:
         await update_orchestration_event(
-            event.id, payload=schemas.OrchestrationEventUpdate(message=f"Failure to extract orchestration event: {e.with_traceback()}", status=schemas.OrchestrationEventStatusType.FAILED), db=db  # type: ignore
+            event.id, payload=schemas.OrchestrationEventUpdate(message=f"Failure to extract orchestration event: {e.with_traceback()}", status=schemas.OrchestrationEventStatusType.FAILED, metrics=llm_metrics.pop_event(event.id)), db=db  # type: ignore
         )
         raise HTTPException(status_code=500, detail=str(e))
 
     await update_orchestration_event(
-        event.id, payload=schemas.OrchestrationEventUpdate(message=f"Success! Extracted res: {res}", status=schemas.OrchestrationEventStatusType.SUCCESS), db=db  # type: ignore
+        event.id, payload=schemas.OrchestrationEventUpdate(message=f"Success! Extracted res: {res}", status=schemas.OrchestrationEventStatusType.SUCCESS, metrics=llm_metrics.pop_event(event.id)), db=db  # type: ignore
     )
     return schemas.ExtractorResponse(**res)
 
 
+async def run_extractor_batch(
+    extractor: schemas.ExtractorRead,
+    payloads: Sequence[schemas.ExtractorRun],
+    user: schemas.UserRead,
+    db: AsyncSession = Depends(get_async_session),
+    destination: str = "leads",
+) -> AsyncIterator[dict[str, Any]]:
+    """
+    Prepare a batch extraction run and return an iterator of per-source results.
+
+    Sources are loaded and extracted concurrently and their chunks are
+    scheduled through one shared pool, all under a single parent orchestration
+    event. A failing source yields a result with an error rather than failing
+    the batch. A final summary frame is yielded once every source completed.
+    The event is finalized on its own session once the sources completed, or
+    the stream was cancelled or closed because the client disconnected.
+    """
+    if not payloads:
+        raise HTTPException(
+            status_code=400,
+            detail="No sources to run extraction on. Provide urls, texts or files.",
+        )
+    if len(payloads) > conf.settings.BATCH_MAX_SOURCES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch exceeds the maximum of {conf.settings.BATCH_MAX_SOURCES} sources.",
+        )
+    await log.info(f"Running extractor {extractor.name} on {len(payloads)} sources")
+    llm_user.set(user.id)
+
+    pipeline = await _get_or_create_extractor_pipeline(extractor, user, db)
+    names = [_source_name(index, payload) for index, payload in enumerate(payloads)]
+    event = await create_orchestration_event(
+        schemas.OrchestrationEventCreate(
+            message=f"Running extractor {extractor.name} on {len(payloads)} sources",
+            payload={
+                "mode": payloads[0].mode,
+                "llm": payloads[0].llm,
+                "sources": names,
+            },
+            environment=conf.settings.ENVIRONMENT,
+            source_uri=schemas.URI(
+                name=f"batch of {len(payloads)} sources", type=schemas.URIType.API
+            ),
+            destination_uri=_destination_uri(destination),
+            status=schemas.OrchestrationEventStatusType.RUNNING,
+            pipeline_id=pipeline.id,  # type: ignore
+        ),
+        db=db,
+    )
+    chunk_slots = asyncio.Semaphore(conf.settings.MAX_CONCURRENCY)
+    source_slots = asyncio.Semaphore(conf.settings.BATCH_MAX_CONCURRENCY)
+
+    async def _finalize(message: str, status: schemas.OrchestrationEventStatusType):
+        async with session_context() as session:
+            await update_orchestration_event(
+                event.id,  # type: ignore
+                payload=schemas.OrchestrationEventUpdate(
+                    message=message,
+                    status=status,
+                    metrics=llm_metrics.pop_event(event.id),
+                ),
+                db=session,
+            )
+
+    async def _run(index: int, payload: schemas.ExtractorRun) -> dict[str, Any]:
+        frame = {"event": "result", "source": index, "name": names[index]}
+        async with source_slots:
+            try:
+                text = await _load_extraction_text(payload)
+                llm = payload.llm or conf.openai.COMPLETION_MODEL
+                res = await execute_extraction(
+                    extractor, payload.mode, text, llm, chunk_slots
+                )
+            except Exception as e:
+                console_log.warning(f"Batch source {names[index]} failed: {e}")
+                return {**frame, "data": [], "content_too_long": False, "error": str(e)}
+        return {
+            **frame,
+            "data": res["data"],
+            "content_too_long": res.get("content_too_long", False),
+            "error": None,
+        }
+
+    async def _frames() -> AsyncIterator[dict[str, Any]]:
+        llm_user.set(user.id)
+        set_llm_labels(extractor=extractor.id, event=event.id)
+        tasks = [
+            asyncio.create_task(_run(index, payload))
+            for index, payload in enumerate(payloads)
+        ]
+        failed = entities = 0
+        # Recorded unless every source completed, i.e. if the client
+        # disconnected, cancelling or closing the stream
+        message = "Batch extraction cancelled by client"
+        status = schemas.OrchestrationEventStatusType.FAILED
+        try:
+            for next_completed in asyncio.as_completed(tasks):
+                frame = await next_completed
+                failed += frame["error"] is not None
+                entities += len(frame["data"])
+                yield {**frame, "event_id": str(event.id)}
+            summary = {
+                "event": "summary",
+                "event_id": str(event.id),
+                "sources": len(payloads),
+                "failed": failed,
+                "entities": entities,
+            }
+            message = f"Batch extraction completed: {summary}"
+            if failed < len(payloads):
+                status = schemas.OrchestrationEventStatusType.SUCCESS
+        except Exception as e:
+            message = f"Batch extraction failed: {e}"
+            raise
+        finally:
+            for task in tasks:
+                task.cancel()
+            # Tear down the sources in flight and record the outcome even
+            # while the stream is being cancelled
+            with anyio.CancelScope(shield=True):
+                await asyncio.gather(*tasks, return_exceptions=True)
+                await _finalize(message, status)
+        yield summary
+
+    return _frames()
+
+
+async def enqueue_extractor(
+    extractor: schemas.ExtractorRead,
+    payload: schemas.ExtractorRun,
+    user: schemas.UserRead,
+    db: AsyncSession = Depends(get_async_session),
+    sink: str | None = None,
+) -> models.ExtractionJob:
+    """
+    Queue an extraction run for the worker and return the pending job.
+
+    Uploaded files do not outlive the request, so they are parsed up front,
+    while URLs are fetched by the worker. When a sink is given the worker saves
+    the extracted records to that table.
+    """
+    await log.info(f"Queueing extractor {extractor.name} with payload {payload}")
+
+    pipeline = await _get_or_create_extractor_pipeline(extractor, user, db)
+    if payload.url and not (payload.text or payload.file):
+        text = None
+    else:
+        text = await _load_extraction_text(payload)
+    event = await _create_extraction_event(
+        extractor,
+        payload,
+        text,  # type: ignore
+        pipeline,
+        db,
+        status=schemas.OrchestrationEventStatusType.PENDING,
+        destination=sink or "leads",
+    )
+    return await enqueue_job(
+        db,
+        extractor_id=extractor.id,
+        user_id=user.id,
+        event_id=event.id,  # type: ignore
+        mode=payload.mode,
+        llm=payload.llm or conf.openai.COMPLETION_MODEL,
+        text=text,
+        url=str(payload.url) if payload.url else None,
+        sink=sink,
+    )
+
+
+async def get_extraction_job(
+    job_id: UUID4,
+    db: AsyncSession = Depends(get_async_session),
+    user: schemas.UserRead = Depends(get_current_user),
+) -> models.ExtractionJob:
+    job = await db.get(models.ExtractionJob, job_id)
+    if not job:
+        raise await _404(job, job_id)
+    if job.user_id != user.id:  # type: ignore
+        raise await _403(user.id, job, job_id)
+    await log.info(f"get_extraction_job: {job}")
+    return job
+
+
+async def stream_extractor(
+    extractor: schemas.ExtractorRead,
+    payload: schemas.ExtractorRun,
+    user: schemas.UserRead,
+    db: AsyncSession = Depends(get_async_session),
+) -> AsyncIterator[str]:
+    """
+    Prepare an extraction run and return an iterator of newline delimited JSON frames.
+
+    The text is loaded and the orchestration event created before streaming
+    starts, so request errors are still raised as HTTP errors. The event is
+    finalized on its own session once the stream completes, fails, or is
+    cancelled or closed because the client disconnected.
+    """
+    await log.info(f"Streaming extractor {extractor.name} with payload {payload}")
+    llm_user.set(user.id)
+
+    pipeline = await _get_or_create_extractor_pipeline(extractor, user, db)
+    text = await _load_extraction_text(payload)
+    event = await _create_extraction_event(extractor, payload, text, pipeline, db)
+    set_llm_labels(extractor=extractor.id, event=event.id)
+    llm = payload.llm or conf.openai.COMPLETION_MODEL
+
+    async def _finalize(message: str, status: schemas.OrchestrationEventStatusType):
+        async with session_context() as session:
+            await update_orchestration_event(
+                event.id,  # type: ignore
+                payload=schemas.OrchestrationEventUpdate(
+                    message=message,
+                    status=status,
+                    metrics=llm_metrics.pop_event(event.id),
+                ),
+                db=session,
+            )
+
+    async def _frames() -> AsyncIterator[str]:
+        summary = None
+        # Recorded unless the stream completes or fails, i.e. if the client
+        # disconnected, cancelling or closing it
+        message = "Extraction stream cancelled by client"
+        status = schemas.OrchestrationEventStatusType.FAILED
+        try:
+            if payload.mode == "entire_document":
+                async with aclosing(
+                    stream_entire_document(text, extractor, llm)
+                ) as frames:
+                    async for frame in frames:
+                        summary = frame if frame["event"] == "summary" else summary
+                        yield json.dumps({**frame, "event_id": str(event.id)}) + "\n"
+            elif payload.mode == "retrieval":
+                res = await extract_from_content(text, extractor, llm)
+                summary = {"event": "summary", "content_too_long": False}
+                yield json.dumps(
+                    {"event": "data", "chunk": None, "data": res["data"]}
+                ) + "\n"
+                yield json.dumps({**summary, "event_id": str(event.id)}) + "\n"
+            else:
+                raise ValueError(
+                    f"Invalid mode {payload.mode}. Expected one of 'entire_document', 'retrieval'."
+                )
+            message = f"Success! Streamed extraction summary: {summary}"
+            status = schemas.OrchestrationEventStatusType.SUCCESS
+        except Exception as e:
+            message = f"Failure to extract orchestration event: {e}"
+            yield json.dumps({"event": "error", "detail": str(e)}) + "\n"
+        finally:
+            # Record the outcome even while the stream is being cancelled
+            with anyio.CancelScope(shield=True):
+                await _finalize(message, status)
+
+    return _frames()
+
+
 async def get_extractor_example(
     example_id: UUID4,
     db: AsyncSession = Depends(get_async_session),
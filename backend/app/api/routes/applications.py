@@ -12,6 +12,7 @@ from app.api.deps import (
     get_application,
     get_async_session,
     get_current_user,
+    llm_user,
     model_to_dict,
     models,
     schemas,
@@ -321,7 +322,8 @@ async def generate_cover_letter_for_application(
     template_json = json.dumps({"content": template_content})
 
     # Generate the cover letter
-    generated_content = generate_cover_letter(
+    llm_user.set(user.id)
+    generated_content = await generate_cover_letter(
         profile=user_profile_json, job=lead_json, template=template_json
     )
 
@@ -135,7 +135,12 @@ async def extract_company(
     try:
         # A bit of a hack below to convert the extractor to a read schema
         res = await run_extractor(
-            schemas.ExtractorRead(**extractor.__dict__), payload, user, db
+            schemas.ExtractorRead(**extractor.__dict__),
+            payload,
+            user,
+            db,
+            single_entity=True,
+            required_fields=["name"],
         )
     except Exception as e:
         logger.error(f"Error running extractor: {extractor}")
@@ -8,9 +8,6 @@ from aiofiles import open as aopen
 from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi.responses import FileResponse, StreamingResponse
 from pydantic import UUID4
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.styles import ParagraphStyle
-from reportlab.platypus import Paragraph, SimpleDocTemplate
 from sqlalchemy import select
 from sqlalchemy.orm import joinedload
 
@@ -27,6 +24,7 @@ from app.api.deps import (
     get_current_user,
     get_lead,
     get_orchestration_pipeline_by_name,
+    llm_user,
     model_to_dict,
     models,
     schemas,
@@ -47,6 +45,10 @@ async def download_cover_letter(
     # Fetch the cover letter by ID
     cover_letter = await get_cover_letter(cover_letter_id, db, user)
 
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.styles import ParagraphStyle
+    from reportlab.platypus import Paragraph, SimpleDocTemplate
+
     # Create a PDF buffer
     pdf_buffer = BytesIO()
     doc = SimpleDocTemplate(
@@ -139,7 +141,8 @@ async def generate_user_cover_letter(
     log.info(f"Template content: {template_json}")
 
     # Generate the cover letter
-    generated_content = generate_cover_letter(
+    llm_user.set(user.id)
+    generated_content = await generate_cover_letter(
         profile=user_profile_json, job=lead_json, template=template_json
     )
 
@@ -1,8 +1,13 @@
 # app/api/routes/extractor.py
-from typing import Sequence
+import json
+from functools import lru_cache
+from typing import Literal, Sequence
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Query, UploadFile
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import Runnable
 from pydantic import UUID4, AnyHttpUrl, Field
 from sqlalchemy import select
 from sqlalchemy.orm import joinedload, selectinload
@@ -12,14 +17,28 @@ from app.api.deps import (
     MAX_FILE_SIZE_MB,
     SUPPORTED_MIMETYPES,
     AsyncSession,
+    boilerplate_report,
     console_log,
+    embedding_cache,
+    enqueue_extractor,
+    extraction_cache,
     get_async_session,
+    get_current_superuser,
     get_current_user,
+    get_extraction_job,
     get_extractor,
     get_extractor_example,
+    governed,
+    governor,
+    llm_metrics,
     models,
+    parsed_document_cache,
     run_extractor,
+    run_extractor_batch,
     schemas,
+    stream_extractor,
+    url_cache,
+    vector_index_cache,
 )
 from app.core import conf
 
@@ -61,6 +80,40 @@ def get_configuration(
     return res  # type: ignore
 
 
+@router.get("/cache", response_model=dict)
+def get_extraction_cache_stats(
+    user: schemas.UserRead = Depends(get_current_user),
+) -> dict:
+    """Endpoint to show extraction, parsed document, URL, vector index and embedding cache statistics for this worker."""
+    return {
+        "extractions": extraction_cache.stats,
+        "documents": parsed_document_cache.stats,
+        "urls": url_cache.stats,
+        "vector_indexes": vector_index_cache.stats,
+        "embeddings": embedding_cache.stats,
+    }
+
+
+@router.get("/metrics", response_model=dict)
+def get_llm_metrics(
+    user: schemas.UserRead = Depends(get_current_superuser),
+) -> dict:
+    """Endpoint to show LLM token, cost and latency metrics for this worker, across users."""
+    return {
+        **llm_metrics.stats,
+        "governor": governor.stats,
+        "boilerplate": boilerplate_report.stats,
+    }
+
+
+@router.get("/jobs/{job_id}", response_model=schemas.ExtractionJobRead)
+async def read_extraction_job(
+    job: schemas.ExtractionJobRead = Depends(get_extraction_job),
+) -> schemas.ExtractionJobRead:
+    """Endpoint to poll the status and result of a queued extraction run."""
+    return job
+
+
 class SuggestExtractor(schemas._BaseModel):
     """A request to create an extractor from a text sample."""
 
@@ -103,10 +156,6 @@ SUGGEST_PROMPT = ChatPromptTemplate.from_messages(
     ]
 )
 
-suggestion_chain = SUGGEST_PROMPT | conf.openai.get_model().with_structured_output(
-    schema=ExtractorDefinition  # type: ignore
-).with_config({"run_name": "suggest"})
-
 UPDATE_PROMPT = ChatPromptTemplate.from_messages(
     [
         (
@@ -127,12 +176,28 @@ UPDATE_PROMPT = ChatPromptTemplate.from_messages(
     ]
 )
 
-UPDATE_CHAIN = (
-    UPDATE_PROMPT
-    | conf.openai.get_model().with_structured_output(  # noqa: W503
-        schema=ExtractorDefinition  # type: ignore
-    )
-).with_config({"run_name": "suggest_update"})
+
+# The chains are built on first use rather than at import time, so importing
+# the routes neither creates a model client nor converts the schema.
+@lru_cache(maxsize=None)
+def get_suggestion_chain() -> Runnable:
+    return SUGGEST_PROMPT | governed(
+        conf.openai.get_model().with_structured_output(
+            schema=ExtractorDefinition  # type: ignore
+        )
+    ).with_config({"run_name": "suggest"})
+
+
+@lru_cache(maxsize=None)
+def get_update_chain() -> Runnable:
+    return (
+        UPDATE_PROMPT
+        | governed(  # noqa: W503
+            conf.openai.get_model().with_structured_output(
+                schema=ExtractorDefinition  # type: ignore
+            )
+        )
+    ).with_config({"run_name": "suggest_update"})
 
 
 @router.post("/suggest", response_model=ExtractorDefinition)
@@ -141,11 +206,11 @@ async def suggest_extractor(suggest_extractor: SuggestExtractor) -> ExtractorDef
     # TODO: Have this take a bool query parameter signaling to create a new extractor
     """Suggest an extractor based on a description."""
     if suggest_extractor.json_schema:
-        res = await UPDATE_CHAIN.ainvoke(
+        res = await get_update_chain().ainvoke(
             {"input": suggest_extractor.description, "json_schema": suggest_extractor.json_schema}  # type: ignore
         )
     else:
-        res = await suggestion_chain.ainvoke({"input": suggest_extractor.description})  # type: ignore
+        res = await get_suggestion_chain().ainvoke({"input": suggest_extractor.description})  # type: ignore
 
     console_log.warning(f"Suggested extractor: {res}")
     return res
@@ -251,12 +316,90 @@ async def delete_extractor_example(
     await db.commit()
 
 
-@router.post("/{id}/run", response_model=schemas.ExtractorResponse)
+@router.post(
+    "/{id}/run",
+    response_model=schemas.ExtractorResponse,
+    responses={202: {"model": schemas.ExtractionJobRead}},
+)
 async def extractor_runner(
     extractor: schemas.ExtractorRead = Depends(get_extractor),
     payload: schemas.ExtractorRun = Depends(schemas.ExtractorRun),
+    background: bool = Query(
+        False,
+        description="Queue the run for a worker and return the job (202 Accepted).",
+    ),
     db: AsyncSession = Depends(get_async_session),
     user: schemas.UserRead = Depends(get_current_user),
-) -> schemas.ExtractorResponse:
-    """Run an extractor on a given payload"""
+) -> schemas.ExtractorResponse | JSONResponse:
+    """Run an extractor on a given payload
+
+    With ``background`` set the run is queued and the job is returned at once;
+    poll ``/extractor/jobs/{job_id}`` or the job's orchestration event for the result.
+    """
+    if background:
+        job = await enqueue_extractor(extractor, payload, user, db)
+        return JSONResponse(
+            status_code=202,
+            content=jsonable_encoder(schemas.ExtractionJobRead.from_orm(job)),
+        )
     return await run_extractor(extractor, payload, user, db)
+
+
+@router.post("/{id}/run/stream", response_class=StreamingResponse)
+async def extractor_stream_runner(
+    extractor: schemas.ExtractorRead = Depends(get_extractor),
+    payload: schemas.ExtractorRun = Depends(schemas.ExtractorRun),
+    db: AsyncSession = Depends(get_async_session),
+    user: schemas.UserRead = Depends(get_current_user),
+) -> StreamingResponse:
+    """Run an extractor, streaming newline delimited JSON frames as chunks complete.
+
+    Frames are ``data`` frames holding newly extracted (deduplicated) records,
+    followed by a ``summary`` frame, or an ``error`` frame if the run failed.
+    """
+    frames = await stream_extractor(extractor, payload, user, db)
+    return StreamingResponse(frames, media_type="application/x-ndjson")
+
+
+@router.post(
+    "/{id}/run/batch",
+    response_model=schemas.ExtractorBatchResponse,
+    responses={200: {"content": {"application/x-ndjson": {}}}},
+)
+async def extractor_batch_runner(
+    extractor: schemas.ExtractorRead = Depends(get_extractor),
+    urls: list[AnyHttpUrl] = Form([], description="URLs to extract from."),
+    texts: list[str] = Form([], description="Texts to extract from."),
+    files: list[UploadFile] = File([], description="Files to extract from."),
+    mode: Literal["entire_document", "retrieval"] = Form("entire_document"),
+    llm: str | None = Form(None),
+    stream: bool = Query(
+        False, description="Stream newline delimited JSON results as sources complete."
+    ),
+    db: AsyncSession = Depends(get_async_session),
+    user: schemas.UserRead = Depends(get_current_user),
+) -> schemas.ExtractorBatchResponse | StreamingResponse:
+    """Run an extractor over many urls, texts and files under one orchestration event.
+
+    Results are returned per source, in the order the sources were given (urls,
+    then texts, then files). With ``stream`` set a ``result`` frame is streamed
+    as each source completes, followed by a ``summary`` frame.
+    """
+    payloads = [
+        *[schemas.ExtractorRun(mode=mode, llm=llm, url=url) for url in urls],
+        *[schemas.ExtractorRun(mode=mode, llm=llm, text=text) for text in texts],
+        *[schemas.ExtractorRun(mode=mode, llm=llm, file=file) for file in files],
+    ]
+    frames = await run_extractor_batch(extractor, payloads, user, db)
+    if stream:
+        lines = (json.dumps(frame) + "\n" async for frame in frames)
+        return StreamingResponse(lines, media_type="application/x-ndjson")
+
+    results = []
+    async for frame in frames:
+        if frame["event"] == "result":
+            results.append(schemas.ExtractorBatchResult(**frame))
+        else:
+            event_id = frame["event_id"]
+    results.sort(key=lambda result: result.source)
+    return schemas.ExtractorBatchResponse(event_id=event_id, results=results)
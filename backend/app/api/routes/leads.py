@@ -213,9 +213,14 @@ async def extract_lead(
         llm=None,
     )
 
-    # Run the extraction
+    # Run the extraction, stopping at the first lead with a title and URL
     result = await run_extractor(
-        schemas.ExtractorRead(**extractor.__dict__), payload, user, db
+        schemas.ExtractorRead(**extractor.__dict__),
+        payload,
+        user,
+        db,
+        single_entity=True,
+        required_fields=["title", "url"],
     )
 
     # Process and save the extracted data
@@ -9,9 +9,6 @@ from aiofiles import open as aopen
 from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
 from fastapi.responses import FileResponse, StreamingResponse
 from pydantic import UUID4
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.styles import ParagraphStyle
-from reportlab.platypus import Paragraph, SimpleDocTemplate
 from sqlalchemy import select
 
 from app.api.deps import AsyncSession, conf
@@ -46,6 +43,10 @@ async def download_resume(
     # Fetch the cover letter by ID
     resume = await get_resume(resume_id, db, user)
 
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.styles import ParagraphStyle
+    from reportlab.platypus import Paragraph, SimpleDocTemplate
+
     # Create a PDF buffer
     pdf_buffer = BytesIO()
     doc = SimpleDocTemplate(
@@ -1,9 +1,8 @@
 # app/api/routes/skills.py
 import json
-from asyncio import gather
 
 from aiofiles import open as aopen
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy import select
 
 from app.api.deps import AsyncSession, conf
@@ -13,43 +12,21 @@ from app.api.deps import (
     create_orchestration_event,
     create_orchestration_pipeline,
     create_skill,
+    enqueue_extractor,
     get_async_session,
     get_current_user,
     get_extractor_by_name,
     get_orchestration_pipeline_by_name,
     get_skill,
     models,
-    run_extractor,
     schemas,
 )
 
 router: APIRouter = APIRouter()
 
 
-async def extract_user_skills_task(
-    extractor: models.Extractor,
-    payload: schemas.ExtractorRun,
-    user: schemas.UserRead,
-    db: AsyncSession,
-) -> dict[str, str]:
-
-    resp = await run_extractor(
-        schemas.ExtractorRead(**extractor.__dict__), payload, user, db
-    )
-
-    # Collect the extracted skills asynchronously in parallel
-    await gather(
-        *[
-            create_skill(schemas.SkillCreate(**skill), db=db, user=user)
-            for skill in getattr(resp, "data", [])
-        ]
-    )
-    return {"message": "Skills extraction task completed"}
-
-
-@router.post("/extract", response_model=dict[str, str])
+@router.post("/extract", status_code=202, response_model=dict[str, str])
 async def extract_user_skills(
-    background_tasks: BackgroundTasks,
     payload: schemas.ExtractorRun = Depends(),
     user: schemas.UserRead = Depends(get_current_user),
     db: AsyncSession = Depends(get_async_session),
@@ -75,9 +52,12 @@ async def extract_user_skills(
         else:
             raise e
 
-    background_tasks.add_task(extract_user_skills_task, extractor, payload, user, db)
+    # The worker saves the extracted skills to the skills table
+    job = await enqueue_extractor(
+        schemas.ExtractorRead(**extractor.__dict__), payload, user, db, sink="skills"
+    )
 
-    return {"message": "Skills extraction task started"}
+    return {"message": "Skills extraction task started", "job_id": str(job.id)}
 
 
 @router.get("/", response_model=list[schemas.SkillRead])
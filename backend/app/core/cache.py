@@ -0,0 +1,281 @@
+# Path: app/core/cache.py
+
+"""
+File-system backed key/value cache shared by the API workers.
+
+Entries are stored one file per key so that several worker processes can share
+the same cache directory. Each file starts with a small header holding the
+creation time (used for TTL expiry) and a compression flag. The file's mtime is
+touched on every read, so eviction removes the least recently used entries.
+
+DirectoryStore holds the expiry, eviction and statistics shared with the other
+stores of entries in a directory, e.g. the vector indexes. Eviction is best
+effort, as other workers read, write and evict the same
+directory concurrently. It scans the directory only when the entries this
+process wrote since the last scan may exceed the limits, and then evicts down
+to a lower mark, so a full cache is not scanned on every write.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import struct
+import tempfile
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Iterable
+
+_HEADER = struct.Struct("!d?")
+
+# Eviction removes entries until the cache is within this fraction of its limits
+EVICTION_LOW_MARK = 0.9
+# The directory is scanned at least this often, to account for other workers
+RESCAN_SECONDS = 60
+
+
+def digest(*parts: Any) -> str:
+    """Return a stable sha256 hex digest for a sequence of JSON serializable parts."""
+    hasher = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, bytes):
+            hasher.update(part)
+        else:
+            hasher.update(json.dumps(part, sort_keys=True, default=str).encode())
+        hasher.update(b"\x00")
+    return hasher.hexdigest()
+
+
+class DirectoryStore:
+    """
+    Base of the size and TTL bounded stores persisted to a directory, one file
+    or directory per entry, evicting the least recently used entries.
+
+    Args:
+        directory: Directory the entries are written to, created if missing.
+        ttl_seconds: Entries older than this are treated as misses. None disables expiry.
+        max_entries: Maximum number of entries kept on disk. None disables the limit.
+        max_bytes: Maximum total size of the entries on disk. None disables the limit.
+    """
+
+    def __init__(
+        self,
+        directory: str | Path,
+        *,
+        ttl_seconds: float | None = None,
+        max_entries: int | None = None,
+        max_bytes: int | None = None,
+    ):
+        self.directory = Path(directory)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Entries and bytes on disk as of the last scan, plus those written since
+        self._estimate: tuple[int, int] | None = None
+        self._scanned_at = 0.0
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key
+
+    def _is_expired(self, created_at: float) -> bool:
+        return (
+            self.ttl_seconds is not None and time.time() - created_at > self.ttl_seconds
+        )
+
+    @staticmethod
+    def _touch(path: Path) -> None:
+        """Mark an entry as recently used."""
+        try:
+            os.utime(path)
+        except FileNotFoundError:  # pragma: no cover - evicted concurrently
+            pass
+
+    def _is_entry(self, entry: os.DirEntry) -> bool:
+        return entry.is_file() and not entry.name.startswith(".tmp-")
+
+    def _size(self, entry: os.DirEntry) -> int:
+        """Size on disk of an entry, raising OSError if it was removed."""
+        return entry.stat().st_size
+
+    def _remove(self, path: str | Path) -> None:
+        Path(path).unlink(missing_ok=True)
+
+    def delete(self, key: str) -> None:
+        """Remove key from the store if present."""
+        self._remove(self._path(key))
+
+    def clear(self) -> None:
+        """Remove every entry from the store."""
+        for entry in self._entries():
+            self._remove(entry.path)
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        """Hit/miss counters for this process and the current size on disk."""
+        entries = self._scan()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(entries),
+            "bytes": sum(size for _, _, size in entries),
+        }
+
+    def _entries(self) -> list[os.DirEntry]:
+        try:
+            with os.scandir(self.directory) as it:
+                return [entry for entry in it if self._is_entry(entry)]
+        except FileNotFoundError:
+            return []
+
+    def _scan(self) -> list[tuple[str, float, int]]:
+        """The path, mtime and size of every entry, skipping the entries removed
+        concurrently."""
+        entries = []
+        for entry in self._entries():
+            try:
+                entries.append((entry.path, entry.stat().st_mtime, self._size(entry)))
+            except OSError:
+                continue
+        return entries
+
+    def _exceeds_limits(
+        self, entries: int, total_bytes: int, mark: float = 1.0
+    ) -> bool:
+        if self.max_entries is not None and entries > self.max_entries * mark:
+            return True
+        return self.max_bytes is not None and total_bytes > self.max_bytes * mark
+
+    def _evict(self, written_bytes: int = 0, written_entries: int = 1) -> None:
+        """Evict the least recently used entries if the store may exceed its limits,
+        after writing entries of written_bytes."""
+        if self.max_entries is None and self.max_bytes is None:
+            return
+        if self._estimate is not None:
+            entries, total_bytes = self._estimate
+            self._estimate = (entries + written_entries, total_bytes + written_bytes)
+            if (
+                not self._exceeds_limits(*self._estimate)
+                and time.monotonic() - self._scanned_at < RESCAN_SECONDS  # noqa: W503
+            ):
+                return
+
+        scanned = sorted(self._scan(), key=lambda entry: entry[1])
+        total_bytes = sum(size for _, _, size in scanned)
+        if self._exceeds_limits(len(scanned), total_bytes):
+            while scanned and self._exceeds_limits(
+                len(scanned), total_bytes, EVICTION_LOW_MARK
+            ):
+                path, _, size = scanned.pop(0)
+                total_bytes -= size
+                try:
+                    self._remove(path)
+                except OSError:  # pragma: no cover - e.g. permissions
+                    continue
+                self.evictions += 1
+        self._estimate = (len(scanned), total_bytes)
+        self._scanned_at = time.monotonic()
+
+
+class DiskCache(DirectoryStore):
+    """
+    A size and TTL bounded cache persisted to a directory.
+
+    Args:
+        directory: Directory the entries are written to, created if missing.
+        ttl_seconds: Entries older than this are treated as misses. None disables expiry.
+        max_entries: Maximum number of entries kept on disk. None disables the limit.
+        max_bytes: Maximum total size of the entries on disk. None disables the limit.
+        compress: Compress values with zlib before writing them.
+    """
+
+    def __init__(
+        self,
+        directory: str | Path,
+        *,
+        ttl_seconds: float | None = None,
+        max_entries: int | None = None,
+        max_bytes: int | None = None,
+        compress: bool = False,
+    ):
+        super().__init__(
+            directory,
+            ttl_seconds=ttl_seconds,
+            max_entries=max_entries,
+            max_bytes=max_bytes,
+        )
+        self.compress = compress
+
+    def get(self, key: str) -> bytes | None:
+        """Return the value stored under key, or None on a miss."""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                created_at, compressed = _HEADER.unpack(f.read(_HEADER.size))
+                value = f.read()
+        except (FileNotFoundError, struct.error):
+            self.misses += 1
+            return None
+
+        if self._is_expired(created_at):
+            self.delete(key)
+            self.misses += 1
+            return None
+
+        self._touch(path)
+        self.hits += 1
+        return zlib.decompress(value) if compressed else value
+
+    def set(self, key: str, value: bytes) -> None:
+        """Store value under key, evicting the least recently used entries if needed."""
+        self._evict(self._write(key, value))
+
+    def get_many(self, keys: Iterable[str]) -> dict[str, bytes]:
+        """Return the values stored under keys, leaving out the misses."""
+        values = {}
+        for key in keys:
+            value = self.get(key)
+            if value is not None:
+                values[key] = value
+        return values
+
+    def set_many(self, items: dict[str, bytes]) -> None:
+        """Store several values, evicting once after writing all of them."""
+        written = sum(self._write(key, value) for key, value in items.items())
+        self._evict(written, len(items))
+
+    def _write(self, key: str, value: bytes) -> int:
+        """Write an entry, returning its size on disk."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        compressed = self.compress
+        if compressed:
+            value = zlib.compress(value)
+        # Write to a temporary file first so readers never observe partial entries
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(_HEADER.pack(time.time(), compressed))
+                f.write(value)
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+        return _HEADER.size + len(value)
+
+    def get_json(self, key: str) -> Any | None:
+        value = self.get(key)
+        return json.loads(value) if value is not None else None
+
+    def set_json(self, key: str, value: Any) -> None:
+        self.set(key, json.dumps(value, default=str).encode())
+
+    async def aget_json(self, key: str) -> Any | None:
+        return await asyncio.to_thread(self.get_json, key)
+
+    async def aset_json(self, key: str, value: Any) -> None:
+        await asyncio.to_thread(self.set_json, key, value)
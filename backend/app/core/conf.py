@@ -1,14 +1,16 @@
 # Path: app/core/conf.py
 from os import environ, getenv
 from pathlib import Path
-from typing import Literal, Union
+from typing import TYPE_CHECKING, Literal, Union
 
-from langchain_core.language_models.chat_models import BaseChatModel
-from langchain_openai import ChatOpenAI
 from pydantic import AnyHttpUrl, AnyUrl, EmailStr, validator
 from pydantic_settings import BaseSettings
 from toml import load as toml_load
 
+if TYPE_CHECKING:  # imported lazily, the model clients are created on first use
+    from langchain_core.embeddings import Embeddings
+    from langchain_core.language_models.chat_models import BaseChatModel
+
 PROJECT_DIR = Path(__file__).parent.parent.parent
 PYPROJECT_CONTENT = toml_load(f"{PROJECT_DIR}/pyproject.toml")["project"]
 
@@ -53,6 +55,147 @@ class Settings(_BaseSettings):
     # Set to 0 or negative to disable the max chunks limit.
     MAX_CHUNKS: int = 0
 
+    # Max number of tokens of a document's chunks to process. Documents are
+    # split lazily, so the rest of a document beyond either limit is never
+    # split. Set to 0 or negative to disable the max tokens limit.
+    MAX_EXTRACTION_TOKENS: int = 0
+
+    # Chunks nearly duplicating an earlier chunk of the same document (repeated
+    # boilerplate, sections duplicated across pages) are not sent to the model.
+    # Chunks are compared by the SimHash of their word shingles, a chunk being
+    # skipped when at least CHUNK_DEDUP_SIMILARITY of the bits of its
+    # fingerprint match those of an earlier chunk. Set to 0 to disable.
+    CHUNK_DEDUP_SIMILARITY: float = 0.95
+
+    # Uploaded documents are parsed in a pool of worker processes so parsing
+    # large PDFs does not block the event loop. Each parse times out after the
+    # given number of seconds and each parser process is limited to the given
+    # address space. Set the max workers to 0 to parse in a thread instead and
+    # the memory limit to 0 or negative to disable it.
+    PARSER_MAX_WORKERS: int = 2
+    PARSER_TIMEOUT_SECONDS: int = 60
+    PARSER_MEMORY_LIMIT_MB: int = 1024
+
+    # PDFs are split into up to PARSER_MAX_WORKERS ranges of at least
+    # PARSER_PDF_MIN_PAGES_PER_RANGE pages, parsed concurrently by the parser
+    # processes. Smaller PDFs are parsed by a single process.
+    PARSER_PDF_MIN_PAGES_PER_RANGE: int = 20
+
+    # Web pages are fetched over plain HTTP, falling back to a shared headless
+    # browser when the static page has fewer than URL_MIN_STATIC_TEXT_CHARS
+    # characters of text (i.e. it is rendered with JavaScript). The browser
+    # serves at most BROWSER_MAX_PAGES pages at once and is relaunched after
+    # BROWSER_MAX_USES pages, set to 0 to never relaunch it.
+    URL_FETCH_TIMEOUT_SECONDS: int = 30
+    URL_MIN_STATIC_TEXT_CHARS: int = 500
+    BROWSER_MAX_PAGES: int = 4
+    BROWSER_MAX_USES: int = 50
+
+    # The text of fetched web pages is cached on disk with the page's ETag and
+    # Last-Modified headers, and revalidated with conditional requests. Text
+    # rendered by the browser cannot be revalidated, so it is only served from
+    # the cache for URL_RENDERED_CACHE_TTL_SECONDS, set it to 0 to not cache it.
+    # Set the max entries to 0 or negative to disable the cache.
+    URL_CACHE_TTL_SECONDS: int = 60 * 60 * 24 * 7
+    URL_CACHE_MAX_ENTRIES: int = 1024
+    URL_CACHE_MAX_MB: int = 64
+    URL_RENDERED_CACHE_TTL_SECONDS: int = 60 * 10
+
+    # The text of web pages and uploaded HTML files is reduced to their main
+    # content, dropping navigation, banners, footers and lists of similar jobs
+    # before the text is chunked. The whole text is kept when the main content
+    # found has fewer than BOILERPLATE_MIN_CONTENT_CHARS characters.
+    BOILERPLATE_STRIPPING: bool = True
+    BOILERPLATE_MIN_CONTENT_CHARS: int = 200
+
+    # Batch extraction runs accept at most BATCH_MAX_SOURCES urls, texts and
+    # files, of which BATCH_MAX_CONCURRENCY are loaded and extracted at once.
+    # The chunks of every source share one pool of MAX_CONCURRENCY slots.
+    BATCH_MAX_SOURCES: int = 500
+    BATCH_MAX_CONCURRENCY: int = 8
+
+    # Each chunk's prompt includes at most EXTRACTION_MAX_EXAMPLES of the
+    # extractor's examples, picked by similarity to the chunk, within a budget
+    # of EXTRACTION_EXAMPLES_MAX_TOKENS. Set either to 0 to disable the limit.
+    EXTRACTION_MAX_EXAMPLES: int = 5
+    EXTRACTION_EXAMPLES_MAX_TOKENS: int = 2000
+
+    # Extraction results are cached on disk, keyed on the extracted text and
+    # the extractor definition. Entries expire after the TTL and the least
+    # recently used entries are evicted beyond the max entries limit.
+    # Set the max entries to 0 or negative to disable the cache.
+    EXTRACTION_CACHE_TTL_SECONDS: int = 60 * 60 * 24 * 7
+    EXTRACTION_CACHE_MAX_ENTRIES: int = 2048
+
+    # Documents parsed from uploaded files are cached on disk (compressed),
+    # keyed on the digest of the file, so re-uploading the same file skips
+    # parsing. Set the max entries to 0 or negative to disable the cache.
+    PARSED_DOCUMENT_CACHE_TTL_SECONDS: int = 60 * 60 * 24 * 30
+    PARSED_DOCUMENT_CACHE_MAX_ENTRIES: int = 512
+
+    # Retrieval mode extracts from the RETRIEVAL_K chunks most relevant to the
+    # extractor (0 for every chunk), ranked by BM25 and embedding similarity
+    # and fused by reciprocal rank ("rrf") or by a weighted sum of normalized
+    # scores ("weighted", RETRIEVAL_LEXICAL_WEIGHT being the BM25 weight). The
+    # chunks are not embedded when each of the top BM25 chunks contains at
+    # least RETRIEVAL_MIN_LEXICAL_COVERAGE of the query terms, weighted by
+    # rarity. Set it above 1 to always rank by embeddings too.
+    RETRIEVAL_K: int = 4
+    RETRIEVAL_FUSION: Literal["rrf", "weighted"] = "rrf"
+    RETRIEVAL_LEXICAL_WEIGHT: float = 0.5
+    RETRIEVAL_MIN_LEXICAL_COVERAGE: float = 0.8
+
+    # In retrieval mode, the vector index of a document's chunks is stored on
+    # disk, keyed on the document and the chunking parameters, and memory-mapped
+    # by later runs over the same document instead of embedding it again. The
+    # least recently used indexes are evicted beyond the max entries and size.
+    # Set the max entries to 0 or negative to disable the cache.
+    VECTOR_INDEX_CACHE_TTL_SECONDS: int = 60 * 60 * 24 * 7
+    VECTOR_INDEX_CACHE_MAX_ENTRIES: int = 256
+    VECTOR_INDEX_CACHE_MAX_MB: int = 1024
+
+    # The vectors of embedded chunks are cached on disk, keyed on the model and
+    # the chunk, so boilerplate repeated across documents is embedded once.
+    # Uncached chunks are embedded in batches of EMBEDDING_BATCH_SIZE with at
+    # most EMBEDDING_MAX_CONCURRENCY requests at once. The vectors are stored
+    # in a few shard files, compacted to keep the newest vectors once they grow
+    # past EMBEDDING_CACHE_MAX_MB. Set it to 0 or negative to disable the cache.
+    EMBEDDING_CACHE_TTL_SECONDS: int = 60 * 60 * 24 * 30
+    EMBEDDING_CACHE_MAX_MB: int = 512
+    EMBEDDING_BATCH_SIZE: int = 512
+    EMBEDDING_MAX_CONCURRENCY: int = 4
+
+    # Process-wide limits on calls to the LLM provider, shared by every request
+    # handled by a worker. Calls beyond the limits are queued and served
+    # round-robin across users. Set a limit to 0 or negative to disable it.
+    LLM_MAX_IN_FLIGHT: int = 16
+    LLM_REQUESTS_PER_MINUTE: int = 0
+    LLM_TOKENS_PER_MINUTE: int = 0
+
+    # Model clients share one pooled HTTP client per worker, keeping up to
+    # LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS idle connections alive for reuse.
+    # LLM_HTTP_WARM_CONNECTIONS connections are opened in the background on
+    # startup, each waiting at most LLM_HTTP_WARM_TIMEOUT_SECONDS for the
+    # provider. Set it to 0 to connect on the first call instead.
+    LLM_HTTP_MAX_CONNECTIONS: int = 100
+    LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    LLM_HTTP_KEEPALIVE_EXPIRY_SECONDS: float = 120
+    LLM_HTTP_TIMEOUT_SECONDS: float = 120
+    LLM_HTTP_WARM_CONNECTIONS: int = 2
+    LLM_HTTP_WARM_TIMEOUT_SECONDS: float = 5
+
+    # Extraction jobs are queued in the database and executed by worker
+    # processes (python -m app.worker). Each worker runs this many jobs
+    # concurrently and polls for new jobs at the given interval. Running jobs
+    # refresh their lock every JOB_HEARTBEAT_SECONDS, and jobs whose worker
+    # died are reclaimed once their lock times out. Failed jobs are retried up
+    # to the max attempts.
+    WORKER_CONCURRENCY: int = 4
+    WORKER_POLL_INTERVAL_SECONDS: float = 1.0
+    JOB_HEARTBEAT_SECONDS: int = 60
+    JOB_LOCK_TIMEOUT_SECONDS: int = 60 * 5
+    JOB_MAX_ATTEMPTS: int = 3
+
     # POSTGRESQL DEFAULT DATABASE
     DEFAULT_DATABASE_HOSTNAME: str
     DEFAULT_DATABASE_USER: str
@@ -114,6 +257,10 @@ class Settings(_BaseSettings):
     def SEEDS_PATH(self) -> Path:
         return Path(self.PUBLIC_ASSETS_DIR) / "seeds"
 
+    @property
+    def CACHE_PATH(self) -> Path:
+        return Path(self.PUBLIC_ASSETS_DIR) / "cache"
+
 
 class OpenAI(_BaseSettings, env_prefix="OPENAI_"):
     """
@@ -126,36 +273,60 @@ class OpenAI(_BaseSettings, env_prefix="OPENAI_"):
     COMPLETION_MODEL: str = "gpt-4-0125-preview"
     DEFAULT_MODEL: str = "gpt-3.5-turbo"
 
+    # Set the backend to "fake" to serve models and embeddings in-process with
+    # deterministic outputs derived from the requested schema, for offline load
+    # testing (see app.core.fake_llm). Fake calls take FAKE_LATENCY_MS on
+    # average, normally distributed with a FAKE_LATENCY_JITTER_MS standard
+    # deviation, and a FAKE_ERROR_RATE fraction of them fail.
+    BACKEND: Literal["openai", "fake"] = "openai"
+    FAKE_LATENCY_MS: float = 0
+    FAKE_LATENCY_JITTER_MS: float = 0
+    FAKE_ERROR_RATE: float = 0
+    FAKE_SEED: int = 0
+
     @property
     def SUPPORTED_MODELS(self):
-        """Get models according to environment secrets."""
+        """Get models according to environment secrets.
+
+        The model clients themselves are created once, on first use, by the
+        model registry (see app.core.llm).
+        """
         models = {}
         if self.API_KEY:
-            models["gpt-3.5-turbo"] = {
-                "chat_model": ChatOpenAI(model="gpt-3.5-turbo", temperature=0),
-                "description": "GPT-3.5 Turbo",
-            }
+            models["gpt-3.5-turbo"] = {"description": "GPT-3.5 Turbo"}
             if getenv("DISABLE_GPT4", "").lower() != "true":
-                models["gpt-4-0125-preview"] = {
-                    "chat_model": ChatOpenAI(model="gpt-4-0125-preview", temperature=0),
-                    "description": "GPT-4 0125 Preview",
-                }
+                models["gpt-4-0125-preview"] = {"description": "GPT-4 0125 Preview"}
 
         return models
 
-    def get_model(self, name: str | None = None) -> BaseChatModel:
+    def get_embeddings(self) -> "Embeddings":
+        """Get the embeddings model."""
+        from app.core.llm import model_registry
+
+        return model_registry.get_embeddings()
+
+    def get_model(self, name: str | None = None) -> "BaseChatModel":
         """Get the model."""
-        if name is None:
-            return self.SUPPORTED_MODELS[self.COMPLETION_MODEL]["chat_model"]
-
-        else:
-            supported_model_names = list(self.SUPPORTED_MODELS.keys())
-            if name not in supported_model_names:
-                raise ValueError(
-                    f"Model {name} not found. Supported models: {supported_model_names}"
-                )
-            else:
-                return self.SUPPORTED_MODELS[name]["chat_model"]
+        from app.core.llm import model_registry
+
+        name = name or self.COMPLETION_MODEL
+        supported_model_names = list(self.SUPPORTED_MODELS.keys())
+        if name not in supported_model_names:
+            raise ValueError(
+                f"Model {name} not found. Supported models: {supported_model_names}"
+            )
+        return model_registry.get_model(name)
+
+    def get_cost(self, name: str, prompt_tokens: int, completion_tokens: int) -> float:
+        """Get the cost in USD of a call, 0 for models without a known price."""
+        PRICES = {  # in USD per million prompt and completion tokens
+            "gpt-3.5-turbo": (0.5, 1.5),
+            "gpt-4-0125-preview": (10.0, 30.0),
+        }
+        prompt_price, completion_price = PRICES.get(name, (0.0, 0.0))
+        return (
+            prompt_tokens * prompt_price + completion_tokens * completion_price
+        ) / 1_000_000
 
     def get_chunk_size(self, name: str) -> int:
         """Get the chunk size."""
@@ -195,10 +366,9 @@ def get_settings(**kwargs) -> Settings:
 
 
 def get_openai_settings(**kwargs) -> OpenAI:
-    import openai as _openai
-
+    # The clients read the key from the OPENAI_API_KEY environment variable set
+    # below, importing the openai package here would slow every startup down.
     settings = OpenAI(**kwargs)
-    _openai.api_key = settings.API_KEY
     return settings
 
 
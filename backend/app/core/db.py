@@ -5,6 +5,7 @@ from typing import AsyncGenerator
 
 from fastapi import Depends
 from fastapi_users.db import SQLAlchemyUserDatabase
+from sqlalchemy import Connection, MetaData, inspect
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.sql import text
 
@@ -27,15 +28,44 @@ async_engine = create_async_engine(sqlalchemy_database_uri, echo=False)
 async_session_maker = async_sessionmaker(bind=async_engine, expire_on_commit=False)
 
 
+def _add_missing_columns(conn: Connection, metadata: MetaData) -> None:
+    """Add the nullable columns of metadata missing from existing tables.
+
+    create_all only creates missing tables, so columns added to a model after
+    its table was created are added here.
+    """
+    inspector = inspect(conn)
+    preparer = conn.dialect.identifier_preparer
+    for table in metadata.sorted_tables:
+        if not inspector.has_table(table.name, schema=table.schema):
+            continue
+        existing = {
+            column["name"]
+            for column in inspector.get_columns(table.name, schema=table.schema)
+        }
+        for column in table.columns:
+            if column.name in existing or not column.nullable:
+                continue
+            column_type = column.type.compile(dialect=conn.dialect)
+            conn.execute(
+                text(
+                    f"ALTER TABLE {preparer.format_table(table)} "
+                    f"ADD COLUMN {preparer.format_column(column)} {column_type}"
+                )
+            )
+
+
 async def create_db_and_tables() -> None:
     """
     Asynchronously create the database and all defined tables.
 
     This function is typically used during the application startup to ensure
-    that the database schema is set up correctly.
+    that the database schema is set up correctly. Nullable columns added to
+    existing tables since they were created are added too.
     """
     async with async_engine.begin() as conn:
         await conn.run_sync(models.Base.metadata.create_all)
+        await conn.run_sync(_add_missing_columns, models.Base.metadata)
 
 
 async def drop_and_create_db_and_tables():
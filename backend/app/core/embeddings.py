@@ -0,0 +1,341 @@
+# Path: app/core/embeddings.py
+
+"""
+Cached and batched embeddings.
+
+Job postings and resumes share a lot of boilerplate, so the same chunks are
+embedded over and over. The vectors of embedded texts are cached on disk as
+float32 arrays, keyed on the embeddings model and the text. Only the texts
+missing from the cache are embedded, once each however often they repeat, in
+batches of EMBEDDING_BATCH_SIZE texts with at most EMBEDDING_MAX_CONCURRENCY
+requests in flight.
+
+A cache of one file per vector would hold hundreds of thousands of tiny files,
+so the vectors are appended to a few shard files instead, each indexed in
+memory by every worker as it reads it. A shard growing past its share of the
+size limit is compacted, keeping its newest vectors. Workers append to and
+compact the shards concurrently, so a vector may occasionally be lost, which
+only costs embedding it again.
+"""
+import asyncio
+import os
+import struct
+import tempfile
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Iterable
+
+from langchain_core.embeddings import Embeddings
+
+from app.core import conf
+from app.core.cache import EVICTION_LOW_MARK, digest
+
+# Every vector is stored after its key, creation time and number of floats
+_RECORD = struct.Struct("!32sdI")
+_FLOAT_SIZE = array("f").itemsize
+
+
+@dataclass
+class _ShardIndex:
+    inode: int | None = None
+    size: int = 0  # bytes of the shard indexed so far
+    # key -> offset, creation time and number of floats of its latest vector
+    records: dict[bytes, tuple[int, float, int]] = field(default_factory=dict)
+
+
+class VectorStore:
+    """
+    A size and TTL bounded store of float32 vectors, appended to shard files.
+
+    Args:
+        directory: Directory the shards are written to, created if missing.
+        shards: Number of shard files the vectors are spread over.
+        ttl_seconds: Vectors older than this are treated as misses. None disables expiry.
+        max_bytes: Maximum total size of the shards on disk. None disables the limit.
+    """
+
+    def __init__(
+        self,
+        directory: str | Path,
+        *,
+        shards: int = 16,
+        ttl_seconds: float | None = None,
+        max_bytes: int | None = None,
+    ):
+        self.directory = Path(directory)
+        self.shards = max(shards, 1)
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._indexes: dict[int, _ShardIndex] = {}
+
+    def _shard(self, key: str) -> int:
+        return int(key[:8], 16) % self.shards
+
+    def _shard_path(self, shard: int) -> Path:
+        return self.directory / f"{shard:02x}.f32"
+
+    def _is_expired(self, created_at: float) -> bool:
+        return (
+            self.ttl_seconds is not None and time.time() - created_at > self.ttl_seconds
+        )
+
+    def _refresh(self, shard: int) -> _ShardIndex:
+        """Index the records appended to a shard since it was last read,
+        reindexing it from the start if it was replaced by a compaction."""
+        index = self._indexes.setdefault(shard, _ShardIndex())
+        try:
+            with open(self._shard_path(shard), "rb") as file:
+                stat = os.fstat(file.fileno())
+                size = stat.st_size
+                if stat.st_ino != index.inode or size < index.size:
+                    index = self._indexes[shard] = _ShardIndex(stat.st_ino)
+                while index.size + _RECORD.size <= size:
+                    file.seek(index.size)
+                    key, created_at, count = _RECORD.unpack(file.read(_RECORD.size))
+                    end = index.size + _RECORD.size + count * _FLOAT_SIZE
+                    if end > size:  # still being appended
+                        break
+                    index.records[key] = (index.size, created_at, count)
+                    index.size = end
+        except FileNotFoundError:
+            index = self._indexes[shard] = _ShardIndex()
+        return index
+
+    def _read(self, shard: int, keys: list[str]) -> dict[str, bytes]:
+        index = self._refresh(shard)
+        values: dict[str, bytes] = {}
+        try:
+            with open(self._shard_path(shard), "rb") as file:
+                for key in keys:
+                    raw_key = bytes.fromhex(key)
+                    record = index.records.get(raw_key)
+                    if record is None or self._is_expired(record[1]):
+                        continue
+                    offset, _, count = record
+                    file.seek(offset)
+                    header_size = _RECORD.size
+                    data = file.read(header_size + count * _FLOAT_SIZE)
+                    if data[: len(raw_key)] != raw_key:
+                        # Replaced by a compaction since indexed, reindex it
+                        index.inode = None
+                        continue
+                    values[key] = data[header_size:]
+        except FileNotFoundError:
+            pass
+        return values
+
+    def get_many(self, keys: Iterable[str]) -> dict[str, bytes]:
+        """Return the stored vectors of keys, omitting the missing ones."""
+        by_shard: dict[int, list[str]] = {}
+        for key in keys:
+            by_shard.setdefault(self._shard(key), []).append(key)
+        values: dict[str, bytes] = {}
+        for shard, shard_keys in by_shard.items():
+            found = self._read(shard, shard_keys)
+            self.hits += len(found)
+            self.misses += len(shard_keys) - len(found)
+            values.update(found)
+        return values
+
+    def set_many(self, items: dict[str, bytes]) -> None:
+        """Store the vectors of keys, as float32 bytes."""
+        if not items:
+            return
+        by_shard: dict[int, list[bytes]] = {}
+        now = time.time()
+        for key, value in items.items():
+            header = _RECORD.pack(bytes.fromhex(key), now, len(value) // _FLOAT_SIZE)
+            by_shard.setdefault(self._shard(key), []).append(header + value)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for shard, records in by_shard.items():
+            path = self._shard_path(shard)
+            # A single append, which concurrent appends do not interleave with
+            with open(path, "ab") as file:
+                file.write(b"".join(records))
+                size = file.tell()
+            if self.max_bytes is not None and size > self.max_bytes / self.shards:
+                self._compact(shard)
+
+    def _compact(self, shard: int) -> None:
+        """Rewrite a shard keeping its newest unexpired vectors, down to the low
+        mark of its share of the size limit."""
+        index = self._refresh(shard)
+        budget = (self.max_bytes or 0) / self.shards * EVICTION_LOW_MARK
+        newest = sorted(index.records.values(), key=lambda r: r[:2], reverse=True)
+        kept: list[tuple[int, int]] = []
+        total = 0
+        for offset, created_at, count in newest:
+            size = _RECORD.size + count * _FLOAT_SIZE
+            if self._is_expired(created_at) or total + size > budget:
+                break
+            kept.append((offset, size))
+            total += size
+        path = self._shard_path(shard)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        try:
+            with open(path, "rb") as source, os.fdopen(fd, "wb") as target:
+                for offset, size in sorted(kept):
+                    source.seek(offset)
+                    target.write(source.read(size))
+            os.replace(tmp, path)
+        except OSError:  # pragma: no cover - compacted concurrently
+            Path(tmp).unlink(missing_ok=True)
+            return
+        self.evictions += len(index.records) - len(kept)
+        self._indexes.pop(shard, None)
+
+    def clear(self) -> None:
+        """Remove every vector from the store."""
+        for shard in range(self.shards):
+            self._shard_path(shard).unlink(missing_ok=True)
+        self._indexes.clear()
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        """Hit/miss counters for this process and the current size on disk."""
+        indexes = [self._refresh(shard) for shard in range(self.shards)]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": sum(len(index.records) for index in indexes),
+            "bytes": sum(index.size for index in indexes),
+        }
+
+
+embedding_cache = VectorStore(
+    conf.settings.CACHE_PATH / "embeddings",
+    ttl_seconds=conf.settings.EMBEDDING_CACHE_TTL_SECONDS,
+    max_bytes=conf.settings.EMBEDDING_CACHE_MAX_MB * 1024 * 1024,
+)
+
+
+def embeddings_id(embeddings: Embeddings) -> list[Any]:
+    """Identify the embeddings model, vectors are only comparable within one."""
+    if isinstance(embeddings, CachedEmbeddings):
+        return embeddings_id(embeddings.embeddings)
+    return [
+        type(embeddings).__name__,
+        getattr(embeddings, "model", None),
+        getattr(embeddings, "dimensions", None) or getattr(embeddings, "size", None),
+    ]
+
+
+def _to_bytes(vector: list[float]) -> bytes:
+    return array("f", vector).tobytes()
+
+
+def _from_bytes(value: bytes) -> list[float]:
+    vector = array("f")
+    vector.frombytes(value)
+    return vector.tolist()
+
+
+def _by_text(
+    batches: list[list[str]], results: Iterable[list[list[float]]]
+) -> dict[str, list[float]]:
+    """Map texts to their vectors, rounded to float32 like the cached ones so a
+    text embeds the same whether it was cached or not."""
+    return {
+        text: _from_bytes(_to_bytes(vector))
+        for batch, vectors in zip(batches, results)
+        for text, vector in zip(batch, vectors)
+    }
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings caching the vectors of documents and batching the requests.
+
+    Args:
+        embeddings: The embeddings model to embed uncached texts with.
+        cache: Cache of the vectors, keyed on the model and the text. None
+            disables caching, identical texts are still only embedded once.
+        batch_size: Maximum number of texts embedded per request.
+        max_concurrency: Maximum number of requests in flight at once.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        cache: VectorStore | None = embedding_cache,
+        *,
+        batch_size: int = 512,
+        max_concurrency: int = 4,
+    ):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.batch_size = max(batch_size, 1)
+        self.max_concurrency = max(max_concurrency, 1)
+        self._model_id = embeddings_id(embeddings)
+
+    def _keys(self, texts: list[str]) -> dict[str, str]:
+        """Cache key of every distinct text."""
+        return {text: digest("embedding", self._model_id, text) for text in texts}
+
+    def _batches(self, texts: list[str]) -> list[list[str]]:
+        batches = []
+        for start in range(0, len(texts), self.batch_size):
+            end = start + self.batch_size
+            batches.append(texts[start:end])
+        return batches
+
+    def _cached(self, keys: dict[str, str]) -> dict[str, list[float]]:
+        if self.cache is None:
+            return {}
+        values = self.cache.get_many(keys.values())
+        return {
+            text: _from_bytes(values[key])
+            for text, key in keys.items()
+            if key in values
+        }
+
+    def _store(self, keys: dict[str, str], vectors: dict[str, list[float]]) -> None:
+        if self.cache is None:
+            return
+        self.cache.set_many({keys[text]: _to_bytes(v) for text, v in vectors.items()})
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        keys = self._keys(texts)
+        vectors = self._cached(keys)
+        missing = [text for text in keys if text not in vectors]
+        if missing:
+            with ThreadPoolExecutor(self.max_concurrency) as executor:
+                batches = self._batches(missing)
+                results = executor.map(self.embeddings.embed_documents, batches)
+                embedded = _by_text(batches, results)
+            self._store(keys, embedded)
+            vectors.update(embedded)
+        return [vectors[text] for text in texts]
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        keys = self._keys(texts)
+        vectors = await asyncio.to_thread(self._cached, keys)
+        missing = [text for text in keys if text not in vectors]
+        if missing:
+            slots = asyncio.Semaphore(self.max_concurrency)
+
+            async def embed(batch: list[str]) -> list[list[float]]:
+                async with slots:
+                    return await self.embeddings.aembed_documents(batch)
+
+            batches = self._batches(missing)
+            results = await asyncio.gather(*[embed(batch) for batch in batches])
+            embedded = _by_text(batches, results)
+            await asyncio.to_thread(self._store, keys, embedded)
+            vectors.update(embedded)
+        return [vectors[text] for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embeddings.embed_query(text)
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return await self.embeddings.aembed_query(text)
@@ -0,0 +1,369 @@
+# Path: app/core/fake_llm.py
+
+"""
+Deterministic stand-ins for the LLM provider, for offline load testing.
+
+With ``OPENAI_BACKEND=fake`` the chat models and embeddings are served
+in-process: tool calls are answered with values generated from the tool's JSON
+schema, other calls with a short text, and embeddings are hashed
+bags-of-words. Outputs only depend on the prompt and the seed, while latency
+and errors are drawn from the configured distributions.
+
+The same backend is served as an OpenAI compatible HTTP API, to load test
+through the real client and its connection handling:
+
+    python -m app.core.fake_llm --port 8001
+    OPENAI_API_BASE=http://localhost:8001/v1 python -m app.worker
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+import time
+import uuid
+from typing import Any, Sequence
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import PrivateAttr
+
+from app.core import conf
+
+_WORD_PATTERN = re.compile(r"\w+")
+
+
+class FakeLLMError(Exception):
+    """A simulated provider failure."""
+
+
+def _seeded_random(*parts: Any) -> random.Random:
+    data = json.dumps(parts, sort_keys=True, default=str).encode()
+    return random.Random(hashlib.sha256(data).digest())
+
+
+def _estimate_tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+
+def fake_value(
+    schema: dict[str, Any],
+    rng: random.Random,
+    key: str = "value",
+    root: dict[str, Any] | None = None,
+) -> Any:
+    """Generate a value conforming to a JSON schema."""
+    root = root or schema
+    if "$ref" in schema:
+        path = schema["$ref"].lstrip("#/").split("/")
+        target: Any = root
+        for part in path:
+            target = target[part]
+        return fake_value(target, rng, key, root)
+    if "const" in schema:
+        return schema["const"]
+    if schema.get("enum"):
+        return rng.choice(schema["enum"])
+    for combinator in ("anyOf", "oneOf", "allOf"):
+        if schema.get(combinator):
+            options = [s for s in schema[combinator] if s.get("type") != "null"]
+            return fake_value((options or schema[combinator])[0], rng, key, root)
+
+    type_ = schema.get("type", "object" if "properties" in schema else "string")
+    if isinstance(type_, list):
+        type_ = next((t for t in type_ if t != "null"), "null")
+    if type_ == "object":
+        return {
+            name: fake_value(property, rng, name, root)
+            for name, property in schema.get("properties", {}).items()
+        }
+    if type_ == "array":
+        size = rng.randint(schema.get("minItems", 1), max(schema.get("minItems", 1), 3))
+        return [
+            fake_value(schema.get("items", {}), rng, key, root) for _ in range(size)
+        ]
+    if type_ == "integer":
+        return rng.randint(schema.get("minimum", 0), schema.get("maximum", 100))
+    if type_ == "number":
+        return round(
+            rng.uniform(schema.get("minimum", 0), schema.get("maximum", 100)), 2
+        )
+    if type_ == "boolean":
+        return rng.random() < 0.5
+    if type_ == "null":
+        return None
+    if schema.get("format") == "date":
+        return (
+            f"20{rng.randint(10, 24)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+        )
+    if schema.get("format") == "email":
+        return f"{key.lower()}{rng.randrange(1000)}@example.com"
+    if schema.get("format") in ("uri", "url"):
+        return f"https://example.com/{key.lower()}/{rng.randrange(1000)}"
+    return f"{key} {rng.randrange(10_000)}"
+
+
+def fake_completion(
+    prompt: str, tools: Sequence[dict[str, Any]] = (), seed: int = 0
+) -> tuple[str, list[dict[str, Any]]]:
+    """
+    Answer a prompt with text, or with a call of the first of the OpenAI tools.
+
+    Returns the text and the tool calls (name and arguments).
+    """
+    rng = _seeded_random(prompt, seed)
+    if tools:
+        function = tools[0]["function"]
+        arguments = fake_value(function.get("parameters", {}), rng)
+        return "", [{"name": function["name"], "args": arguments}]
+    words = _WORD_PATTERN.findall(prompt)
+    return " ".join(rng.choice(words) for _ in range(min(len(words), 64))), []
+
+
+def hash_embedding(text: str, size: int) -> list[float]:
+    """Embed text as a normalized, signed, hashed bag of words."""
+    vector = [0.0] * size
+    for word in _WORD_PATTERN.findall(text.lower()):
+        hashed = int.from_bytes(hashlib.blake2b(word.encode(), digest_size=8).digest())
+        vector[hashed % size] += 1.0 if hashed & (1 << 63) else -1.0
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return [value / norm for value in vector]
+
+
+class Simulation:
+    """Latency and failures of the fake provider."""
+
+    def __init__(
+        self,
+        latency_ms: float = 0,
+        latency_jitter_ms: float = 0,
+        error_rate: float = 0,
+        seed: int = 0,
+    ):
+        self.latency_ms = latency_ms
+        self.latency_jitter_ms = latency_jitter_ms
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+
+    @classmethod
+    def from_settings(cls) -> "Simulation":
+        return cls(
+            conf.openai.FAKE_LATENCY_MS,
+            conf.openai.FAKE_LATENCY_JITTER_MS,
+            conf.openai.FAKE_ERROR_RATE,
+            conf.openai.FAKE_SEED,
+        )
+
+    def draw(self) -> tuple[float, bool]:
+        """Draw the delay in seconds of a call and whether it fails."""
+        delay = max(0.0, self._rng.gauss(self.latency_ms, self.latency_jitter_ms))
+        return delay / 1000, self._rng.random() < self.error_rate
+
+
+def _message_text(message: Any) -> str:
+    content = message.content if isinstance(message, BaseMessage) else message
+    return content if isinstance(content, str) else json.dumps(content)
+
+
+class FakeChatModel(BaseChatModel):
+    """A chat model answering from the fake backend, supporting tool calling."""
+
+    model_name: str = "fake"
+    latency_ms: float = 0
+    latency_jitter_ms: float = 0
+    error_rate: float = 0
+    seed: int = 0
+    _simulation: Simulation | None = PrivateAttr(default=None)
+
+    def _draw(self) -> tuple[float, bool]:
+        if self._simulation is None:
+            self._simulation = Simulation(
+                self.latency_ms, self.latency_jitter_ms, self.error_rate, self.seed
+            )
+        return self._simulation.draw()
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    @property
+    def _identifying_params(self) -> dict[str, Any]:
+        return {"model_name": self.model_name}
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any):  # type: ignore
+        return self.bind(
+            tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs
+        )
+
+    def _respond(
+        self, messages: list[BaseMessage], tools: Sequence[dict[str, Any]] = ()
+    ) -> ChatResult:
+        prompt = "\n".join(_message_text(message) for message in messages)
+        content, calls = fake_completion(prompt, tools, self.seed)
+        usage = {
+            "input_tokens": _estimate_tokens(prompt),
+            "output_tokens": _estimate_tokens(content or json.dumps(calls)),
+        }
+        usage["total_tokens"] = usage["input_tokens"] + usage["output_tokens"]
+        message = AIMessage(
+            content=content,
+            tool_calls=[
+                {**call, "id": f"call_{uuid.uuid4().hex[:24]}", "type": "tool_call"}
+                for call in calls
+            ],
+            usage_metadata=usage,  # type: ignore
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        delay, fails = self._draw()
+        time.sleep(delay)
+        if fails:
+            raise FakeLLMError("Simulated provider error")
+        return self._respond(messages, kwargs.get("tools") or ())
+
+    async def _agenerate(
+        self, messages, stop=None, run_manager=None, **kwargs
+    ) -> ChatResult:
+        delay, fails = self._draw()
+        await asyncio.sleep(delay)
+        if fails:
+            raise FakeLLMError("Simulated provider error")
+        return self._respond(messages, kwargs.get("tools") or ())
+
+
+class HashingEmbeddings(Embeddings):
+    """Embeddings from hashed bags of words, similar for texts sharing words."""
+
+    def __init__(self, size: int = 256):
+        self.size = size
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [hash_embedding(text, self.size) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return hash_embedding(text, self.size)
+
+
+def get_fake_model(name: str) -> FakeChatModel:
+    return FakeChatModel(
+        model_name=name,
+        latency_ms=conf.openai.FAKE_LATENCY_MS,
+        latency_jitter_ms=conf.openai.FAKE_LATENCY_JITTER_MS,
+        error_rate=conf.openai.FAKE_ERROR_RATE,
+        seed=conf.openai.FAKE_SEED,
+    )
+
+
+# OpenAI compatible HTTP API of the fake backend
+stand_in = FastAPI(title="Fake OpenAI API")
+_simulation = Simulation.from_settings()
+
+
+async def _simulate() -> JSONResponse | None:
+    delay, fails = _simulation.draw()
+    await asyncio.sleep(delay)
+    if fails:
+        error = {"message": "Simulated rate limit", "type": "rate_limit_exceeded"}
+        return JSONResponse({"error": error}, status_code=429)
+    return None
+
+
+@stand_in.post("/v1/chat/completions")
+async def chat_completions(request: dict[str, Any]) -> Any:
+    error = await _simulate()
+    if error is not None:
+        return error
+    prompt = "\n".join(
+        _message_text(m.get("content") or "") for m in request["messages"]
+    )
+    tools = request.get("tools") or [
+        {"type": "function", "function": function}
+        for function in request.get("functions") or []
+    ]
+    content, calls = fake_completion(prompt, tools, conf.openai.FAKE_SEED)
+    prompt_tokens = _estimate_tokens(prompt)
+    completion_tokens = _estimate_tokens(content or json.dumps(calls))
+    message: dict[str, Any] = {"role": "assistant", "content": content or None}
+    if calls:
+        message["tool_calls"] = [
+            {
+                "id": f"call_{uuid.uuid4().hex[:24]}",
+                "type": "function",
+                "function": {
+                    "name": call["name"],
+                    "arguments": json.dumps(call["args"]),
+                },
+            }
+            for call in calls
+        ]
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": request.get("model", "fake"),
+        "choices": [
+            {
+                "index": 0,
+                "message": message,
+                "finish_reason": "tool_calls" if calls else "stop",
+            }
+        ],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+@stand_in.post("/v1/embeddings")
+async def embeddings(request: dict[str, Any]) -> Any:
+    error = await _simulate()
+    if error is not None:
+        return error
+    inputs = request["input"]
+    if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+        inputs = [inputs]
+    # The client may send token ids rather than text
+    texts = [
+        text if isinstance(text, str) else " ".join(map(str, text)) for text in inputs
+    ]
+    size = request.get("dimensions") or 1536
+    return {
+        "object": "list",
+        "model": request.get("model", "fake"),
+        "data": [
+            {
+                "object": "embedding",
+                "index": index,
+                "embedding": hash_embedding(text, size),
+            }
+            for index, text in enumerate(texts)
+        ],
+        "usage": {
+            "prompt_tokens": sum(_estimate_tokens(text) for text in texts),
+            "total_tokens": sum(_estimate_tokens(text) for text in texts),
+        },
+    }
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve the fake OpenAI API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    args = parser.parse_args()
+    uvicorn.run(stand_in, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
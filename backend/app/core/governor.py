@@ -0,0 +1,191 @@
+# Path: app/core/governor.py
+
+"""
+Process-wide governor for calls to the LLM provider.
+
+Every model call made by the worker acquires a slot from a single governor,
+which bounds the number of in-flight calls and enforces requests-per-minute
+and tokens-per-minute budgets with token buckets. Waiting calls are queued per
+user and served round-robin, so one user's large extraction cannot starve
+everyone else on the same worker.
+"""
+import asyncio
+import json
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Hashable
+
+from langchain_core.runnables import Runnable, RunnableLambda
+from langchain_core.runnables.config import merge_configs
+
+from app.core.conf import settings
+from app.core.metrics import llm_usage_handler
+
+# The user on whose behalf model calls in the current context are made
+llm_user: ContextVar[Hashable | None] = ContextVar("llm_user", default=None)
+
+
+def estimate_tokens(value: Any) -> int:
+    """Roughly estimate the number of tokens in a prompt (~4 characters per token)."""
+    if hasattr(value, "to_string"):  # PromptValue
+        value = value.to_string()
+    elif isinstance(value, list):
+        value = " ".join(str(getattr(item, "content", item)) for item in value)
+    elif not isinstance(value, str):
+        value = json.dumps(value, default=str)
+    return len(value) // 4 + 1
+
+
+class TokenBucket:
+    """A token bucket refilled continuously at a per-minute rate."""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated_at = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated_at) * self.rate
+        )
+        self.updated_at = now
+
+    def delay(self, amount: float) -> float:
+        """Seconds until amount can be consumed, 0 if it can be consumed now."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.tokens) / self.rate)
+
+    def consume(self, amount: float) -> None:
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+
+class LLMGovernor:
+    """
+    Bound in-flight model calls and their request and token rates.
+
+    Args:
+        max_in_flight: Maximum concurrent calls. 0 or negative disables the limit.
+        requests_per_minute: Request budget. 0 or negative disables the limit.
+        tokens_per_minute: Token budget. 0 or negative disables the limit.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = 0,
+        requests_per_minute: int = 0,
+        tokens_per_minute: int = 0,
+    ):
+        self.max_in_flight = max_in_flight
+        self.requests = (
+            TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        )
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self.in_flight = 0
+        self._queues: "OrderedDict[Hashable, deque[tuple[asyncio.Future, int]]]" = (
+            OrderedDict()
+        )
+        self._wakeup: asyncio.TimerHandle | None = None
+
+    @property
+    def waiting(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def _delay(self, tokens: int) -> float:
+        delays = [0.0]
+        if self.requests is not None:
+            delays.append(self.requests.delay(1))
+        if self.tokens is not None:
+            delays.append(self.tokens.delay(tokens))
+        return max(delays)
+
+    def _dispatch(self) -> None:
+        """Grant slots to queued calls, serving users round-robin."""
+        self._wakeup = None
+        while self._queues:
+            if 0 < self.max_in_flight <= self.in_flight:
+                return
+            user, queue = next(iter(self._queues.items()))
+            future, tokens = queue[0]
+            if future.done():  # cancelled while waiting
+                queue.popleft()
+            else:
+                delay = self._delay(tokens)
+                if delay > 0:
+                    loop = asyncio.get_running_loop()
+                    self._wakeup = loop.call_later(delay, self._dispatch)
+                    return
+                queue.popleft()
+                self.in_flight += 1
+                if self.requests is not None:
+                    self.requests.consume(1)
+                if self.tokens is not None:
+                    self.tokens.consume(tokens)
+                future.set_result(None)
+            # Move the user to the back of the line
+            del self._queues[user]
+            if queue:
+                self._queues[user] = queue
+
+    def _release(self) -> None:
+        self.in_flight -= 1
+        if self._wakeup is None:
+            self._dispatch()
+
+    @asynccontextmanager
+    async def slot(
+        self, tokens: int = 0, user: Hashable | None = None
+    ) -> AsyncIterator[None]:
+        """Wait for a slot to make a model call estimated to use tokens."""
+        user = user if user is not None else llm_user.get()
+        future = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(user, deque()).append((future, tokens))
+        if self._wakeup is None:
+            self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self._release()
+            raise
+        try:
+            yield
+        finally:
+            self._release()
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "max_in_flight": self.max_in_flight,
+        }
+
+
+def governed(runnable: Runnable) -> Runnable:
+    """
+    Wrap a model runnable so every invocation acquires a governor slot.
+
+    The calls are reported to the usage handler, labelled with their user.
+    """
+    instrumented = runnable.with_config(callbacks=[llm_usage_handler])
+
+    async def _ainvoke(input: Any, config: Any) -> Any:
+        user = llm_user.get()
+        config = merge_configs(config, {"metadata": {"llm_user": user}})
+        async with governor.slot(estimate_tokens(input), user):
+            return await instrumented.ainvoke(input, config)
+
+    return RunnableLambda(_ainvoke, name=runnable.get_name())
+
+
+governor = LLMGovernor(
+    max_in_flight=settings.LLM_MAX_IN_FLIGHT,
+    requests_per_minute=settings.LLM_REQUESTS_PER_MINUTE,
+    tokens_per_minute=settings.LLM_TOKENS_PER_MINUTE,
+)
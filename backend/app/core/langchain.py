@@ -3,28 +3,22 @@
 """
 Client for interacting with the Langchain API.
 """
-from langchain_community.document_loaders import AsyncChromiumLoader
-from langchain_community.document_transformers import BeautifulSoupTransformer
 from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
 
 from app.core import conf
-
-llm = conf.openai.get_model()
+from app.core.governor import governed
+from app.core.web import fetch_text
 
 str_output_parser = StrOutputParser()
 
 
 async def extract_text_from_url(url: str) -> str:
-    loader = AsyncChromiumLoader([url])
-    transformer = BeautifulSoupTransformer()
-    documents = await loader.aload()
-    documents_transformed = transformer.transform_documents(documents)
-    return documents_transformed[0].page_content
+    return await fetch_text(url)
 
 
-def generate_cover_letter(profile, job, template) -> str:
+async def generate_cover_letter(profile, job, template) -> str:
     generation_template = ChatPromptTemplate.from_messages(
         [
             (
@@ -39,11 +33,11 @@ def generate_cover_letter(profile, job, template) -> str:
             ("user", "Awesome! Here are the job details:\n{job}"),
         ]
     )
-    chain = generation_template | llm | str_output_parser
-    return chain.invoke({"profile": profile, "job": job, "template": template})
+    chain = generation_template | governed(conf.openai.get_model()) | str_output_parser
+    return await chain.ainvoke({"profile": profile, "job": job, "template": template})
 
 
-def generate_resume(profile, job, template) -> str:
+async def generate_resume(profile, job, template) -> str:
     generation_template = ChatPromptTemplate.from_messages(
         [
             (
@@ -58,5 +52,5 @@ def generate_resume(profile, job, template) -> str:
             ("user", "Awesome! Here are the job details:\n{job}"),
         ]
     )
-    chain = generation_template | llm | str_output_parser
-    return chain.invoke({"profile": profile, "job": job, "template": template})
+    chain = generation_template | governed(conf.openai.get_model()) | str_output_parser
+    return await chain.ainvoke({"profile": profile, "job": job, "template": template})
@@ -0,0 +1,180 @@
+# Path: app/core/llm.py
+
+"""
+Shared clients of the LLM provider.
+
+Chat models and embeddings are created once per process, on first use, and
+share one pooled HTTP client with keep-alive. The provider SDK itself is only
+imported when the first client is created. Calls reuse warm connections
+rather than opening (and TLS handshaking) new ones, and a few connections can
+be opened in the background at startup, ahead of the first extraction,
+without holding up startup if the provider is slow or unreachable.
+"""
+import asyncio
+import threading
+from os import getenv
+from typing import TYPE_CHECKING, Hashable
+
+import httpx
+
+from app.core import conf
+from app.logging import console_log
+
+if TYPE_CHECKING:
+    from langchain_core.embeddings import Embeddings
+    from langchain_core.language_models.chat_models import BaseChatModel
+
+DEFAULT_API_BASE = "https://api.openai.com/v1"
+
+
+def _api_base() -> str:
+    return getenv("OPENAI_API_BASE") or getenv("OPENAI_BASE_URL") or DEFAULT_API_BASE
+
+
+def _client_options() -> dict:
+    return {
+        "timeout": conf.settings.LLM_HTTP_TIMEOUT_SECONDS,
+        "limits": httpx.Limits(
+            max_connections=conf.settings.LLM_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=conf.settings.LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=conf.settings.LLM_HTTP_KEEPALIVE_EXPIRY_SECONDS,
+        ),
+    }
+
+
+class ModelRegistry:
+    """Lazily created chat models and embeddings sharing pooled HTTP clients."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._models: dict[Hashable, "BaseChatModel"] = {}
+        self._embeddings: dict[Hashable, "Embeddings"] = {}
+        self._http_client: httpx.Client | None = None
+        self._async_http_client: httpx.AsyncClient | None = None
+        self._warming: asyncio.Task | None = None
+
+    @property
+    def http_client(self) -> httpx.Client:
+        if self._http_client is None or self._http_client.is_closed:
+            self._http_client = httpx.Client(**_client_options())
+        return self._http_client
+
+    @property
+    def async_http_client(self) -> httpx.AsyncClient:
+        if self._async_http_client is None or self._async_http_client.is_closed:
+            self._async_http_client = httpx.AsyncClient(**_client_options())
+        return self._async_http_client
+
+    def _create_model(self, name: str) -> "BaseChatModel":
+        if conf.openai.BACKEND == "fake":
+            from app.core.fake_llm import get_fake_model
+
+            return get_fake_model(name)
+        from langchain_openai import ChatOpenAI
+
+        return ChatOpenAI(
+            model=name,
+            temperature=0,
+            http_client=self.http_client,
+            http_async_client=self.async_http_client,
+        )
+
+    def _create_embeddings(self) -> "Embeddings":
+        from app.core.embeddings import CachedEmbeddings, embedding_cache
+
+        if conf.openai.BACKEND == "fake":
+            from app.core.fake_llm import HashingEmbeddings
+
+            embeddings: "Embeddings" = HashingEmbeddings()
+        else:
+            from langchain_openai import OpenAIEmbeddings
+
+            embeddings = OpenAIEmbeddings(
+                http_client=self.http_client,
+                http_async_client=self.async_http_client,
+            )
+        return CachedEmbeddings(
+            embeddings,
+            embedding_cache if conf.settings.EMBEDDING_CACHE_MAX_MB > 0 else None,
+            batch_size=conf.settings.EMBEDDING_BATCH_SIZE,
+            max_concurrency=conf.settings.EMBEDDING_MAX_CONCURRENCY,
+        )
+
+    def get_model(self, name: str) -> "BaseChatModel":
+        """Get the shared chat model of a name, creating it on first use."""
+        key = (conf.openai.BACKEND, name)
+        model = self._models.get(key)
+        if model is None:
+            with self._lock:
+                model = self._models.get(key)
+                if model is None:
+                    model = self._models[key] = self._create_model(name)
+        return model
+
+    def get_embeddings(self) -> "Embeddings":
+        """Get the shared embeddings model, creating it on first use."""
+        key = conf.openai.BACKEND
+        embeddings = self._embeddings.get(key)
+        if embeddings is None:
+            with self._lock:
+                embeddings = self._embeddings.get(key)
+                if embeddings is None:
+                    embeddings = self._embeddings[key] = self._create_embeddings()
+        return embeddings
+
+    def clear(self) -> None:
+        """Forget the created models, e.g. once the model settings changed."""
+        with self._lock:
+            self._models.clear()
+            self._embeddings.clear()
+
+    async def warm(self, connections: int, timeout: float | None = None) -> None:
+        """Open connections to the provider ahead of the first calls, waiting at
+        most timeout seconds for each."""
+        if conf.openai.BACKEND != "openai" or connections <= 0:
+            return
+        url = f"{_api_base().rstrip('/')}/models"
+        headers = {"Authorization": f"Bearer {conf.openai.API_KEY}"}
+        responses = await asyncio.gather(
+            *[
+                self.async_http_client.get(url, headers=headers, timeout=timeout)
+                for _ in range(connections)
+            ],
+            return_exceptions=True,
+        )
+        failures = [r for r in responses if isinstance(r, Exception)]
+        if failures:
+            console_log.warning(f"Could not warm LLM connections: {failures[0]}")
+
+    def warm_in_background(self, connections: int, timeout: float | None) -> None:
+        """Warm the connections in a background task, see warm."""
+        if self._warming is None or self._warming.done():
+            self._warming = asyncio.create_task(self.warm(connections, timeout))
+
+    async def close(self) -> None:
+        """Close the HTTP clients and forget the models using them."""
+        if self._warming is not None:
+            self._warming.cancel()
+            await asyncio.gather(self._warming, return_exceptions=True)
+            self._warming = None
+        self.clear()
+        if self._async_http_client is not None:
+            await self._async_http_client.aclose()
+            self._async_http_client = None
+        if self._http_client is not None:
+            self._http_client.close()
+            self._http_client = None
+
+
+model_registry = ModelRegistry()
+
+
+def warm_model_clients() -> None:
+    model_registry.warm_in_background(
+        conf.settings.LLM_HTTP_WARM_CONNECTIONS,
+        conf.settings.LLM_HTTP_WARM_TIMEOUT_SECONDS,
+    )
+
+
+async def close_model_clients() -> None:
+    await model_registry.close()
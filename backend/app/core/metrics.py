@@ -0,0 +1,245 @@
+# Path: app/core/metrics.py
+
+"""
+Token, cost and latency accounting for calls to the LLM provider.
+
+Every governed model call reports to a callback handler, which records the
+model, prompt and completion tokens, latency, retries and errors of the call.
+Calls are aggregated in memory per model, route, extractor and user, and per
+orchestration event so the rollup of a run can be persisted on its event.
+"""
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass
+from typing import Any, Hashable
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+from app.core.conf import openai
+
+# Labels (e.g. extractor, event) attached to model calls in the current context
+llm_labels: ContextVar[dict[str, Any]] = ContextVar("llm_labels", default={})
+
+# The ASGI scope of the request being handled, to label calls with its route
+request_scope: ContextVar[dict[str, Any] | None] = ContextVar(
+    "request_scope", default=None
+)
+
+MAX_TRACKED_EVENTS = 1024
+
+
+def set_llm_labels(**labels: Any) -> None:
+    """Label the model calls made in the current context."""
+    llm_labels.set({**llm_labels.get(), **labels})
+
+
+def _current_route() -> str | None:
+    scope = request_scope.get()
+    if scope is None:
+        return None
+    route = scope.get("route")
+    return getattr(route, "path", None) or scope.get("path")
+
+
+@dataclass
+class LLMUsage:
+    """Rollup of a number of model calls."""
+
+    calls: int = 0
+    errors: int = 0
+    retries: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cost_usd: float = 0.0
+    latency_ms: float = 0.0
+    max_latency_ms: float = 0.0
+
+    def add(self, call: "LLMCall") -> None:
+        self.calls += 1
+        self.errors += call.error
+        self.retries += call.retries
+        self.prompt_tokens += call.prompt_tokens
+        self.completion_tokens += call.completion_tokens
+        self.cost_usd += call.cost_usd
+        self.latency_ms += call.latency_ms
+        self.max_latency_ms = max(self.max_latency_ms, call.latency_ms)
+
+    def as_dict(self) -> dict[str, Any]:
+        usage = asdict(self)
+        usage["total_tokens"] = self.prompt_tokens + self.completion_tokens
+        usage["cost_usd"] = round(self.cost_usd, 6)
+        usage["latency_ms"] = round(self.latency_ms, 2)
+        usage["avg_latency_ms"] = (
+            round(self.latency_ms / self.calls, 2) if self.calls else 0.0
+        )
+        return usage
+
+
+@dataclass
+class LLMCall:
+    """A single model call."""
+
+    model: str
+    labels: dict[str, Any]
+    started_at: float
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cost_usd: float = 0.0
+    latency_ms: float = 0.0
+    retries: int = 0
+    error: bool = False
+
+
+class LLMMetrics:
+    """In-memory aggregates of model calls of this worker."""
+
+    dimensions = ("model", "route", "extractor", "user")
+
+    def __init__(self, max_events: int = MAX_TRACKED_EVENTS):
+        self.max_events = max_events
+        self.total = LLMUsage()
+        self.rollups: dict[str, dict[str, LLMUsage]] = {
+            dimension: {} for dimension in self.dimensions
+        }
+        self._events: "OrderedDict[Hashable, LLMUsage]" = OrderedDict()
+        self._event_counts: "OrderedDict[Hashable, dict[str, int]]" = OrderedDict()
+
+    def record(self, call: LLMCall) -> None:
+        self.total.add(call)
+        labels = {**call.labels, "model": call.model}
+        for dimension in self.dimensions:
+            value = labels.get(dimension)
+            if value is not None:
+                self.rollups[dimension].setdefault(str(value), LLMUsage()).add(call)
+        event = labels.get("event")
+        if event is not None:
+            self._events.setdefault(event, LLMUsage()).add(call)
+            self._events.move_to_end(event)
+            while len(self._events) > self.max_events:
+                self._events.popitem(last=False)
+
+    def count(self, event: Hashable, **counts: int) -> None:
+        """Add to counters of an event other than its calls (e.g. skipped chunks),
+        reported along with the rollup of its calls."""
+        event_counts = self._event_counts.setdefault(event, {})
+        for name, value in counts.items():
+            event_counts[name] = event_counts.get(name, 0) + value
+        self._event_counts.move_to_end(event)
+        while len(self._event_counts) > self.max_events:
+            self._event_counts.popitem(last=False)
+
+    def pop_event(self, event: Hashable) -> dict[str, Any] | None:
+        """Remove and return the rollup of the calls made for an event."""
+        usage = self._events.pop(event, None)
+        counts = self._event_counts.pop(event, None)
+        if usage is None and counts is None:
+            return None
+        return {**(usage or LLMUsage()).as_dict(), **(counts or {})}
+
+    def reset(self) -> None:
+        self.__init__(self.max_events)  # type: ignore
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        return {
+            "total": self.total.as_dict(),
+            **{
+                f"by_{dimension}": {
+                    value: usage.as_dict() for value, usage in rollup.items()
+                }
+                for dimension, rollup in self.rollups.items()
+            },
+        }
+
+
+def _model_name(serialized: dict[str, Any] | None, kwargs: dict[str, Any]) -> str:
+    params = kwargs.get("invocation_params") or {}
+    metadata = kwargs.get("metadata") or {}
+    names = (
+        params.get("model"),
+        params.get("model_name"),
+        metadata.get("ls_model_name"),
+        (serialized or {}).get("name"),
+    )
+    return next((name for name in names if name), "unknown")
+
+
+def _token_usage(response: LLMResult) -> tuple[int, int]:
+    """Prompt and completion tokens reported by the provider."""
+    prompt_tokens = completion_tokens = 0
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(
+                getattr(generation, "message", None), "usage_metadata", None
+            )
+            if usage:
+                prompt_tokens += usage.get("input_tokens", 0)
+                completion_tokens += usage.get("output_tokens", 0)
+    if not (prompt_tokens or completion_tokens):
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        prompt_tokens = usage.get("prompt_tokens", 0)
+        completion_tokens = usage.get("completion_tokens", 0)
+    return prompt_tokens, completion_tokens
+
+
+class LLMUsageHandler(BaseCallbackHandler):
+    """Callback handler recording every model call into metrics."""
+
+    # Run in the caller's context, where the user and labels are set
+    run_inline = True
+
+    def __init__(self, metrics: LLMMetrics):
+        self.metrics = metrics
+        self._calls: dict[UUID, LLMCall] = {}
+
+    def _start(self, serialized: Any, run_id: UUID, kwargs: dict[str, Any]) -> None:
+        metadata = kwargs.get("metadata") or {}
+        labels = {**llm_labels.get(), "user": metadata.get("llm_user")}
+        labels.setdefault("route", _current_route())
+        self._calls[run_id] = LLMCall(
+            model=_model_name(serialized, kwargs),
+            labels=labels,
+            started_at=time.perf_counter(),
+        )
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs) -> None:
+        self._start(serialized, run_id, kwargs)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs) -> None:
+        self._start(serialized, run_id, kwargs)
+
+    def _finish(self, run_id: UUID) -> LLMCall | None:
+        call = self._calls.pop(run_id, None)
+        if call is not None:
+            call.latency_ms = (time.perf_counter() - call.started_at) * 1000
+        return call
+
+    def on_llm_end(self, response: LLMResult, *, run_id, **kwargs) -> None:
+        call = self._finish(run_id)
+        if call is None:
+            return
+        call.prompt_tokens, call.completion_tokens = _token_usage(response)
+        call.cost_usd = openai.get_cost(
+            call.model, call.prompt_tokens, call.completion_tokens
+        )
+        self.metrics.record(call)
+
+    def on_llm_error(self, error: BaseException, *, run_id, **kwargs) -> None:
+        call = self._finish(run_id)
+        if call is not None:
+            call.error = True
+            self.metrics.record(call)
+
+    def on_retry(self, retry_state: Any, *, run_id, parent_run_id=None, **kwargs):
+        # Retries are reported on the retrying runnable or the model run
+        for id in (run_id, parent_run_id):
+            if id in self._calls:
+                self._calls[id].retries += 1
+                return
+
+
+llm_metrics = LLMMetrics()
+llm_usage_handler = LLMUsageHandler(llm_metrics)
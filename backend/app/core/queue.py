@@ -0,0 +1,159 @@
+# Path: app/core/queue.py
+
+"""
+Durable queue of extraction jobs backed by the extraction_jobs table.
+
+Workers claim the oldest pending job with SELECT ... FOR UPDATE SKIP LOCKED,
+so any number of worker processes can poll the same table without handing out
+a job twice. A claimed job is marked running and stamped with locked_at,
+which its worker refreshes with a heartbeat while the job runs. Running jobs
+whose lock is older than JOB_LOCK_TIMEOUT_SECONDS (their worker died) are
+claimed again, unless they used up their attempts: a job crashing its worker
+would otherwise be retried forever. Those are marked failed instead.
+"""
+from datetime import timedelta
+from typing import Any
+
+from pydantic import UUID4
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models, schemas
+from app.core import conf
+
+PENDING = schemas.OrchestrationEventStatusType.PENDING.value
+RUNNING = schemas.OrchestrationEventStatusType.RUNNING.value
+SUCCESS = schemas.OrchestrationEventStatusType.SUCCESS.value
+FAILED = schemas.OrchestrationEventStatusType.FAILED.value
+
+# Error of the jobs whose worker died on their last attempt
+WORKER_LOST = "Worker lost while running the job"
+
+
+async def enqueue_job(
+    db: AsyncSession,
+    *,
+    extractor_id: UUID4,
+    user_id: UUID4,
+    event_id: UUID4,
+    mode: str,
+    llm: str,
+    text: str | None = None,
+    url: str | None = None,
+    sink: str | None = None,
+) -> models.ExtractionJob:
+    """Add a pending extraction job to the queue."""
+    job = models.ExtractionJob(
+        status=PENDING,
+        mode=mode,
+        llm=llm,
+        text=text,
+        url=url,
+        sink=sink,
+        attempts=0,
+        extractor_id=extractor_id,
+        user_id=user_id,
+        event_id=event_id,
+    )
+    db.add(job)
+    await db.commit()
+    await db.refresh(job)
+    return job
+
+
+async def _fail_lost_jobs(db: AsyncSession, lock_timeout: timedelta) -> None:
+    """Fail the running jobs whose worker died on their last attempt, and their
+    events."""
+    query = (
+        update(models.ExtractionJob)
+        .where(
+            models.ExtractionJob.status == RUNNING,
+            models.ExtractionJob.locked_at < func.now() - lock_timeout,
+            models.ExtractionJob.attempts >= conf.settings.JOB_MAX_ATTEMPTS,
+        )
+        .values(status=FAILED, error=WORKER_LOST, locked_at=None)
+        .returning(models.ExtractionJob.event_id)
+    )
+    lost = (await db.execute(query)).scalars()
+    event_ids = [event_id for event_id in lost if event_id is not None]
+    if event_ids:
+        await db.execute(
+            update(models.OrchestrationEvent)
+            .where(models.OrchestrationEvent.id.in_(event_ids))
+            .values(
+                status=FAILED,
+                message=f"Failure to extract orchestration event: {WORKER_LOST}",
+            )
+        )
+
+
+async def claim_job(db: AsyncSession) -> models.ExtractionJob | None:
+    """Claim the oldest runnable job, or return None if the queue is empty."""
+    lock_timeout = timedelta(seconds=conf.settings.JOB_LOCK_TIMEOUT_SECONDS)
+    await _fail_lost_jobs(db, lock_timeout)
+    query = (
+        select(models.ExtractionJob)
+        .where(
+            or_(
+                models.ExtractionJob.status == PENDING,
+                and_(
+                    models.ExtractionJob.status == RUNNING,
+                    models.ExtractionJob.locked_at < func.now() - lock_timeout,
+                    models.ExtractionJob.attempts < conf.settings.JOB_MAX_ATTEMPTS,
+                ),
+            )
+        )
+        .order_by(models.ExtractionJob.created_at)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    )
+    job = (await db.execute(query)).scalars().first()
+    if job is None:
+        await db.commit()  # keep the lost jobs failed and release the transaction
+        return None
+    job.status = RUNNING
+    job.attempts = (job.attempts or 0) + 1
+    job.locked_at = func.now()
+    await db.commit()
+    await db.refresh(job)
+    return job
+
+
+async def heartbeat_job(db: AsyncSession, job_id: UUID4) -> bool:
+    """Refresh the lock of a running job, returning False if it is no longer running."""
+    result = await db.execute(
+        update(models.ExtractionJob)
+        .where(
+            models.ExtractionJob.id == job_id,
+            models.ExtractionJob.status == RUNNING,
+        )
+        .values(locked_at=func.now())
+    )
+    await db.commit()
+    return result.rowcount > 0  # type: ignore
+
+
+async def complete_job(
+    db: AsyncSession, job: models.ExtractionJob, result: dict[str, Any]
+) -> models.ExtractionJob:
+    """Record the result of a successful job, committing the records its sink
+    added in the same transaction."""
+    job.status = SUCCESS
+    job.result = result
+    job.error = None
+    await db.commit()
+    await db.refresh(job)
+    return job
+
+
+async def fail_job(
+    db: AsyncSession, job: models.ExtractionJob, error: str, retry: bool = True
+) -> models.ExtractionJob:
+    """Record a failed attempt, returning the job to the queue if it may be retried."""
+    can_retry = retry and job.attempts < conf.settings.JOB_MAX_ATTEMPTS
+    job.status = PENDING if can_retry else FAILED
+    job.error = error
+    job.locked_at = None
+    await db.commit()
+    await db.refresh(job)
+    return job
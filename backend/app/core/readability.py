@@ -0,0 +1,238 @@
+# Path: app/core/readability.py
+
+"""
+Main content extraction of HTML pages.
+
+Job boards wrap a posting in navigation, cookie banners, footers and lists of
+similar jobs, all of which would otherwise be chunked and sent to the model.
+The main content is found the way readability does it. Elements whose class or
+id names mark them as boilerplate are dropped. Every block of text is scored by
+its length and commas, and the score propagates to its ancestors, weighted by
+their tag and class names and penalized by their density of links. The best
+scoring element is kept, together with its similarly scoring siblings.
+"""
+import copy
+import re
+from dataclasses import dataclass
+from typing import Any
+
+from bs4 import BeautifulSoup, Tag
+
+from app.core.governor import estimate_tokens
+
+# Elements never holding readable text
+_INVISIBLE_TAGS = ["script", "style", "noscript", "template", "svg", "canvas", "iframe"]
+# Elements holding navigation, page chrome and asides
+_BOILERPLATE_TAGS = ["nav", "footer", "aside", "dialog"]
+_BOILERPLATE_ROLES = re.compile(
+    r"^(navigation|banner|contentinfo|complementary|dialog|alertdialog|menu)$"
+)
+
+_UNLIKELY = re.compile(
+    r"ad-break|agegate|banner|breadcrumb|combx|comment|community|consent|cookie|"
+    r"disqus|footer|gdpr|header|legends|menu|modal|nav|newsletter|pager|"
+    r"pagination|popup|recommend|related|remark|replies|rss|share|shoutbox|"
+    r"sidebar|similar|skyscraper|social|sponsor|subscribe",
+    re.I,
+)
+_MAYBE = re.compile(r"and|article|body|column|content|description|job|main|post", re.I)
+_POSITIVE = re.compile(
+    r"article|body|content|description|detail|entry|h-entry|hentry|job|main|"
+    r"page|post|story|text",
+    re.I,
+)
+_NEGATIVE = re.compile(
+    r"banner|combx|comment|com-|contact|cookie|footer|footnote|gdpr|hidden|"
+    r"masthead|menu|meta|nav|outbrain|promo|recommend|related|share|shoutbox|"
+    r"sidebar|similar|skyscraper|sponsor|tags|tool|widget",
+    re.I,
+)
+
+# Elements whose text is scored, and the block level elements of the output
+_SCORED_TAGS = ["p", "pre", "td", "li", "dd", "blockquote", "div", "section"]
+_BLOCK_TAGS = (
+    "address article blockquote dd div dl dt h1 h2 h3 h4 h5 h6 li main ol p pre "
+    "section table tr ul"
+).split()
+_TAG_SCORES = {
+    **dict.fromkeys(["article", "main"], 10),
+    **dict.fromkeys(["div", "section"], 5),
+    **dict.fromkeys(["pre", "td", "blockquote"], 3),
+    **dict.fromkeys(["address", "ol", "ul", "dl", "dd", "dt", "li", "form"], -3),
+    **dict.fromkeys(["h1", "h2", "h3", "h4", "h5", "h6", "th"], -5),
+}
+
+_MIN_BLOCK_CHARS = 25
+
+
+@dataclass
+class MainContent:
+    text: str
+    title: str
+    tokens: int  # of the whole text of the page
+    removed_tokens: int  # of the boilerplate not in the main content
+
+
+def _names(tag: Tag) -> str:
+    classes = tag.get("class") or []
+    if isinstance(classes, str):
+        classes = [classes]
+    return " ".join([*classes, str(tag.get("id") or "")])
+
+
+def _class_weight(tag: Tag) -> int:
+    names = _names(tag)
+    if not names.strip():
+        return 0
+    return (25 if _POSITIVE.search(names) else 0) - (
+        25 if _NEGATIVE.search(names) else 0
+    )
+
+
+def _is_boilerplate(tag: Tag) -> bool:
+    if tag.name in ("html", "body", "article", "main"):
+        return False
+    if tag.has_attr("hidden") or tag.get("aria-hidden") == "true":
+        return True
+    if _BOILERPLATE_ROLES.match(str(tag.get("role") or "")):
+        return True
+    names = _names(tag)
+    return bool(_UNLIKELY.search(names)) and not _MAYBE.search(names)
+
+
+def _link_density(tag: Tag) -> float:
+    text_length = len(tag.get_text(strip=True))
+    if not text_length:
+        return 0.0
+    link_length = sum(len(a.get_text(strip=True)) for a in tag.find_all("a"))
+    return link_length / text_length
+
+
+def _render(tag: Tag) -> str:
+    """The text of tag with one line per block, without blank lines."""
+    for br in tag.find_all("br"):
+        br.replace_with("\n")
+    for block in tag.find_all(_BLOCK_TAGS):
+        block.insert_before("\n")
+        block.insert_after("\n")
+    lines = (" ".join(line.split()) for line in tag.get_text().splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def _score_candidates(root: Tag) -> dict[int, tuple[Tag, float]]:
+    """Score the ancestors of the blocks of text, keyed on their identity as
+    tags hash and compare by their markup."""
+    scores: dict[int, tuple[Tag, float]] = {}
+    for block in root.find_all(_SCORED_TAGS):
+        # Containers are scored through the blocks they contain
+        if block.name in ("div", "section") and block.find(_BLOCK_TAGS):
+            continue
+        text = block.get_text(" ", strip=True)
+        if len(text) < _MIN_BLOCK_CHARS:
+            continue
+        score = 1 + text.count(",") + min(len(text) // 100, 3)
+        for level, ancestor in enumerate(list(block.parents)[:3]):
+            if ancestor.name in ("[document]", "html"):
+                break
+            _, total = scores.get(
+                id(ancestor),
+                (ancestor, _TAG_SCORES.get(ancestor.name, 0) + _class_weight(ancestor)),
+            )
+            total += score / (1 if level == 0 else 2 if level == 1 else 6)
+            scores[id(ancestor)] = (ancestor, total)
+    return {
+        key: (tag, score * (1 - _link_density(tag)))
+        for key, (tag, score) in scores.items()
+    }
+
+
+def _main_elements(root: Tag) -> list[Tag]:
+    """The best scoring element and its siblings scoring almost as well."""
+    scores = _score_candidates(root)
+    if not scores:
+        return []
+    best, best_score = max(scores.values(), key=lambda candidate: candidate[1])
+    if best.parent is None:
+        return [best]
+    threshold = max(10.0, best_score * 0.2)
+    elements = []
+    for sibling in best.parent.find_all(recursive=False):
+        _, score = scores.get(id(sibling), (sibling, 0.0))
+        if sibling is best or score >= threshold:
+            elements.append(sibling)
+        elif sibling.name == "p":
+            text = sibling.get_text(" ", strip=True)
+            if len(text) > 80 and _link_density(sibling) < 0.25:
+                elements.append(sibling)
+    return elements
+
+
+def extract_main_content(
+    html: str | bytes, *, strip_boilerplate: bool = True, min_chars: int = 0
+) -> MainContent:
+    """
+    Extract the text of the main content of an HTML page.
+
+    Args:
+        html: The page.
+        strip_boilerplate: Whether to keep only the main content rather than
+            the whole text of the page.
+        min_chars: The whole text is kept when the main content found has fewer
+            characters, as pages without a clear main content are better sent
+            whole than truncated.
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    title = soup.title.get_text(" ", strip=True) if soup.title else ""
+    for tag in soup.find_all(_INVISIBLE_TAGS):
+        tag.decompose()
+    root = soup.body or soup
+    full_text = _render(copy.copy(root))
+    tokens = estimate_tokens(full_text)
+    if not strip_boilerplate:
+        return MainContent(full_text, title, tokens, 0)
+
+    for tag in root.find_all(_BOILERPLATE_TAGS):
+        tag.decompose()
+    for tag in root.find_all(True):
+        if not tag.decomposed and _is_boilerplate(tag):
+            tag.decompose()
+    text = "\n".join(_render(element) for element in _main_elements(root))
+    if len(text) < min_chars:
+        # Fall back to everything but the marked boilerplate
+        text = _render(root)
+        if len(text) < min_chars:
+            text = full_text
+    return MainContent(text, title, tokens, max(tokens - estimate_tokens(text), 0))
+
+
+class BoilerplateReport:
+    """Counts of the tokens of the pages and of the boilerplate stripped from them."""
+
+    def __init__(self):
+        self.documents = 0
+        self.tokens = 0
+        self.removed_tokens = 0
+
+    def record(self, tokens: int, removed_tokens: int) -> None:
+        self.documents += 1
+        self.tokens += tokens
+        self.removed_tokens += removed_tokens
+
+    def record_documents(self, documents: list[Any]) -> None:
+        """Count the documents parsed from HTML, which carry their token counts."""
+        for document in documents:
+            metadata = getattr(document, "metadata", None) or {}
+            if "removed_tokens" in metadata:
+                self.record(metadata.get("tokens", 0), metadata["removed_tokens"])
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        return {
+            "documents": self.documents,
+            "tokens": self.tokens,
+            "removed_tokens": self.removed_tokens,
+            "removed_ratio": self.removed_tokens / self.tokens if self.tokens else 0.0,
+        }
+
+
+boilerplate_report = BoilerplateReport()
@@ -0,0 +1,257 @@
+# Path: app/core/web.py
+
+"""
+Shared clients for fetching web pages.
+
+Static pages are fetched with a pooled async HTTP client. Pages that only
+render their content with JavaScript fall back to a long-lived headless
+Chromium browser, shared by every request on the worker. The browser hands out
+a bounded number of isolated pages and is relaunched after a number of uses to
+cap its memory growth.
+
+The extracted text of a static page is cached together with its ETag and
+Last-Modified headers. Later fetches are conditional requests, and the cached
+text is served when the server answers 304 Not Modified or the page is
+unchanged. Text rendered by the browser is only cached for a short while, as
+the headers of the static shell do not change with the rendered content.
+"""
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from io import BytesIO
+from typing import Any, AsyncIterator
+
+import httpx
+
+from app.core import conf
+from app.core.cache import DiskCache, digest
+from app.core.readability import boilerplate_report, extract_main_content
+from app.logging import console_log
+
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+)
+
+# Phrases of pages asking the visitor to enable JavaScript
+_JS_REQUIRED_MARKERS = ("enable javascript", "javascript is disabled")
+
+_http_client: httpx.AsyncClient | None = None
+
+url_cache = DiskCache(
+    conf.settings.CACHE_PATH / "urls",
+    ttl_seconds=conf.settings.URL_CACHE_TTL_SECONDS,
+    max_entries=conf.settings.URL_CACHE_MAX_ENTRIES,
+    max_bytes=conf.settings.URL_CACHE_MAX_MB * 1024 * 1024,
+    compress=True,
+)
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the worker's pooled HTTP client."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            follow_redirects=True,
+            timeout=conf.settings.URL_FETCH_TIMEOUT_SECONDS,
+            headers={"User-Agent": USER_AGENT},
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        )
+    return _http_client
+
+
+class BrowserPool:
+    """
+    A lazily launched headless browser serving a bounded number of pages.
+
+    Args:
+        max_pages: Maximum number of pages open at once.
+        max_uses: Relaunch the browser after this many pages. 0 disables recycling.
+    """
+
+    def __init__(self, max_pages: int, max_uses: int = 0):
+        self.max_pages = max_pages
+        self.max_uses = max_uses
+        self.uses = 0
+        self.launches = 0
+        self._slots = asyncio.Semaphore(max_pages)
+        self._lock = asyncio.Lock()
+        self._playwright: Any = None
+        self._browser: Any = None
+        self._open_pages: dict[Any, int] = {}  # open pages per browser
+
+    async def _get_browser(self) -> Any:
+        async with self._lock:
+            if self._browser is not None and 0 < self.max_uses <= self.uses:
+                # Retire the browser, it is closed once its last page is done
+                retired, self._browser = self._browser, None
+                self.uses = 0
+                if not self._open_pages.get(retired):
+                    await self._close_browser(retired)
+            if self._browser is None or not self._browser.is_connected():
+                if self._playwright is None:
+                    from playwright.async_api import async_playwright
+
+                    self._playwright = await async_playwright().start()
+                self._browser = await self._playwright.chromium.launch(headless=True)
+                self.launches += 1
+            self.uses += 1
+            return self._browser
+
+    async def _close_browser(self, browser: Any) -> None:
+        self._open_pages.pop(browser, None)
+        await browser.close()
+
+    @asynccontextmanager
+    async def page(self) -> AsyncIterator[Any]:
+        """Open a page in a fresh browser context, closing it on exit."""
+        async with self._slots:
+            browser = await self._get_browser()
+            self._open_pages[browser] = self._open_pages.get(browser, 0) + 1
+            try:
+                context = await browser.new_context(user_agent=USER_AGENT)
+                try:
+                    yield await context.new_page()
+                finally:
+                    await context.close()
+            finally:
+                self._open_pages[browser] -= 1
+                if browser is not self._browser and not self._open_pages[browser]:
+                    await self._close_browser(browser)
+
+    async def fetch_html(self, url: str) -> str:
+        """Render url in the browser and return its HTML."""
+        async with self.page() as page:
+            await page.goto(url, timeout=conf.settings.URL_FETCH_TIMEOUT_SECONDS * 1000)
+            return await page.content()
+
+    async def close(self) -> None:
+        """Close the browser and stop playwright."""
+        async with self._lock:
+            browsers = {*self._open_pages, self._browser} - {None}
+            for browser in browsers:
+                await self._close_browser(browser)
+            self._browser = None
+            if self._playwright is not None:
+                await self._playwright.stop()
+                self._playwright = None
+
+
+browser_pool = BrowserPool(
+    max_pages=conf.settings.BROWSER_MAX_PAGES,
+    max_uses=conf.settings.BROWSER_MAX_USES,
+)
+
+
+def html_to_text(html: str) -> str:
+    """Extract the readable text of the main content of an HTML page."""
+    content = extract_main_content(
+        html,
+        strip_boilerplate=conf.settings.BOILERPLATE_STRIPPING,
+        min_chars=conf.settings.BOILERPLATE_MIN_CONTENT_CHARS,
+    )
+    boilerplate_report.record(content.tokens, content.removed_tokens)
+    return content.text
+
+
+def needs_browser(text: str) -> bool:
+    """Whether text extracted from a static page suggests it is rendered by JavaScript."""
+    if len(text.strip()) < conf.settings.URL_MIN_STATIC_TEXT_CHARS:
+        return True
+    lowered = text.lower()
+    return any(marker in lowered for marker in _JS_REQUIRED_MARKERS)
+
+
+def _conditional_headers(cached: dict[str, Any] | None) -> dict[str, str]:
+    headers = {}
+    if cached and cached.get("etag"):
+        headers["If-None-Match"] = cached["etag"]
+    if cached and cached.get("last_modified"):
+        headers["If-Modified-Since"] = cached["last_modified"]
+    return headers
+
+
+async def _render_text(url: str) -> str:
+    html = await browser_pool.fetch_html(url)
+    return await asyncio.to_thread(html_to_text, html)
+
+
+async def _parse_text(url: str, content: bytes) -> str:
+    """Parse a document other than HTML like an upload of it, raising for
+    unsupported mime-types."""
+    from app.extractor.parsing import aparse_binary_input
+
+    documents = await aparse_binary_input(BytesIO(content), url)
+    return "\n\n".join(document.page_content for document in documents)
+
+
+async def fetch_text(url: str) -> str:
+    """
+    Fetch the readable text of a web page.
+
+    The page is fetched over plain HTTP first; the browser is only used when
+    the request fails or the static HTML page has no meaningful content.
+    Other documents, such as PDFs, are parsed like uploads. Cached
+    text of static pages is revalidated with a conditional request. The
+    validators of a static shell say nothing of the content JavaScript renders
+    into it, so browser rendered text is cached without them, for
+    URL_RENDERED_CACHE_TTL_SECONDS only.
+    """
+    use_cache = conf.settings.URL_CACHE_MAX_ENTRIES > 0
+    key = digest("url", url, conf.settings.BOILERPLATE_STRIPPING)
+    cached = await url_cache.aget_json(key) if use_cache else None
+    if cached is not None and cached.get("rendered_at") is not None:
+        age = time.time() - cached["rendered_at"]
+        if age < conf.settings.URL_RENDERED_CACHE_TTL_SECONDS:
+            return cached["text"]
+        cached = None
+
+    entry: dict[str, Any]
+    try:
+        response = await get_http_client().get(
+            url, headers=_conditional_headers(cached)
+        )
+        if response.status_code == 304 and cached is not None:
+            return cached["text"]
+        response.raise_for_status()
+    except httpx.HTTPError as e:
+        console_log.info(f"Static fetch of {url} failed ({e}), using the browser")
+        text = await _render_text(url)
+        entry = {"text": text, "rendered_at": time.time()}
+    else:
+        page_digest = digest(response.content)
+        if cached is not None and cached.get("page_digest") == page_digest:
+            return cached["text"]  # served in full, but unchanged
+
+        is_html = "html" in response.headers.get("content-type", "html")
+        if is_html:
+            text = await asyncio.to_thread(html_to_text, response.text)
+        else:
+            text = await _parse_text(url, response.content)
+        if is_html and needs_browser(text):
+            console_log.info(
+                f"Static page {url} requires JavaScript, using the browser"
+            )
+            text = await _render_text(url)
+            entry = {"text": text, "rendered_at": time.time()}
+        else:
+            entry = {
+                "text": text,
+                "etag": response.headers.get("etag"),
+                "last_modified": response.headers.get("last-modified"),
+                "page_digest": page_digest,
+            }
+
+    rendered = "rendered_at" in entry
+    if use_cache and (conf.settings.URL_RENDERED_CACHE_TTL_SECONDS > 0 or not rendered):
+        await url_cache.aset_json(key, entry)
+    return text
+
+
+async def close_web_clients() -> None:
+    """Close the pooled HTTP client and the browser."""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+    await browser_pool.close()
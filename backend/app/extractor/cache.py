@@ -0,0 +1,104 @@
+# app/extractor/cache.py
+"""Content-addressed caches of extraction results and parsed documents."""
+from typing import Any
+
+from langchain_core.documents import Document
+from langchain_core.documents.base import Blob
+from langchain_core.utils.json_schema import dereference_refs
+
+from app import schemas
+from app.core.cache import DiskCache, digest
+from app.core.conf import openai, settings
+from app.utils import clean_text
+
+extraction_cache = DiskCache(
+    settings.CACHE_PATH / "extractions",
+    ttl_seconds=settings.EXTRACTION_CACHE_TTL_SECONDS,
+    max_entries=settings.EXTRACTION_CACHE_MAX_ENTRIES,
+)
+
+parsed_document_cache = DiskCache(
+    settings.CACHE_PATH / "documents",
+    ttl_seconds=settings.PARSED_DOCUMENT_CACHE_TTL_SECONDS,
+    max_entries=settings.PARSED_DOCUMENT_CACHE_MAX_ENTRIES,
+    compress=True,
+)
+
+
+def extraction_cache_key(
+    content: str,
+    extractor: schemas.ExtractorRead,
+    examples: list[dict[str, Any]],
+    llm_name: str,
+    mode: str,
+    **params: Any,
+) -> str:
+    """Hash everything that determines the result of an extraction run,
+    including the backend serving the model, as the fake backend serves the
+    same model names."""
+    json_schema = getattr(extractor, "json_schema", None) or {}
+    return digest(
+        mode,
+        openai.BACKEND,
+        llm_name,
+        clean_text(content),
+        dereference_refs(json_schema),
+        extractor.instruction,
+        extractor.description,
+        examples,
+        params,
+    )
+
+
+async def get_cached_extraction(key: str) -> schemas.ExtractorResponse | None:
+    """Return a cached extraction response, or None on a miss or if caching is disabled."""
+    if settings.EXTRACTION_CACHE_MAX_ENTRIES <= 0:
+        return None
+    return await extraction_cache.aget_json(key)
+
+
+async def cache_extraction(key: str, response: schemas.ExtractorResponse) -> None:
+    """Persist an extraction response under key."""
+    if settings.EXTRACTION_CACHE_MAX_ENTRIES <= 0:
+        return
+    await extraction_cache.aset_json(key, response)
+
+
+def _parsed_document_cache_key(blob: Blob) -> str | None:
+    sha256 = blob.metadata.get("sha256")
+    if not sha256:
+        return None
+    return digest(
+        "parsed_document", sha256, blob.mimetype, settings.BOILERPLATE_STRIPPING
+    )
+
+
+def get_cached_documents(blob: Blob) -> list[Document] | None:
+    """Return the cached documents parsed from a file with the same content."""
+    key = _parsed_document_cache_key(blob)
+    if key is None or settings.PARSED_DOCUMENT_CACHE_MAX_ENTRIES <= 0:
+        return None
+    cached = parsed_document_cache.get_json(key)
+    if cached is None:
+        return None
+    return [
+        Document(
+            page_content=document["page_content"],
+            metadata={**document["metadata"], "source": blob.source},
+        )
+        for document in cached
+    ]
+
+
+def cache_documents(blob: Blob, documents: list[Document]) -> None:
+    """Persist the documents parsed from a file under its content digest."""
+    key = _parsed_document_cache_key(blob)
+    if key is None or settings.PARSED_DOCUMENT_CACHE_MAX_ENTRIES <= 0:
+        return
+    parsed_document_cache.set_json(
+        key,
+        [
+            {"page_content": document.page_content, "metadata": document.metadata}
+            for document in documents
+        ],
+    )
@@ -0,0 +1,138 @@
+# app/extractor/chunking.py
+"""Lazy splitting of documents into the chunks extracted from.
+
+A 500 page document splits into hundreds of chunks, of which only the ones in
+flight need to be in memory. The document is tokenized a few paragraphs at a
+time and its chunks decoded one at a time as the extraction workers ask for
+them. Production stops once MAX_CHUNKS chunks or MAX_EXTRACTION_TOKENS tokens
+were handed out, so the rest of the document is never tokenized.
+"""
+from dataclasses import dataclass
+from typing import Any, Iterable, Iterator
+
+from app.core.conf import openai
+from app.extractor.near_duplicates import NearDuplicateFilter
+
+# The document is tokenized in pieces of this to twice this many characters,
+# ending at a paragraph break, else a line break, else whitespace
+PIECE_CHARS = 16_000
+_SEPARATORS = ("\n\n", "\n", " ")
+
+
+def _get_encoding(model_name: str) -> Any:
+    import tiktoken
+
+    return tiktoken.encoding_for_model(model_name)
+
+
+def _iter_pieces(content: str, size: int) -> Iterator[str]:
+    """Split content into pieces of size to about twice size characters, cut
+    after the first separator past size characters, or at twice size without
+    one."""
+    start = 0
+    while start < len(content):
+        end = len(content)
+        if end - start > 2 * size:
+            end = start + 2 * size
+            for separator in _SEPARATORS:
+                found = content.find(separator, start + size, end + len(separator))
+                if found >= 0:
+                    end = found + len(separator)
+                    break
+        yield content[start:end]
+        start = end
+
+
+def iter_chunks(
+    content: str,
+    chunk_size: int,
+    chunk_overlap: int = 20,
+    encoding: Any = None,
+) -> Iterator[tuple[str, int]]:
+    """
+    Split content into chunks of tokens, like TokenTextSplitter but lazily.
+
+    The content is tokenized in pieces of bounded size ending at paragraph
+    breaks where possible, as the chunks are consumed. Tokens do not span
+    paragraph or line breaks in practice, so the chunks are those of
+    tokenizing it at once, but for pieces cut at whitespace or mid-word.
+
+    Args:
+        content: The text to split.
+        chunk_size: Maximum number of tokens per chunk.
+        chunk_overlap: Number of tokens shared by consecutive chunks.
+        encoding: The tokenizer, with encode_ordinary and decode methods.
+            Defaults to the tiktoken encoding of the default model.
+
+    Yields:
+        The text of every chunk and its number of tokens.
+    """
+    encoding = encoding or _get_encoding(openai.DEFAULT_MODEL)
+    step = max(chunk_size - chunk_overlap, 1)
+    tokens: list[Any] = []
+    start = 0  # of the next chunk in tokens
+    for piece in _iter_pieces(content, PIECE_CHARS):
+        # Drop the tokens of the chunks already handed out, once per piece
+        del tokens[:start]
+        start = 0
+        tokens.extend(encoding.encode_ordinary(piece))
+        # A chunk is only final once tokens follow it
+        while len(tokens) - start > chunk_size:
+            end = start + chunk_size
+            yield encoding.decode(tokens[start:end]), chunk_size
+            start += step
+    if len(tokens) > start:
+        yield encoding.decode(tokens[start:]), len(tokens) - start
+
+
+@dataclass
+class ChunkStats:
+    """Counts of the chunks produced from a document, complete once the chunks
+    were consumed."""
+
+    chunks: int = 0  # split from the document
+    near_duplicate_chunks: int = 0  # skipped as nearly duplicating another
+    extracted_chunks: int = 0  # handed out for extraction
+    tokens: int = 0  # of the chunks handed out
+    truncated: bool = False  # whether the limits stopped production
+
+
+def select_chunks(
+    chunks: Iterable[tuple[str, int]],
+    stats: ChunkStats,
+    *,
+    max_chunks: int = 0,
+    max_tokens: int = 0,
+    dedup_similarity: float = 0.0,
+) -> Iterator[tuple[int, str]]:
+    """
+    Select the chunks to extract from as they are split.
+
+    Args:
+        chunks: The text and number of tokens of every chunk, in order.
+        stats: Counts updated as the chunks are consumed.
+        max_chunks: Stop after this many chunks, 0 or negative for no limit.
+        max_tokens: Stop before exceeding this many tokens, 0 or negative for
+            no limit. The first chunk is always handed out.
+        dedup_similarity: Skip the chunks nearly duplicating an earlier chunk,
+            see NearDuplicateFilter.
+
+    Yields:
+        The index and text of every chunk to extract from.
+    """
+    near_duplicates = NearDuplicateFilter(dedup_similarity)
+    for index, (text, tokens) in enumerate(chunks):
+        if (max_chunks > 0 and stats.extracted_chunks >= max_chunks) or (
+            max_tokens > 0
+            and stats.extracted_chunks  # noqa: W503
+            and stats.tokens + tokens > max_tokens  # noqa: W503
+        ):
+            stats.truncated = True
+            return
+        stats.chunks += 1
+        if near_duplicates.add(text) is not None:
+            stats.near_duplicate_chunks += 1
+            continue
+        stats.extracted_chunks += 1
+        stats.tokens += tokens
+        yield index, text
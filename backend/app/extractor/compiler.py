@@ -0,0 +1,224 @@
+# app/extractor/compiler.py
+"""Compile extractor definitions into reusable runnables.
+
+Compiling an extractor dereferences and validates its JSON schema, builds the
+prompt template, indexes its examples and binds the structured output model.
+This work only depends on the extractor definition, so compiled extractors are
+cached per extractor version and shared across every chunk and request that
+uses them.
+"""
+import json
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Hashable, Sequence
+
+from fastapi import HTTPException
+from jsonschema import Draft202012Validator, exceptions
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.runnables import Runnable
+
+from app import schemas
+from app.core.cache import digest
+from app.core.conf import openai, settings
+from app.core.governor import governed
+from app.extractor.examples import ExampleSelector, example_output, example_text
+from app.logging import console_log
+from app.utils import update_json_schema
+
+MAX_COMPILED_EXTRACTORS = 128
+
+
+def _make_example_messages(
+    examples: Sequence[Any], function_name: str
+) -> list[BaseMessage]:
+    """Encode examples as a conversation of texts and function calls."""
+    messages: list[BaseMessage] = []
+    for example in examples:
+        # TODO: We'll need to refactor this at some point to
+        # support other encoding strategies. The function calling logic here
+        # has some hard-coded assumptions (e.g., name of parameters like `data`).
+        function_call = {
+            "arguments": json.dumps(
+                {
+                    "data": example_output(example),
+                }
+            ),
+            "name": function_name,
+        }
+        messages.extend(
+            [
+                HumanMessage(
+                    content=example_text(example),
+                ),
+                AIMessage(
+                    content="", additional_kwargs={"function_call": function_call}
+                ),
+            ]
+        )
+    return messages
+
+
+def _make_prompt_template(
+    instructions: str | None,
+    examples: Sequence[Any] | None,
+    function_name: str,
+) -> ChatPromptTemplate:
+    """Make a system message from instructions and examples.
+
+    When examples is None, the prompt takes the example messages selected for
+    each text as its ``examples`` variable instead.
+    """
+    prefix = (
+        "You are a top-tier algorithm for extracting information from text. "
+        "Only extract information that is relevant to the provided text. "
+        "If no information is relevant, use the schema and output "
+        "an empty list where appropriate."
+    )
+    if instructions:
+        system_message = ("system", f"{prefix}\n\n{instructions}")
+    else:
+        system_message = ("system", prefix)
+    prompt_components: list[Any] = [system_message]
+    if examples is not None:
+        prompt_components.extend(_make_example_messages(examples, function_name))
+    else:
+        prompt_components.append(MessagesPlaceholder("examples", optional=True))
+
+    prompt_components.append(
+        (
+            "human",
+            "I need to extract information from "
+            "the following text: ```\n{text}\n```\n",
+        ),  # type: ignore
+    )
+    return ChatPromptTemplate.from_messages(prompt_components)
+
+
+@dataclass
+class CompiledExtractor:
+    """An extractor definition compiled into a ready to invoke runnable."""
+
+    key: Hashable
+    schema: dict[str, Any]
+    prompt: ChatPromptTemplate
+    runnable: Runnable
+    validator: Draft202012Validator = field(repr=False)
+    example_selector: ExampleSelector | None = field(default=None, repr=False)
+
+    def make_input(self, text: str) -> dict[str, Any]:
+        """Prompt variables for text, with the examples most similar to it."""
+        if self.example_selector is None:
+            return {"text": text}
+        examples = self.example_selector.select(text)
+        return {
+            "text": text,
+            "examples": _make_example_messages(examples, self.schema["title"]),
+        }
+
+    def validate(self, response: dict[str, Any] | None) -> schemas.ExtractorResponse:
+        """Drop extracted records that do not conform to the extractor schema."""
+        data = (response or {}).get("data") or []
+        valid = []
+        for item in data:
+            if self.validator.is_valid(item):
+                valid.append(item)
+            else:
+                console_log.warning(f"Discarding record not matching schema: {item}")
+        return {"data": valid}  # type: ignore
+
+    async def ainvoke(self, text: str) -> schemas.ExtractorResponse:
+        """Extract records from a single chunk of text."""
+        return self.validate(await self.runnable.ainvoke(self.make_input(text)))
+
+    async def abatch(
+        self, texts: Sequence[str], max_concurrency: int | None = None
+    ) -> list[schemas.ExtractorResponse]:
+        """Extract records from several chunks of text concurrently."""
+        responses = await self.runnable.abatch(
+            [self.make_input(text) for text in texts],
+            {"max_concurrency": max_concurrency},
+        )
+        return [self.validate(response) for response in responses]
+
+
+_compiled_extractors: "OrderedDict[Hashable, CompiledExtractor]" = OrderedDict()
+
+
+def compile_extractor(
+    json_schema: dict[str, Any] | None,
+    instructions: str | None,
+    examples: Sequence[Any] | None,
+    llm_name: str | None,
+    *,
+    key: Hashable | None = None,
+) -> CompiledExtractor:
+    """Compile an extractor definition, reusing a cached compilation for key.
+
+    When no key is given the definition itself is hashed, so identical
+    definitions share one compiled extractor.
+    """
+    if json_schema is None:
+        console_log.error("No schema found for the extractor.")
+        raise HTTPException(status_code=400, detail="Extractor schema is missing.")
+    if key is None:
+        key = digest(json_schema, instructions, examples, llm_name)
+
+    compiled = _compiled_extractors.get(key)
+    if compiled is not None:
+        _compiled_extractors.move_to_end(key)
+        return compiled
+
+    schema = update_json_schema(json_schema)
+    try:
+        Draft202012Validator.check_schema(schema)
+    except exceptions.ValidationError as e:
+        raise HTTPException(status_code=422, detail=f"Invalid schema: {e.message}")
+
+    # Examples are selected per text when there are more than fit in a prompt
+    example_selector = ExampleSelector(
+        examples or [],
+        k=settings.EXTRACTION_MAX_EXAMPLES,
+        max_tokens=settings.EXTRACTION_EXAMPLES_MAX_TOKENS,
+    )
+    if example_selector.selects_all:
+        prompt = _make_prompt_template(instructions, examples, schema["title"])
+        example_selector = None
+    else:
+        prompt = _make_prompt_template(instructions, None, schema["title"])
+    model = openai.get_model(llm_name)
+    # N.B. method must be consistent with examples in _make_prompt_template
+    runnable = (
+        prompt
+        | governed(  # noqa: W503
+            model.with_structured_output(schema=schema, method="function_calling")
+        )
+    ).with_config({"run_name": "extraction"})
+
+    compiled = CompiledExtractor(
+        key=key,
+        schema=schema,
+        prompt=prompt,
+        runnable=runnable,
+        validator=Draft202012Validator(schema["properties"]["data"]["items"]),
+        example_selector=example_selector,
+    )
+    _compiled_extractors[key] = compiled
+    while len(_compiled_extractors) > MAX_COMPILED_EXTRACTORS:
+        _compiled_extractors.popitem(last=False)
+    return compiled
+
+
+def get_compiled_extractor(
+    extractor: schemas.ExtractorRead,
+    examples: Sequence[Any] | None,
+    llm_name: str | None,
+) -> CompiledExtractor:
+    """Get the compiled extractor for the current version of an extractor record."""
+    return compile_extractor(
+        getattr(extractor, "json_schema", None),
+        extractor.instruction,
+        examples,
+        llm_name,
+        key=(extractor.id, extractor.updated_at, llm_name, digest(examples)),
+    )
@@ -0,0 +1,111 @@
+# app/extractor/examples.py
+"""Select the few-shot examples included in each chunk's prompt.
+
+Including every example of an extractor in every prompt makes prompts grow
+linearly with the number of curated examples. Instead, the examples of an
+extractor are indexed once (TF-IDF weighted term vectors) and each chunk's
+prompt includes the examples most similar to the chunk, up to a maximum count
+and token budget.
+"""
+import json
+import math
+import re
+from collections import Counter
+from typing import Any, Sequence
+
+from app.core.governor import estimate_tokens
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def _terms(text: str) -> Counter:
+    return Counter(_TOKEN_PATTERN.findall(text.lower()))
+
+
+def example_text(example: Any) -> str:
+    """The input text of an example record, schema or dictionary."""
+    if isinstance(example, dict):
+        return example.get("text") or example.get("content") or ""
+    return getattr(example, "text", None) or getattr(example, "content", None) or ""
+
+
+def example_output(example: Any) -> Any:
+    """The expected output of an example, decoded if it is stored as JSON text."""
+    output = example.get("output") if isinstance(example, dict) else example.output
+    if isinstance(output, str):
+        try:
+            return json.loads(output)
+        except json.JSONDecodeError:
+            pass
+    return output
+
+
+class ExampleSelector:
+    """
+    Pick the examples most similar to a text under a count and token budget.
+
+    Args:
+        examples: The examples of an extractor.
+        k: Maximum number of examples to select. 0 or negative disables the limit.
+        max_tokens: Token budget of the selected examples. 0 or negative disables the limit.
+    """
+
+    def __init__(self, examples: Sequence[Any], k: int = 0, max_tokens: int = 0):
+        self.examples = list(examples)
+        self.k = k
+        self.max_tokens = max_tokens
+        self.tokens = [
+            estimate_tokens(example_text(example))
+            + estimate_tokens(example_output(example))  # noqa: W503
+            for example in self.examples
+        ]
+        term_counts = [_terms(example_text(example)) for example in self.examples]
+        document_frequency: Counter = Counter()
+        for counts in term_counts:
+            document_frequency.update(counts.keys())
+        self.idf = {
+            term: math.log((1 + len(self.examples)) / (1 + frequency)) + 1
+            for term, frequency in document_frequency.items()
+        }
+        self.vectors = [self._weigh(counts) for counts in term_counts]
+
+    def _weigh(self, counts: Counter) -> dict[str, float]:
+        vector = {
+            term: count * self.idf[term]
+            for term, count in counts.items()
+            if term in self.idf
+        }
+        norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+        return {term: weight / norm for term, weight in vector.items()} if norm else {}
+
+    @property
+    def selects_all(self) -> bool:
+        """Whether every example always fits, so no selection is needed."""
+        return (self.k <= 0 or len(self.examples) <= self.k) and (
+            self.max_tokens <= 0 or sum(self.tokens) <= self.max_tokens
+        )
+
+    def scores(self, text: str) -> list[float]:
+        """Cosine similarity of text to each example."""
+        query = self._weigh(_terms(text))
+        return [
+            sum(weight * query.get(term, 0.0) for term, weight in vector.items())
+            for vector in self.vectors
+        ]
+
+    def select(self, text: str) -> list[Any]:
+        """Return the examples most similar to text, most similar first."""
+        if self.selects_all:
+            return self.examples
+        scores = self.scores(text)
+        ranked = sorted(range(len(self.examples)), key=lambda i: -scores[i])
+        selected: list[Any] = []
+        budget = self.max_tokens
+        for i in ranked:
+            if 0 < self.k <= len(selected):
+                break
+            if self.max_tokens > 0 and self.tokens[i] > budget:
+                continue
+            budget -= self.tokens[i]
+            selected.append(self.examples[i])
+        return selected
@@ -1,27 +1,30 @@
 # app/extractor/extraction_runnable.py
 
+import asyncio
 import json
-from typing import Any, Sequence
+from contextlib import aclosing
+from time import perf_counter
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable, Iterator, Sequence
 
-from fastapi import HTTPException
-from jsonschema import Draft202012Validator, exceptions
-
-try:
-    from langchain_text_splitters import TokenTextSplitter
-except ImportError:  # pragma: no cover
-    from langchain.text_splitter import TokenTextSplitter
-
-from langchain_core.messages import AIMessage, HumanMessage
-from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import chain
-from pydantic import BaseModel, Field, validator
 
 from app import schemas
-from app.core import conf
 from app.core.conf import openai, settings
+from app.core.metrics import llm_labels, llm_metrics
+from app.extractor.cache import (
+    cache_extraction,
+    extraction_cache_key,
+    get_cached_extraction,
+)
+from app.extractor.chunking import ChunkStats, iter_chunks, select_chunks
+from app.extractor.compiler import (  # noqa
+    CompiledExtractor,
+    _make_prompt_template,
+    compile_extractor,
+    get_compiled_extractor,
+)
 from app.logging import console_log
-from app.models import Extractor, ExtractorExample
-from app.utils import update_json_schema, validate_json_schema
+from app.models import ExtractorExample
 
 
 def _cast_example_to_dict(example: ExtractorExample) -> dict[str, Any]:
@@ -32,62 +35,123 @@ def _cast_example_to_dict(example: ExtractorExample) -> dict[str, Any]:
     }
 
 
-def _make_prompt_template(
-    instructions: str | None,
-    examples: Sequence[ExtractorExample] | None,
-    function_name: str,
-) -> ChatPromptTemplate:
-    """Make a system message from instructions and examples."""
-    prefix = (
-        "You are a top-tier algorithm for extracting information from text. "
-        "Only extract information that is relevant to the provided text. "
-        "If no information is relevant, use the schema and output "
-        "an empty list where appropriate."
+def _elapsed_ms(start: float) -> float:
+    return round((perf_counter() - start) * 1000, 2)
+
+
+def _split_document(
+    content: str, llm_name: str, stats: ChunkStats
+) -> Iterator[tuple[int, str]]:
+    """Split content lazily into the chunks to extract from, yielding their index
+    and text until MAX_CHUNKS chunks or MAX_EXTRACTION_TOKENS tokens.
+
+    Chunks nearly duplicating an earlier chunk are skipped, and counted along
+    with the chunks and whether any were dropped in stats.
+    """
+    return select_chunks(
+        iter_chunks(content, openai.get_chunk_size(llm_name), chunk_overlap=20),
+        stats,
+        max_chunks=settings.MAX_CHUNKS,
+        max_tokens=settings.MAX_EXTRACTION_TOKENS,
+        dedup_similarity=settings.CHUNK_DEDUP_SIMILARITY,
     )
-    if instructions:
-        system_message = ("system", f"{prefix}\n\n{instructions}")
-    else:
-        system_message = ("system", prefix)
-    prompt_components = [system_message]
-    if examples is not None:
-        few_shot_prompt = []
-        for example in examples:
-            # TODO: We'll need to refactor this at some point to
-            # support other encoding strategies. The function calling logic here
-            # has some hard-coded assumptions (e.g., name of parameters like `data`).
-            function_call = {
-                "arguments": json.dumps(
-                    {
-                        "data": example.output,
-                    }
-                ),
-                "name": function_name,
-            }
-            few_shot_prompt.extend(
-                [
-                    HumanMessage(
-                        content=getattr(example, "text", ""),
-                    ),
-                    AIMessage(
-                        content="", additional_kwargs={"function_call": function_call}
-                    ),
-                ]
-            )
-        prompt_components.extend(few_shot_prompt)
-
-    prompt_components.append(
-        (
-            "human",
-            "I need to extract information from "
-            "the following text: ```\n{text}\n```\n",
-        ),  # type: ignore
+
+
+def _record_chunk_stats(stats: ChunkStats) -> None:
+    """Record the chunk counts on the orchestration event of the current context."""
+    console_log.warning(
+        f"Extracted from {stats.extracted_chunks} of {stats.chunks} chunks, "
+        f"skipping {stats.near_duplicate_chunks} near duplicates"
     )
-    return ChatPromptTemplate.from_messages(prompt_components)
+    event = llm_labels.get().get("event")
+    if event is not None:
+        llm_metrics.count(
+            event,
+            chunks=stats.chunks,
+            near_duplicate_chunks=stats.near_duplicate_chunks,
+        )
+
+
+async def _iter_chunk_results(
+    compiled: CompiledExtractor,
+    chunks: Iterable[tuple[int, str]],
+    semaphore: asyncio.Semaphore | None = None,
+) -> AsyncIterator[tuple[int, schemas.ExtractorResponse]]:
+    """Run extractions concurrently, yielding (chunk index, response) as each completes.
+
+    A producer pulls the chunks from the iterator into a queue as MAX_CONCURRENCY
+    workers free up, so only the chunks in flight are held in memory however
+    long the document. Concurrency is further bounded by semaphore, which may
+    be shared by several documents. Chunks still pending when the consumer
+    stops iterating are cancelled.
+    """
+    workers = max(settings.MAX_CONCURRENCY, 1)
+    semaphore = semaphore or asyncio.Semaphore(workers)
+    pending: asyncio.Queue[tuple[int, str] | None] = asyncio.Queue(workers)
+    results: asyncio.Queue[Any] = asyncio.Queue(workers)
+
+    async def _produce() -> None:
+        for chunk in chunks:
+            await pending.put(chunk)
+        for _ in range(workers):
+            await pending.put(None)
+
+    async def _extract() -> None:
+        while (chunk := await pending.get()) is not None:
+            index, text = chunk
+            async with semaphore:
+                response = await compiled.ainvoke(text)
+            await results.put((index, response))
+        await results.put(None)
+
+    async def _run(step: Callable[[], Awaitable[None]]) -> None:
+        try:
+            await step()
+        except Exception as e:
+            await results.put(e)
+
+    tasks = [asyncio.create_task(_run(_produce))]
+    tasks += [asyncio.create_task(_run(_extract)) for _ in range(workers)]
+    try:
+        finished = 0
+        while finished < workers:
+            result = await results.get()
+            if result is None:
+                finished += 1
+            elif isinstance(result, Exception):
+                raise result
+            else:
+                yield result
+    finally:
+        for task in tasks:
+            task.cancel()
+        # Wait for the calls in flight to be torn down before returning
+        await asyncio.gather(*tasks, return_exceptions=True)
 
 
 # PUBLIC API
 
 
+class Deduplicator:
+    """Incrementally deduplicate extracted records by their serialized JSON."""
+
+    def __init__(self):
+        self.data: list[Any] = []
+        self._seen: set[str] = set()
+
+    def add(self, data_items: Sequence[Any]) -> list[Any]:
+        """Add records, returning the ones that were not seen before."""
+        unique = []
+        for data_item in data_items:
+            # Serialize the data item for comparison purposes
+            serialized = json.dumps(data_item, sort_keys=True)
+            if serialized not in self._seen:
+                self._seen.add(serialized)
+                unique.append(data_item)
+        self.data.extend(unique)
+        return unique
+
+
 def deduplicate(
     extract_responses: list[schemas.ExtractorResponse],
 ) -> schemas.ExtractorResponse:
@@ -96,28 +160,31 @@ def deduplicate(
     The deduplication is done by comparing the serialized JSON of each of the results
     and only keeping the unique ones.
     """
-    unique_extracted = []
-    seen = set()
+    deduplicator = Deduplicator()
     for response in extract_responses:
-        for data_item in response["data"]:
-            # Serialize the data item for comparison purposes
-            serialized = json.dumps(data_item, sort_keys=True)
-            if serialized not in seen:
-                seen.add(serialized)
-                unique_extracted.append(data_item)
+        deduplicator.add(response["data"])
 
     return {
-        "data": unique_extracted,  # type: ignore
+        "data": deduplicator.data,  # type: ignore
     }
 
 
+def is_complete(record: Any, required: Sequence[str]) -> bool:
+    """Whether record has a value for every required field, or for any field when
+    none are required."""
+    if not isinstance(record, dict):
+        return bool(record)
+    values = [record.get(field) for field in required] or list(record.values())
+    check = all if required else any
+    return check(value not in (None, "", [], {}) for value in values)
+
+
 def get_examples_from_extractor(
     extractor: schemas.ExtractorRead,
 ) -> list[dict[str, Any]]:
     """Get examples from an extractor."""
-    return [
-        _cast_example_to_dict(example) for example in getattr(extractor, "examples", [])
-    ]
+    examples = getattr(extractor, "extractor_examples", None) or []
+    return [_cast_example_to_dict(example) for example in examples]
 
 
 @chain
@@ -127,75 +194,149 @@ async def extraction_runnable(
     """An end point to extract content from a given text object."""
     # TODO: Add validation for model context window size
     console_log.warning(f"Extraction request: {extraction_request}")
-    schema = extraction_request.json_schema
-    console_log.warning(f"Original schema in extract_from_content: {schema}")
-    if schema is None:
-        console_log.error("No schema found for the extractor.")
-        raise HTTPException(status_code=400, detail="Extractor schema is missing.")
-    schema = update_json_schema(getattr(extraction_request, "json_schema", {}))
-    console_log.warning(f"Extracting to schema: {schema}")
-    try:
-        Draft202012Validator.check_schema(schema)
-    except exceptions.ValidationError as e:
-        raise HTTPException(status_code=422, detail=f"Invalid schema: {e.message}")
-
-    prompt = _make_prompt_template(
+    compiled = compile_extractor(
+        extraction_request.json_schema,
         getattr(extraction_request, "instructions", None),
         getattr(extraction_request, "examples", None),
-        schema["title"],
+        getattr(extraction_request, "llm_name", None),
     )
-    model = openai.get_model(getattr(extraction_request, "llm_name", None))
-    # N.B. method must be consistent with examples in _make_prompt_template
-    runnable = (
-        prompt | model.with_structured_output(schema=schema, method="function_calling")
-    ).with_config({"run_name": "extraction"})
-
-    return await runnable.ainvoke({"text": extraction_request.text})  # type: ignore
+    return await compiled.ainvoke(extraction_request.text)  # type: ignore
 
 
-async def extract_entire_document(
+async def stream_entire_document(
     content: str,
     extractor: schemas.ExtractorRead,
     llm_name: str,
-) -> schemas.ExtractorResponse:
-    """Extract from entire document."""
+    semaphore: asyncio.Semaphore | None = None,
+    *,
+    single_entity: bool = False,
+    required_fields: Sequence[str] | None = None,
+) -> AsyncIterator[dict[str, Any]]:
+    """Extract from entire document, yielding frames as chunks complete.
+
+    Each chunk yields a ``data`` frame holding the records not seen in earlier
+    chunks, followed by a final ``summary`` frame. The document is split lazily
+    as chunks are extracted from, skipping the chunks nearly duplicating an
+    earlier chunk. Pass a semaphore to bound the chunks in flight across
+    several documents.
+
+    With single_entity, extraction stops at the first record with a value for
+    every required field (those of the extractor's schema by default): no
+    further chunks are split and the chunks in flight are cancelled. The
+    complete record comes first in the data.
+    """
+    start = perf_counter()
     json_schema = getattr(extractor, "json_schema", {})
     console_log.warning(f"Extracting to schema: {json_schema}")
 
     examples = get_examples_from_extractor(extractor)
-    text_splitter = TokenTextSplitter(
-        chunk_size=openai.get_chunk_size(llm_name),
-        chunk_overlap=20,
-        model_name=openai.DEFAULT_MODEL,
+    if required_fields is None:
+        required_fields = (json_schema or {}).get("required") or []
+    cache_key = extraction_cache_key(
+        content,
+        extractor,
+        examples,
+        llm_name,
+        "entire_document",
+        chunk_dedup_similarity=settings.CHUNK_DEDUP_SIMILARITY,
+        max_chunks=settings.MAX_CHUNKS,
+        max_extraction_tokens=settings.MAX_EXTRACTION_TOKENS,
+        max_examples=settings.EXTRACTION_MAX_EXAMPLES,
+        examples_max_tokens=settings.EXTRACTION_EXAMPLES_MAX_TOKENS,
+        single_entity=list(required_fields) if single_entity else None,
     )
-    texts = text_splitter.split_text(content)
-    console_log.warning(f"Extracting from {len(texts)} chunks")
-    extraction_requests = [
-        schemas.ExtractorRequest(
-            text=text,
-            schema=json_schema,
-            instructions=extractor.instruction,  # TODO: consistent naming
-            examples=examples,
-            llm_name=llm_name,  # type: ignore
-        )
-        for text in texts
-    ]
+    cached = await get_cached_extraction(cache_key)
+    if cached is not None:
+        console_log.info(f"Extraction cache hit for extractor {extractor.id}")
+        yield {"event": "data", "chunk": None, "data": cached["data"]}
+        yield {
+            "event": "summary",
+            "content_too_long": cached.get("content_too_long", False),
+            "cached": True,
+            "timings": {"total_ms": _elapsed_ms(start)},
+        }
+        return
 
-    # Limit the number of chunks to process
-    if len(extraction_requests) > settings.MAX_CHUNKS and settings.MAX_CHUNKS > 0:
-        content_too_long = True
-        extraction_requests = extraction_requests[: settings.MAX_CHUNKS]
-    else:
-        content_too_long = False
+    compiled = get_compiled_extractor(extractor, examples, llm_name)
+    stats = ChunkStats()
+    chunks = _split_document(content, llm_name, stats)
 
     # Run extractions which may potentially yield duplicate results
-    extract_responses: Sequence[
-        schemas.ExtractorResponse
-    ] = await extraction_runnable.abatch(
-        extraction_requests, {"max_concurrency": settings.MAX_CONCURRENCY}
+    deduplicator = Deduplicator()
+    records_by_chunk: dict[int, list[Any]] = {}
+    first_entity_ms = None
+    complete = None
+    results = _iter_chunk_results(compiled, chunks, semaphore)
+    async with aclosing(results):  # cancels the chunks in flight when stopping
+        async for index, response in results:
+            unique = deduplicator.add(response["data"])
+            records_by_chunk[index] = unique
+            if unique and first_entity_ms is None:
+                first_entity_ms = _elapsed_ms(start)
+            yield {"event": "data", "chunk": index, "data": unique}
+            if single_entity:
+                complete = next(
+                    (item for item in unique if is_complete(item, required_fields)),
+                    None,
+                )
+                if complete is not None:
+                    console_log.info(f"Found a complete entity in chunk {index}")
+                    break
+    _record_chunk_stats(stats)
+    content_too_long = stats.truncated
+
+    data = [item for i in sorted(records_by_chunk) for item in records_by_chunk[i]]
+    if complete is not None:
+        data = [complete, *(item for item in data if item is not complete)]
+    await cache_extraction(
+        cache_key, {"data": data, "content_too_long": content_too_long}  # type: ignore
     )
-    # Deduplicate the results
+    yield {
+        "event": "summary",
+        "content_too_long": content_too_long,
+        "cached": False,
+        "chunks": stats.chunks,
+        "near_duplicate_chunks": stats.near_duplicate_chunks,
+        "entities": len(deduplicator.data),
+        **({"entity": complete} if single_entity else {}),
+        "timings": {
+            "first_entity_ms": first_entity_ms,
+            "total_ms": _elapsed_ms(start),
+        },
+    }
+
+
+async def extract_entire_document(
+    content: str,
+    extractor: schemas.ExtractorRead,
+    llm_name: str,
+    semaphore: asyncio.Semaphore | None = None,
+    *,
+    single_entity: bool = False,
+    required_fields: Sequence[str] | None = None,
+) -> schemas.ExtractorResponse:
+    """Extract from entire document, see stream_entire_document."""
+    frames = []
+    summary: dict[str, Any] = {}
+    async for frame in stream_entire_document(
+        content,
+        extractor,
+        llm_name,
+        semaphore,
+        single_entity=single_entity,
+        required_fields=required_fields,
+    ):
+        if frame["event"] == "data":
+            frames.append(frame)
+        else:
+            summary = frame
+    # Chunks complete out of order, keep records in document order
+    frames.sort(key=lambda frame: frame["chunk"] or 0)
+    data = [item for frame in frames for item in frame["data"]]
+    complete = summary.get("entity")
+    if complete is not None:
+        data = [complete, *(item for item in data if item is not complete)]
     return {
-        "data": deduplicate(extract_responses)["data"],
-        "content_too_long": content_too_long,  # type: ignore
+        "data": data,
+        "content_too_long": summary.get("content_too_long", False),  # type: ignore
     }
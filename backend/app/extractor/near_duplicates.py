@@ -0,0 +1,84 @@
+# app/extractor/near_duplicates.py
+"""Near-duplicate detection of the chunks of a document.
+
+Long documents repeat themselves: boilerplate on every page of a PDF, sections
+duplicated across pages, postings listed twice. Sending each copy to the model
+costs a call and only yields records the deduplicator drops afterwards.
+
+Every chunk is fingerprinted with a 64-bit SimHash of its word shingles, so
+the fraction of bits two fingerprints share estimates the similarity of their
+chunks. A chunk whose fingerprint is similar enough to the fingerprint of an
+earlier kept chunk is skipped.
+"""
+from hashlib import blake2b
+
+import numpy as np
+
+from app.extractor.search import tokenize
+
+FINGERPRINT_BITS = 64
+
+
+def _shingles(text: str, size: int) -> list[str]:
+    tokens = tokenize(text)
+    if len(tokens) <= size:
+        return [" ".join(tokens)] if tokens else []
+    windows = zip(*(tokens[offset:] for offset in range(size)))
+    return [" ".join(window) for window in windows]
+
+
+def simhash(text: str, shingle_size: int = 3) -> int:
+    """The 64-bit SimHash of the word shingles of text, 0 for empty text."""
+    shingles = _shingles(text, shingle_size)
+    if not shingles:
+        return 0
+    hashes = np.array(
+        [
+            int.from_bytes(blake2b(shingle.encode(), digest_size=8).digest(), "big")
+            for shingle in set(shingles)
+        ],
+        dtype=np.uint64,
+    )
+    # Each shingle votes for the bits set in its hash and against the others
+    bits = np.unpackbits(hashes.view(np.uint8)).reshape(-1, FINGERPRINT_BITS)
+    votes = (bits.astype(np.int64) * 2 - 1).sum(axis=0)
+    return int(np.packbits(votes > 0).view(np.uint64)[0])
+
+
+def similarity(a: int, b: int) -> float:
+    """The fraction of the bits two fingerprints share."""
+    return 1 - (a ^ b).bit_count() / FINGERPRINT_BITS
+
+
+class NearDuplicateFilter:
+    """
+    Incrementally find the chunks nearly duplicating an earlier chunk.
+
+    Args:
+        threshold: The minimum similarity of the fingerprints of two chunks for
+            the later to be a near duplicate. Set to 0 or above 1 to disable.
+        shingle_size: Number of words per shingle.
+    """
+
+    def __init__(self, threshold: float, shingle_size: int = 3):
+        self.enabled = 0 < threshold <= 1
+        self.max_distance = int((1 - threshold) * FINGERPRINT_BITS)
+        self.shingle_size = shingle_size
+        self._fingerprints: list[int] = []
+        self._indices: list[int] = []
+        self._count = 0
+
+    def add(self, chunk: str) -> int | None:
+        """Add the next chunk, returning the index of the earlier chunk it nearly
+        duplicates, or None if it is kept."""
+        index = self._count
+        self._count += 1
+        if not self.enabled:
+            return None
+        fingerprint = simhash(chunk, self.shingle_size)
+        for kept, other in zip(self._indices, self._fingerprints):
+            if (fingerprint ^ other).bit_count() <= self.max_distance:
+                return kept
+        self._fingerprints.append(fingerprint)
+        self._indices.append(index)
+        return None
@@ -1,46 +1,63 @@
-"""Convert binary input to blobs and parse them using the appropriate parser."""
+"""Convert binary input to blobs and parse them using the appropriate parser.
+
+Parsing PDFs and HTML is CPU bound and can take seconds for large documents, so
+the async API dispatches it to a bounded pool of worker processes. Large PDFs
+are split into ranges of pages parsed concurrently by several of them. Every
+task submitted to the pool holds one of as many slots as there are workers, so
+it starts running at once and its timeout covers parsing alone. Each worker
+process is subject to an address space limit, so a pathological document
+cannot stall or exhaust the API worker.
+"""
 from __future__ import annotations
 
-from typing import BinaryIO, List
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
+from typing import TYPE_CHECKING, Awaitable, BinaryIO, Callable, Iterator, List, TypeVar
 
 from fastapi import HTTPException
+from langchain_core.document_loaders import BaseBlobParser
+from langchain_core.documents import Document
+from langchain_core.documents.base import Blob
 
-try:
-    from langchain_community.document_loaders import Blob
-    from langchain_community.document_loaders.parsers import (
-        BS4HTMLParser,
-        PDFMinerParser,
-    )
+from app.core.conf import settings
+from app.core.readability import boilerplate_report, extract_main_content
+from app.extractor.cache import cache_documents, get_cached_documents
+from app.extractor.pdf import (
+    PageRangeExtractor,
+    PDFPageRangeParser,
+    count_pages,
+    extract_page_texts,
+    page_ranges,
+    pages_document,
+    parse_pdf_pages,
+)
+from app.logging import console_log
+
+if TYPE_CHECKING:
     from langchain_community.document_loaders.parsers.generic import MimeTypeBasedParser
-    from langchain_community.document_loaders.parsers.txt import TextParser
-except ImportError:  # pragma: no cover
-    from langchain.document_loaders.parsers import BS4HTMLParser, PDFMinerParser
-    from langchain.document_loaders.parsers.generic import MimeTypeBasedParser
-    from langchain.document_loaders.parsers.txt import TextParser
-    from langchain_community.document_loaders import Blob
 
-from langchain_core.documents import Document
+SUPPORTED_MIMETYPES = ["application/pdf", "text/html", "text/plain"]
 
-HANDLERS = {
-    "application/pdf": PDFMinerParser(),
-    "text/plain": TextParser(),
-    "text/html": BS4HTMLParser(),
-    # Disable for now as they rely on unstructured and there's some install
-    # issue with unstructured.
-    # from langchain.document_loaders.parsers.msword import MsWordParser
-    # "application/msword": MsWordParser(),
-    # "application/vnd.openxmlformats-officedocument.wordprocessingml.document": (
-    #     MsWordParser()
-    # ),
-}
-
-SUPPORTED_MIMETYPES = sorted(HANDLERS.keys())
+T = TypeVar("T")
 
 MAX_FILE_SIZE_MB = 10  # in MB
 
+# Uploads are copied to disk in chunks of this size, and their mime-type is
+# guessed from the first MIME_SNIFF_BYTES bytes.
+SPOOL_CHUNK_SIZE = 1024 * 1024
+MIME_SNIFF_BYTES = 8192
+
 
 def _guess_mimetype(file_bytes: bytes) -> str:
-    """Guess the mime-type of a file."""
+    """Guess the mime-type of a file from its leading bytes."""
     try:
         import magic
     except ImportError as e:
@@ -53,45 +70,308 @@ def _guess_mimetype(file_bytes: bytes) -> str:
     return mime_type
 
 
-def _get_file_size_in_mb(data: BinaryIO) -> float:
-    """Get file size in MB."""
-    data.seek(0, 2)  # Move the cursor to the end of the file
-    file_size = data.tell()
-    file_size_in_mb = file_size / (1024 * 1024)
-    data.seek(0)
-    return file_size_in_mb
+def _spool_to_file(data: BinaryIO, file: BinaryIO) -> tuple[bytes, str]:
+    """Copy data to file in chunks, enforcing the size limit.
+
+    Returns the header of the data and its sha256 digest.
+    """
+    if data.seekable():
+        data.seek(0)
+    max_size = MAX_FILE_SIZE_MB * 1024 * 1024
+    hasher = hashlib.sha256()
+    header = b""
+    size = 0
+    while chunk := data.read(SPOOL_CHUNK_SIZE):
+        size += len(chunk)
+        if size > max_size:
+            raise HTTPException(
+                status_code=413,
+                detail=f"File size exceeds the maximum limit of {MAX_FILE_SIZE_MB} MB.",
+            )
+        if len(header) < MIME_SNIFF_BYTES:
+            header += chunk[: MIME_SNIFF_BYTES - len(header)]
+        hasher.update(chunk)
+        file.write(chunk)
+    return header, hasher.hexdigest()
+
+
+class MainContentHTMLParser(BaseBlobParser):
+    """Parse HTML into the text of its main content, without the boilerplate."""
+
+    def lazy_parse(self, blob: Blob) -> Iterator[Document]:
+        content = extract_main_content(
+            blob.as_bytes(),
+            strip_boilerplate=settings.BOILERPLATE_STRIPPING,
+            min_chars=settings.BOILERPLATE_MIN_CONTENT_CHARS,
+        )
+        yield Document(
+            page_content=content.text,
+            metadata={
+                "source": blob.source,
+                "title": content.title,
+                "tokens": content.tokens,
+                "removed_tokens": content.removed_tokens,
+            },
+        )
+
+
+@lru_cache(maxsize=None)
+def get_mimetype_parser() -> MimeTypeBasedParser:
+    """Get the parser of the supported mime-types.
+
+    The parsers pull in langchain_community, so they are only imported when
+    the first document is parsed rather than when the API starts. PDFs are
+    parsed in the calling process, see parse_blob to parse them in parallel.
+    """
+    try:
+        from langchain_community.document_loaders.parsers.generic import (
+            MimeTypeBasedParser,
+        )
+        from langchain_community.document_loaders.parsers.txt import TextParser
+    except ImportError:  # pragma: no cover
+        from langchain.document_loaders.parsers.generic import MimeTypeBasedParser
+        from langchain.document_loaders.parsers.txt import TextParser
+
+    handlers = {
+        "application/pdf": PDFPageRangeParser(),
+        "text/plain": TextParser(),
+        "text/html": MainContentHTMLParser(),
+        # Disable for now as they rely on unstructured and there's some install
+        # issue with unstructured.
+        # from langchain.document_loaders.parsers.msword import MsWordParser
+        # "application/msword": MsWordParser(),
+        # "application/vnd.openxmlformats-officedocument.wordprocessingml.document": (
+        #     MsWordParser()
+        # ),
+    }
+    return MimeTypeBasedParser(handlers=handlers, fallback_parser=None)
 
 
 # PUBLIC API
 
-MIMETYPE_BASED_PARSER = MimeTypeBasedParser(
-    handlers=HANDLERS,
-    fallback_parser=None,
-)
 
+def _spool_to_blob(data: BinaryIO, file_name: str | None = None) -> Blob:
+    """Spool data to a temporary file, returning a blob backed by the file."""
+    file_name = file_name or getattr(data, "name", None)
+    suffix = Path(file_name).suffix if isinstance(file_name, str) else ""
+    fd, path = tempfile.mkstemp(prefix="upload-", suffix=suffix)
+    try:
+        with os.fdopen(fd, "wb") as file:
+            header, sha256 = _spool_to_file(data, file)
+    except BaseException:
+        Path(path).unlink(missing_ok=True)
+        raise
+    return Blob.from_path(
+        path,
+        mime_type=_guess_mimetype(header),
+        metadata={"source": file_name or path, "sha256": sha256},
+    )
+
+
+@contextmanager
+def spool_binary_input(data: BinaryIO, file_name: str | None = None) -> Iterator[Blob]:
+    """
+    Spool ingestion input to a temporary file and yield a blob backed by it.
+
+    The upload is never held in memory as a whole: it is copied to disk in
+    chunks, and parsers stream the blob from the file. The file is removed
+    when the context exits.
+    """
+    blob = _spool_to_blob(data, file_name)
+    try:
+        yield blob
+    finally:
+        Path(blob.path).unlink(missing_ok=True)  # type: ignore
+
+
+def _is_pdf(blob: Blob) -> bool:
+    return blob.mimetype == "application/pdf" and blob.path is not None
+
+
+def _pdf_parser(pool: ProcessPoolExecutor) -> PDFPageRangeParser:
+    return PDFPageRangeParser(
+        pool,
+        parts=settings.PARSER_MAX_WORKERS,
+        min_pages=settings.PARSER_PDF_MIN_PAGES_PER_RANGE,
+    )
+
+
+def parse_blob(blob: Blob) -> List[Document]:
+    """Parse a blob, splitting PDFs into ranges of pages parsed by the parser
+    processes."""
+    if _is_pdf(blob) and settings.PARSER_MAX_WORKERS > 0:
+        return _pdf_parser(_get_parser_pool()).parse(blob)
+    return get_mimetype_parser().parse(blob)
+
+
+def parse_binary_input(data: BinaryIO, file_name: str | None = None) -> List[Document]:
+    """Parse binary input, reusing the parsed documents of identical files."""
+    with spool_binary_input(data, file_name) as blob:
+        documents = get_cached_documents(blob)
+        if documents is None:
+            documents = parse_blob(blob)
+            boilerplate_report.record_documents(documents)
+            cache_documents(blob, documents)
+        return documents
+
+
+def _init_parser_process(memory_limit_mb: int) -> None:
+    """Limit the address space of a parser process."""
+    if memory_limit_mb <= 0:
+        return
+    try:
+        import resource
+
+        limit = memory_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ImportError, ValueError, OSError):  # pragma: no cover - e.g. Windows, macOS
+        pass
 
-def convert_binary_input_to_blob(data: BinaryIO) -> Blob:
-    """Convert ingestion input to blob."""
-    file_size_in_mb = _get_file_size_in_mb(data)
 
-    if file_size_in_mb > MAX_FILE_SIZE_MB:
-        raise HTTPException(
-            status_code=413,
-            detail=f"File size exceeds the maximum limit of {MAX_FILE_SIZE_MB} MB.",
+def _parse_blob(blob: Blob) -> List[Document]:
+    """Parse a blob, run in a parser process.
+
+    File backed blobs are pickled as a path, so the parser process reads the
+    file itself rather than receiving a copy of its contents.
+    """
+    return get_mimetype_parser().parse(blob)
+
+
+_parser_pool: ProcessPoolExecutor | None = None
+_parser_slots: asyncio.Semaphore | None = None
+
+
+def _get_parser_pool() -> ProcessPoolExecutor:
+    global _parser_pool
+    if _parser_pool is None:
+        _parser_pool = ProcessPoolExecutor(
+            max_workers=settings.PARSER_MAX_WORKERS,
+            # Forking a process running an event loop and threads is unsafe
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_parser_process,
+            initargs=(settings.PARSER_MEMORY_LIMIT_MB,),
         )
+    return _parser_pool
+
+
+def _discard_parser_pool(pool: ProcessPoolExecutor) -> None:
+    global _parser_pool
+    if _parser_pool is pool:
+        _parser_pool = None
+    for process in list((getattr(pool, "_processes", None) or {}).values()):
+        process.terminate()
+    pool.shutdown(wait=False, cancel_futures=True)
+
 
-    file_data = data.read()
-    mimetype = _guess_mimetype(file_data)
-    file_name = data.name
+def shutdown_parser_pool() -> None:
+    """Stop the parser processes, killing any parse still in progress."""
+    if _parser_pool is not None:
+        _discard_parser_pool(_parser_pool)
 
-    return Blob.from_data(
-        data=file_data,
-        path=file_name,
-        mime_type=mimetype,
+
+async def _in_parser_pool(
+    source: str, parse: Callable[[ProcessPoolExecutor], Awaitable[T]]
+) -> T:
+    """Run parse on the parser process pool, holding a parser slot.
+
+    parse must submit a single task to the pool, so the slots bound the tasks
+    submitted to the number of workers.
+    """
+    global _parser_slots
+    if _parser_slots is None:
+        _parser_slots = asyncio.Semaphore(settings.PARSER_MAX_WORKERS)
+
+    # Only submit to the pool while holding a slot, so the task is picked up by
+    # an idle worker and the timeout covers parsing rather than time spent
+    # queued behind other tasks.
+    async with _parser_slots:
+        pool = _get_parser_pool()
+        try:
+            return await asyncio.wait_for(parse(pool), settings.PARSER_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            # A running task cannot be cancelled, so replace the stuck processes
+            console_log.error(f"Parsing {source} timed out, restarting parsers")
+            _discard_parser_pool(pool)
+            raise HTTPException(
+                status_code=422,
+                detail=f"File could not be parsed within {settings.PARSER_TIMEOUT_SECONDS} seconds.",
+            )
+        except MemoryError:
+            raise HTTPException(
+                status_code=413,
+                detail="File is too large or complex to parse.",
+            )
+        except BrokenProcessPool:
+            console_log.error(f"Parsing {source} failed, restarting parsers")
+            _discard_parser_pool(pool)
+            raise HTTPException(
+                status_code=422,
+                detail="File could not be parsed, the parser exited unexpectedly.",
+            )
+
+
+def _submit(source: str, fn: Callable[..., T], *args) -> Awaitable[T]:
+    """Run fn(*args) in a parser process, holding a parser slot."""
+    return _in_parser_pool(
+        source, lambda pool: asyncio.wrap_future(pool.submit(fn, *args))
     )
 
 
-def parse_binary_input(data: BinaryIO) -> List[Document]:
-    """Parse binary input."""
-    blob = convert_binary_input_to_blob(data)
-    return MIMETYPE_BASED_PARSER.parse(blob)
+async def _aparse_pdf_pages(source: str, extract: PageRangeExtractor) -> List[str]:
+    """Extract the text of every page of a PDF file in the parser processes,
+    each range of pages holding its own parser slot."""
+    pages = await _submit(source, count_pages, source)
+    ranges = page_ranges(
+        pages, settings.PARSER_MAX_WORKERS, settings.PARSER_PDF_MIN_PAGES_PER_RANGE
+    )
+    tasks = [
+        asyncio.ensure_future(_submit(source, extract, source, start, stop))
+        for start, stop in ranges
+    ]
+    try:
+        texts = await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+    return [text for range_texts in texts for text in range_texts]
+
+
+async def aparse_blob(blob: Blob) -> List[Document]:
+    """Parse a blob in the parser process pool without blocking the event loop."""
+    if settings.PARSER_MAX_WORKERS <= 0:
+        return await asyncio.to_thread(get_mimetype_parser().parse, blob)
+    if _is_pdf(blob):
+        texts = await _aparse_pdf_pages(str(blob.path), extract_page_texts)
+        return [pages_document(texts, blob.source)]
+    return await _submit(blob.source or "", _parse_blob, blob)
+
+
+async def aparse_pdf_pages(
+    path: str | Path, extract: PageRangeExtractor = extract_page_texts
+) -> List[str]:
+    """Extract the text of every page of a PDF file without blocking the event
+    loop, splitting its pages into ranges parsed by the parser processes."""
+    source = str(path)
+    if settings.PARSER_MAX_WORKERS <= 0:
+        return await asyncio.to_thread(parse_pdf_pages, source, None, extract)
+    return await _aparse_pdf_pages(source, extract)
+
+
+async def aparse_binary_input(
+    data: BinaryIO, file_name: str | None = None
+) -> List[Document]:
+    """Parse binary input without blocking the event loop.
+
+    Identical files are only parsed once, later uploads are served from the
+    parsed document cache.
+    """
+    blob = await asyncio.to_thread(_spool_to_blob, data, file_name)
+    try:
+        documents = await asyncio.to_thread(get_cached_documents, blob)
+        if documents is None:
+            documents = await aparse_blob(blob)
+            boilerplate_report.record_documents(documents)
+            await asyncio.to_thread(cache_documents, blob, documents)
+        return documents
+    finally:
+        Path(blob.path).unlink(missing_ok=True)  # type: ignore
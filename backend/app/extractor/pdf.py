@@ -0,0 +1,160 @@
+# app/extractor/pdf.py
+"""Text extraction of PDFs by ranges of pages, in parallel.
+
+Layout analysis makes PDF parsing linear in the number of pages and slow, and
+resumes and reports of hundreds of pages are common. Pages are independent, so
+a large PDF is split into ranges of pages which are parsed concurrently in the
+parser processes, each opening the file itself, and their texts reassembled in
+page order. PDFs with too few pages to be worth splitting are parsed as a
+single range.
+"""
+import math
+from concurrent.futures import Executor
+from pathlib import Path
+from typing import BinaryIO, Callable, Iterator, List
+
+from langchain_core.document_loaders import BaseBlobParser
+from langchain_core.documents import Document
+from langchain_core.documents.base import Blob
+
+# Separates the text of the pages, like PDFMinerParser does
+PAGES_DELIMITER = "\n\f"
+
+PDFSource = str | Path | BinaryIO
+# Extracts the text of every page of a range of pages of a PDF
+PageRangeExtractor = Callable[[PDFSource, int, int], List[str]]
+
+
+def count_pages(source: PDFSource) -> int:
+    """The number of pages of a PDF, read from its page tree."""
+    from pdfminer.pdfdocument import PDFDocument
+    from pdfminer.pdfpage import PDFPage
+    from pdfminer.pdfparser import PDFParser
+    from pdfminer.pdftypes import resolve1
+
+    def _count(file: BinaryIO) -> int:
+        document = PDFDocument(PDFParser(file))
+        pages = resolve1(document.catalog.get("Pages"))
+        count = resolve1(pages.get("Count")) if isinstance(pages, dict) else None
+        if isinstance(count, int):
+            return count
+        return sum(1 for _ in PDFPage.create_pages(document))
+
+    if isinstance(source, (str, Path)):
+        with open(source, "rb") as file:
+            return _count(file)
+    return _count(source)
+
+
+def page_ranges(pages: int, parts: int, min_pages: int) -> list[tuple[int, int]]:
+    """Split pages into at most parts ranges of at least min_pages pages."""
+    size = max(math.ceil(pages / max(parts, 1)), min_pages, 1)
+    return [(start, min(start + size, pages)) for start in range(0, pages, size)]
+
+
+def extract_page_texts(source: PDFSource, start: int, stop: int) -> List[str]:
+    """The text of the pages start to stop (excluded) of a PDF, laid out by
+    pdfminer the way PDFMinerParser does it."""
+    from pdfminer.high_level import extract_pages
+    from pdfminer.layout import LTContainer, LTItem, LTText, LTTextBox
+
+    def _render(item: LTItem, parts: list[str]) -> None:
+        if isinstance(item, LTContainer):
+            for child in item:
+                _render(child, parts)
+        elif isinstance(item, LTText):
+            parts.append(item.get_text())
+        if isinstance(item, LTTextBox):
+            parts.append("\n")
+
+    texts = []
+    for page in extract_pages(source, page_numbers=range(start, stop)):
+        parts: list[str] = []
+        _render(page, parts)
+        texts.append("".join(parts).strip())
+    return texts
+
+
+def extract_page_texts_pypdf(source: PDFSource, start: int, stop: int) -> List[str]:
+    """The text of the pages start to stop (excluded) of a PDF, by PyPDF2."""
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(source)
+    return [reader.pages[i].extract_text() for i in range(start, stop)]
+
+
+def parse_pdf_pages(
+    source: PDFSource,
+    executor: Executor | None = None,
+    extract: PageRangeExtractor = extract_page_texts,
+    *,
+    parts: int = 1,
+    min_pages: int = 20,
+) -> List[str]:
+    """
+    Extract the text of every page of a PDF.
+
+    Args:
+        source: The path of the PDF, or the PDF itself without an executor.
+        executor: Parses ranges of pages concurrently, usually in worker
+            processes. Without it, the PDF is parsed in the calling thread.
+        extract: Extracts the text of a range of pages.
+        parts: Maximum number of ranges the pages are split into.
+        min_pages: Minimum number of pages per range, smaller PDFs are parsed
+            as one range.
+    """
+    if executor is None:
+        return extract(source, 0, count_pages(source))
+    pages = executor.submit(count_pages, source).result()
+    futures = [
+        executor.submit(extract, source, start, stop)
+        for start, stop in page_ranges(pages, parts, min_pages)
+    ]
+    try:
+        return [text for future in futures for text in future.result()]
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+def pages_document(texts: List[str], source: str | None) -> Document:
+    """One document of the texts of the pages of a PDF, like PDFMinerParser
+    parses it."""
+    return Document(
+        page_content=PAGES_DELIMITER.join(texts),
+        metadata={"source": source, "total_pages": len(texts)},
+    )
+
+
+class PDFPageRangeParser(BaseBlobParser):
+    """
+    Parse a PDF into one document, splitting its pages into ranges parsed
+    concurrently by executor.
+
+    Args:
+        executor: Parses the ranges of pages, None to parse in the calling
+            thread. Blobs not backed by a file are always parsed in it.
+        parts: Maximum number of ranges the pages are split into.
+        min_pages: Minimum number of pages per range.
+    """
+
+    def __init__(
+        self, executor: Executor | None = None, parts: int = 1, min_pages: int = 20
+    ):
+        self.executor = executor
+        self.parts = parts
+        self.min_pages = min_pages
+
+    def _parse_pages(self, blob: Blob) -> List[str]:
+        if blob.path is None or self.executor is None:
+            with blob.as_bytes_io() as file:
+                return parse_pdf_pages(file)
+        return parse_pdf_pages(
+            str(blob.path),
+            self.executor,
+            parts=self.parts,
+            min_pages=self.min_pages,
+        )
+
+    def lazy_parse(self, blob: Blob) -> Iterator[Document]:
+        yield pages_document(self._parse_pages(blob), blob.source)
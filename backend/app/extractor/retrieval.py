@@ -1,6 +1,5 @@
 # app/extractor/retrieval.py
-from operator import itemgetter
-from typing import Any, Optional
+from typing import TYPE_CHECKING, Any, Optional
 
 from fastapi import HTTPException
 
@@ -9,22 +8,77 @@ try:
 except ImportError:  # pragma: no cover
     from langchain.text_splitter import CharacterTextSplitter
 
-from langchain_community.vectorstores import FAISS
-from langchain_core.runnables import RunnableLambda
-from langchain_openai import OpenAIEmbeddings
-
-from app.extractor.extraction_runnable import (
-    deduplicate,
-    extraction_runnable,
-    get_examples_from_extractor,
+from app.core import conf
+from app.extractor.cache import (
+    cache_extraction,
+    extraction_cache_key,
+    get_cached_extraction,
 )
+from app.extractor.compiler import get_compiled_extractor
+from app.extractor.extraction_runnable import deduplicate, get_examples_from_extractor
+from app.extractor.search import hybrid_search
+from app.extractor.vector_index import vector_index_cache, vector_index_key
 from app.logging import console_log
-from app.schemas import ExtractorRead, ExtractorRequest, ExtractorResponse
+from app.schemas import ExtractorRead, ExtractorResponse
+
+if TYPE_CHECKING:
+    import numpy as np
+    from langchain_community.vectorstores import FAISS
+
+
+async def _get_vectorstore(
+    content: str, text_splitter_kwargs: dict[str, Any], chunks: list[str]
+) -> "FAISS":
+    """Get the vector index of the chunks of content, embedding them only if
+    no index of the same document and chunking is stored."""
+    from langchain_community.vectorstores import FAISS
+
+    embeddings = conf.openai.get_embeddings()
+    cache_enabled = conf.settings.VECTOR_INDEX_CACHE_MAX_ENTRIES > 0
+    key = vector_index_key(content, embeddings, text_splitter_kwargs)
+    if cache_enabled:
+        vectorstore = await vector_index_cache.aload(key, embeddings)
+        if vectorstore is not None:
+            console_log.info(f"Vector index cache hit for {key}")
+            return vectorstore
+
+    vectorstore = await FAISS.afrom_texts(
+        chunks,
+        embedding=embeddings,
+        ids=[str(i) for i in range(len(chunks))],
+    )
+    if cache_enabled:
+        await vector_index_cache.asave(key, vectorstore, chunks)
+    return vectorstore
+
 
+async def _dense_scores(
+    content: str, text_splitter_kwargs: dict[str, Any], chunks: list[str], query: str
+) -> "np.ndarray":
+    """The similarity of the embedding of every chunk to the query's."""
+    import numpy as np
+
+    vectorstore = await _get_vectorstore(content, text_splitter_kwargs, chunks)
+    query_vector = await conf.openai.get_embeddings().aembed_query(query)
+    distances, indices = vectorstore.index.search(
+        np.asarray([query_vector], dtype=np.float32), len(chunks)
+    )
+    scores = np.full(len(chunks), -float(distances.max()), dtype=np.float64)
+    found = indices[0] >= 0
+    scores[indices[0][found]] = -distances[0][found]
+    return scores
 
-def _make_extract_requests(input_dict: dict[str, Any]) -> list[ExtractorRequest]:
-    docs = input_dict.pop("text")
-    return [ExtractorRequest(text=doc.page_content, **input_dict) for doc in docs]
+
+def _retrieval_query(extractor: ExtractorRead) -> str:
+    """The extractor's description, with the title, description and property
+    names and descriptions of its schema."""
+    schema = extractor.json_schema or {}
+    parts = [extractor.description, schema.get("title"), schema.get("description")]
+    for name, field in (schema.get("properties") or {}).items():
+        parts.append(name)
+        if isinstance(field, dict):
+            parts.append(field.get("description"))
+    return " ".join(part for part in parts if isinstance(part, str) and part)
 
 
 async def extract_from_content(
@@ -38,6 +92,28 @@ async def extract_from_content(
     console_log.warning(f"Extractor: {extractor}")
     console_log.warning(f"LLM: {llm_name}")
 
+    examples = get_examples_from_extractor(extractor)
+    cache_key = extraction_cache_key(
+        content,
+        extractor,
+        examples,
+        llm_name,
+        "retrieval",
+        text_splitter_kwargs=text_splitter_kwargs,
+        max_examples=conf.settings.EXTRACTION_MAX_EXAMPLES,
+        examples_max_tokens=conf.settings.EXTRACTION_EXAMPLES_MAX_TOKENS,
+        retrieval=[
+            conf.settings.RETRIEVAL_K,
+            conf.settings.RETRIEVAL_FUSION,
+            conf.settings.RETRIEVAL_LEXICAL_WEIGHT,
+            conf.settings.RETRIEVAL_MIN_LEXICAL_COVERAGE,
+        ],
+    )
+    cached = await get_cached_extraction(cache_key)
+    if cached is not None:
+        console_log.info(f"Extraction cache hit for extractor {extractor.id}")
+        return cached
+
     if text_splitter_kwargs is None:
         text_splitter_kwargs = {
             "separator": "\n\n",
@@ -46,37 +122,9 @@ async def extract_from_content(
         }
     text_splitter = CharacterTextSplitter(**text_splitter_kwargs)
     docs = text_splitter.create_documents([content])
-    doc_contents = [doc.page_content for doc in docs]
+    chunks = [doc.page_content for doc in docs]
 
-    console_log.warning(f"Extracting from {len(docs)} chunks")
-
-    vectorstore = FAISS.from_texts(doc_contents, embedding=OpenAIEmbeddings())
-    retriever = vectorstore.as_retriever()
-
-    runnable = (
-        {
-            "text": itemgetter("query") | retriever,
-            "schema": itemgetter("schema"),
-            "instructions": lambda x: x.get("instructions"),
-            "examples": lambda x: x.get("examples"),
-            "model_name": lambda x: x.get("llm_name"),
-        }
-        | RunnableLambda(_make_extract_requests)
-        | extraction_runnable.abatch
-    )
-
-    schema = extractor.json_schema
-    examples = get_examples_from_extractor(extractor)
-    description = extractor.description or ""
-    invoke_data = {
-        "query": description,
-        "schema": schema,
-        "examples": examples,
-        "instructions": extractor.instruction,
-        "model_name": llm_name,
-    }
-
-    console_log.warning(f"Invoke data: {invoke_data}")
+    console_log.warning(f"Extracting from {len(chunks)} chunks")
 
     console_log.warning(
         f"Extractor details: ID={extractor.id}, Description={extractor.description}, Schema={extractor.json_schema}"
@@ -85,7 +133,18 @@ async def extract_from_content(
         console_log.error("Extractor schema is missing.")
         raise HTTPException(status_code=400, detail="Extractor schema is missing.")
 
-    result = await runnable.ainvoke(invoke_data)
+    compiled = get_compiled_extractor(extractor, examples, llm_name)
+    query = _retrieval_query(extractor)
+    retrieved = await hybrid_search(
+        chunks,
+        query,
+        conf.settings.RETRIEVAL_K,
+        lambda: _dense_scores(content, text_splitter_kwargs, chunks, query),
+        fusion=conf.settings.RETRIEVAL_FUSION,
+        lexical_weight=conf.settings.RETRIEVAL_LEXICAL_WEIGHT,
+        min_lexical_coverage=conf.settings.RETRIEVAL_MIN_LEXICAL_COVERAGE,
+    )
+    result = await compiled.abatch([chunks[i] for i in retrieved])
 
     console_log.warning(f"Result: {result}")
 
@@ -93,4 +152,5 @@ async def extract_from_content(
 
     console_log.warning(f"Deduped result: {deduped_res}")
 
+    await cache_extraction(cache_key, deduped_res)
     return deduped_res
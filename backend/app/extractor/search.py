@@ -0,0 +1,173 @@
+# app/extractor/search.py
+"""Hybrid lexical and vector search over the chunks of a document.
+
+Retrieval mode extracts from the chunks most relevant to the extractor rather
+than from every chunk. Chunks are ranked by BM25 and, unless the lexical
+ranking already covers the query well, by the similarity of their embeddings
+to the query. The two rankings are fused by reciprocal rank or by a weighted
+sum of their normalized scores.
+"""
+import math
+import re
+from collections import Counter
+from typing import Awaitable, Callable, Literal, Sequence
+
+import numpy as np
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Damping of reciprocal rank fusion, the value of the original paper
+RRF_K = 60
+
+Fusion = Literal["rrf", "weighted"]
+
+
+def tokenize(text: str) -> list[str]:
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """
+    Okapi BM25 index of the chunks of a document.
+
+    The postings of every term are stored in NumPy arrays sorted by term, with
+    the BM25 weight of each posting precomputed, so scoring a query only sums
+    the weights of the postings of its terms.
+
+    Args:
+        chunks: The texts to index.
+        k1: Term frequency saturation.
+        b: Document length normalization.
+    """
+
+    def __init__(self, chunks: Sequence[str], k1: float = 1.5, b: float = 0.75):
+        self.size = len(chunks)
+        self.vocabulary: dict[str, int] = {}
+        term_ids, doc_ids, counts = [], [], []
+        lengths = np.zeros(self.size, dtype=np.float32)
+        for doc_id, chunk in enumerate(chunks):
+            terms = Counter(tokenize(chunk))
+            lengths[doc_id] = sum(terms.values())
+            for term, count in terms.items():
+                term_ids.append(self.vocabulary.setdefault(term, len(self.vocabulary)))
+                doc_ids.append(doc_id)
+                counts.append(count)
+
+        sorted_terms = np.asarray(term_ids, dtype=np.int64)
+        order = np.argsort(sorted_terms, kind="stable")
+        sorted_terms = sorted_terms[order]
+        self._doc_ids = np.asarray(doc_ids, dtype=np.int64)[order]
+        self._offsets = np.searchsorted(
+            sorted_terms, np.arange(len(self.vocabulary) + 1)
+        )
+        frequencies = np.diff(self._offsets)
+        self.idf = np.log1p((self.size - frequencies + 0.5) / (frequencies + 0.5))
+        # Terms missing from every chunk, they still count in a query's coverage
+        self.unknown_idf = math.log1p((self.size + 0.5) / 0.5)
+
+        tf = np.asarray(counts, dtype=np.float32)[order]
+        average_length = float(lengths.mean()) if self.size else 0.0
+        norms = k1 * (1 - b + b * lengths / average_length) if average_length else k1
+        norms = np.broadcast_to(norms, lengths.shape)[self._doc_ids]
+        self._weights = self.idf[sorted_terms] * tf * (k1 + 1) / (tf + norms)
+
+    def _postings(self, term: str) -> slice | None:
+        term_id = self.vocabulary.get(term)
+        if term_id is None:
+            return None
+        return slice(self._offsets[term_id], self._offsets[term_id + 1])
+
+    def scores(self, query: str) -> np.ndarray:
+        """The BM25 score of every chunk for query."""
+        scores = np.zeros(self.size, dtype=np.float64)
+        for term in set(tokenize(query)):
+            postings = self._postings(term)
+            if postings is not None:
+                scores[self._doc_ids[postings]] += self._weights[postings]
+        return scores
+
+    def coverage(self, query: str) -> np.ndarray:
+        """The fraction of the query terms each chunk contains, weighted by idf
+        so that rare terms count more than common ones."""
+        matched = np.zeros(self.size, dtype=np.float64)
+        total = 0.0
+        for term in set(tokenize(query)):
+            postings = self._postings(term)
+            if postings is None:
+                total += self.unknown_idf
+                continue
+            idf = self.idf[self.vocabulary[term]]
+            total += idf
+            matched[self._doc_ids[postings]] += idf
+        return matched / total if total else matched
+
+
+def top_k(scores: np.ndarray, k: int) -> list[int]:
+    """The indices of the k highest scores, best first, ties in chunk order."""
+    order = np.argsort(-scores, kind="stable")
+    return order[:k].tolist()
+
+
+def _ranks(scores: np.ndarray) -> np.ndarray:
+    ranks = np.empty(len(scores), dtype=np.int64)
+    ranks[np.argsort(-scores, kind="stable")] = np.arange(len(scores))
+    return ranks
+
+
+def _normalize(scores: np.ndarray) -> np.ndarray:
+    low, high = scores.min(), scores.max()
+    return (scores - low) / (high - low) if high > low else np.zeros_like(scores)
+
+
+def fuse(
+    lexical: np.ndarray,
+    dense: np.ndarray,
+    fusion: Fusion = "rrf",
+    lexical_weight: float = 0.5,
+) -> np.ndarray:
+    """Combine the lexical and dense scores of the chunks into one score."""
+    if fusion == "weighted":
+        return lexical_weight * _normalize(lexical) + (1 - lexical_weight) * (
+            _normalize(dense)
+        )
+    return 1 / (RRF_K + 1 + _ranks(lexical)) + 1 / (RRF_K + 1 + _ranks(dense))
+
+
+async def hybrid_search(
+    chunks: Sequence[str],
+    query: str,
+    k: int,
+    dense_scores: Callable[[], Awaitable[np.ndarray]] | None = None,
+    *,
+    fusion: Fusion = "rrf",
+    lexical_weight: float = 0.5,
+    min_lexical_coverage: float = 1.0,
+) -> list[int]:
+    """
+    Find the k chunks most relevant to query.
+
+    Args:
+        chunks: The chunks to search.
+        query: The text to search for.
+        k: Number of chunks to return.
+        dense_scores: Computes the similarity of every chunk to the query,
+            called only when the lexical ranking is not sufficient.
+        fusion: How to combine the lexical and dense scores.
+        lexical_weight: Weight of the lexical scores in weighted fusion.
+        min_lexical_coverage: The dense scores are skipped when each of the
+            top k lexical chunks contains this fraction of the query terms.
+
+    Returns:
+        The indices of the chunks, most relevant first.
+    """
+    if k <= 0 or len(chunks) <= k:
+        return list(range(len(chunks)))
+    index = BM25Index(chunks)
+    lexical = index.scores(query)
+    best = top_k(lexical, k)
+    if dense_scores is None or (
+        lexical[best].min() > 0
+        and index.coverage(query)[best].min() >= min_lexical_coverage  # noqa: W503
+    ):
+        return best
+    return top_k(fuse(lexical, await dense_scores(), fusion, lexical_weight), k)
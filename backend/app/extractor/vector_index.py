@@ -0,0 +1,146 @@
+# Path: app/extractor/vector_index.py
+
+"""
+Persistent vector indexes of the documents extracted from in retrieval mode.
+
+Embedding the chunks of a long document is the slowest part of a retrieval
+run, so the FAISS index built for a document is stored on disk, keyed on the
+document's digest, the chunking parameters and the embeddings model. Later
+runs over the same document memory-map the stored index instead of embedding
+its chunks again.
+
+Each entry is a directory holding the index and the chunks it was built from.
+Its mtime is touched whenever it is loaded, so eviction removes the least
+recently used indexes.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from app.core.cache import DirectoryStore, digest
+from app.core.conf import settings
+from app.core.embeddings import embeddings_id
+
+if TYPE_CHECKING:
+    from langchain_community.vectorstores import FAISS
+    from langchain_core.embeddings import Embeddings
+
+_INDEX_FILE = "index.faiss"
+_CHUNKS_FILE = "chunks.json"
+
+
+def vector_index_key(
+    content: str, embeddings: Embeddings, text_splitter_kwargs: dict[str, Any]
+) -> str:
+    """Hash everything that determines the chunks and vectors of an index."""
+    return digest(
+        "vector_index", embeddings_id(embeddings), text_splitter_kwargs, content
+    )
+
+
+def _read_index(path: Path) -> Any:
+    import faiss
+
+    # Map the vectors from the file rather than reading them into memory, only
+    # flat indexes of recent FAISS versions support this without a copy.
+    flag = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+    return faiss.read_index(str(path), flag)
+
+
+class VectorIndexCache(DirectoryStore):
+    """
+    A size and TTL bounded store of FAISS indexes persisted to a directory.
+
+    Args:
+        directory: Directory the indexes are written to, created if missing.
+        ttl_seconds: Indexes older than this are treated as misses. None disables expiry.
+        max_entries: Maximum number of indexes kept on disk. None disables the limit.
+        max_bytes: Maximum total size of the indexes on disk. None disables the limit.
+    """
+
+    def load(self, key: str, embeddings: Embeddings) -> FAISS | None:
+        """Return the index stored under key, or None on a miss."""
+        from langchain_community.docstore.in_memory import InMemoryDocstore
+        from langchain_community.vectorstores import FAISS
+        from langchain_core.documents import Document
+
+        path = self._path(key)
+        try:
+            meta = json.loads((path / _CHUNKS_FILE).read_text())
+            index = _read_index(path / _INDEX_FILE)
+        except (FileNotFoundError, ValueError, RuntimeError):
+            self.misses += 1
+            return None
+
+        if self._is_expired(meta["created_at"]):
+            self.delete(key)
+            self.misses += 1
+            return None
+
+        self._touch(path)
+        self.hits += 1
+        chunks = meta["chunks"]
+        return FAISS(
+            embedding_function=embeddings,
+            index=index,
+            docstore=InMemoryDocstore(
+                {str(i): Document(page_content=chunk) for i, chunk in enumerate(chunks)}
+            ),
+            index_to_docstore_id={i: str(i) for i in range(len(chunks))},
+        )
+
+    def save(self, key: str, vectorstore: FAISS, chunks: list[str]) -> None:
+        """Store the index of chunks under key, evicting the least recently used
+        indexes if needed."""
+        import faiss
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary directory first so readers never observe partial
+        # entries
+        tmp_path = Path(tempfile.mkdtemp(dir=self.directory, prefix=".tmp-"))
+        try:
+            faiss.write_index(vectorstore.index, str(tmp_path / _INDEX_FILE))
+            (tmp_path / _CHUNKS_FILE).write_text(
+                json.dumps({"created_at": time.time(), "chunks": chunks})
+            )
+            size = sum(file.stat().st_size for file in tmp_path.iterdir())
+        except BaseException:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            raise
+        self.delete(key)
+        try:
+            os.replace(tmp_path, self._path(key))
+        except OSError:  # stored concurrently by another worker
+            shutil.rmtree(tmp_path, ignore_errors=True)
+        self._evict(size)
+
+    async def aload(self, key: str, embeddings: Embeddings) -> FAISS | None:
+        return await asyncio.to_thread(self.load, key, embeddings)
+
+    async def asave(self, key: str, vectorstore: FAISS, chunks: list[str]) -> None:
+        await asyncio.to_thread(self.save, key, vectorstore, chunks)
+
+    def _is_entry(self, entry: os.DirEntry) -> bool:
+        return entry.is_dir() and not entry.name.startswith(".tmp-")
+
+    def _size(self, entry: os.DirEntry) -> int:
+        with os.scandir(entry.path) as it:
+            return sum(file.stat().st_size for file in it if file.is_file())
+
+    def _remove(self, path: str | Path) -> None:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+vector_index_cache = VectorIndexCache(
+    settings.CACHE_PATH / "vector_indexes",
+    ttl_seconds=settings.VECTOR_INDEX_CACHE_TTL_SECONDS,
+    max_entries=settings.VECTOR_INDEX_CACHE_MAX_ENTRIES,
+    max_bytes=settings.VECTOR_INDEX_CACHE_MAX_MB * 1024 * 1024,
+)
@@ -15,7 +15,11 @@ from app.admin import admin
 from app.api.api import api_router
 from app.core import conf
 from app.core.db import create_db_and_tables
+from app.core.llm import close_model_clients, warm_model_clients
+from app.core.metrics import request_scope
 from app.core.security import create_default_superuser
+from app.core.web import close_web_clients
+from app.extractor.parsing import shutdown_parser_pool
 from app.logging import console_log, get_async_logger
 
 # Setup basic logging
@@ -66,6 +70,13 @@ async def log_requests(request: Request, call_next):
     return response
 
 
+# Label LLM calls with the route of the request they are made for
+@app.middleware("http")
+async def track_request_scope(request: Request, call_next):
+    request_scope.set(request.scope)
+    return await call_next(request)
+
+
 app.include_router(api_router)
 
 admin.mount_to(app)
@@ -78,11 +89,15 @@ async def startup_event():
     tracemalloc.start()
     await create_db_and_tables()
     await create_default_superuser()
+    warm_model_clients()
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     tracemalloc.stop()
+    shutdown_parser_pool()
+    await close_web_clients()
+    await close_model_clients()
     console_log.info("Shutting down...")
 
 
@@ -38,12 +38,36 @@ class OrchestrationEvent(Base):
     environment = Column(String)
     source_uri = Column(JSON)
     destination_uri = Column(JSON)
+    metrics = Column(JSON)  # LLM token, cost and latency rollup of the run
     pipeline_id = Column(UUID, ForeignKey("orchestration_pipelines.id"))
     orchestration_pipeline = relationship(
         "OrchestrationPipeline", back_populates="orchestration_events"
     )
 
 
+class ExtractionJob(Base):
+    """
+    Model for queued extractor runs.
+    Jobs are claimed by workers with SELECT ... FOR UPDATE SKIP LOCKED and
+    report their progress through the linked orchestration event.
+    """
+
+    __tablename__ = "extraction_jobs"
+    status = Column(String, default="pending", index=True)  # running, success, failure
+    mode = Column(String)
+    llm = Column(String)
+    text = Column(Text)
+    url = Column(String)
+    sink = Column(String)  # table extracted records are saved to, e.g. skills
+    result = Column(JSON)
+    error = Column(Text)
+    attempts = Column(Integer, default=0)
+    locked_at = Column(DateTime)
+    extractor_id = Column(UUID, ForeignKey("extractors.id"))
+    user_id = Column(UUID, ForeignKey("users.id"))
+    event_id = Column(UUID, ForeignKey("orchestration_events.id"))
+
+
 class OrchestrationPipeline(Base):
     """
     Model for ETL (Extract, Transform, Load) pipelines.
@@ -11,7 +11,6 @@ from fastapi_users import schemas
 from pydantic import UUID4, AnyHttpUrl
 from pydantic import BaseModel as _BaseModel
 from pydantic import EmailStr, Field, model_validator, validator
-from PyPDF2 import PdfReader
 
 from app import utils
 
@@ -108,6 +107,9 @@ class BaseOrchestrationEvent(BaseSchema):
     status: OrchestrationEventStatusType | None = Field(
         None, description="Status of the event"
     )
+    metrics: dict | None = Field(
+        None, description="LLM token, cost and latency rollup of the event"
+    )
     pipeline_id: UUID4 | None = Field(None, description="Pipeline ID")
 
     @validator("source_uri", "destination_uri", pre=True)
@@ -424,6 +426,8 @@ class CoverLetterCreate(BaseCoverLetter):
 
     @classmethod
     def from_bytes(cls, name: str, content: BytesIO) -> CoverLetterRead:
+        from PyPDF2 import PdfReader
+
         reader = PdfReader(content)
         text_content = []
         for page_num in range(len(reader.pages)):
@@ -547,6 +551,33 @@ class ExtractorRun(BaseSchema):
     )
 
 
+class ExtractorBatchResult(BaseSchema):
+    source: int = Field(description="Index of the source in the batch")
+    name: str | None = Field(
+        None, description="URL, file name or text index of the source"
+    )
+    data: list[Any] = Field([], description="Extracted data")
+    content_too_long: bool = Field(False, description="Content too long to extract")
+    error: str | None = Field(None, description="Error if the source failed")
+
+
+class ExtractorBatchResponse(BaseSchema):
+    event_id: UUID4 = Field(description="Orchestration event of the batch")
+    results: list[ExtractorBatchResult] = Field([], description="Results per source")
+
+
+class ExtractionJobRead(BaseRead):
+    status: OrchestrationEventStatusType = Field(description="Status of the job")
+    mode: str | None = Field(None, description="Extraction mode")
+    llm: str | None = Field(None, description="Language model used by the job")
+    sink: str | None = Field(None, description="Table extracted records are saved to")
+    result: ExtractorResponse | None = Field(None, description="Extraction result")
+    error: str | None = Field(None, description="Error of the last failed attempt")
+    attempts: int = Field(0, description="Number of times the job was claimed")
+    extractor_id: UUID4 | None = Field(None, description="Extractor ID")
+    event_id: UUID4 | None = Field(None, description="Orchestration event ID")
+
+
 class ApplicationRead(BaseRead):
     lead_id: UUID4
     user_id: UUID4
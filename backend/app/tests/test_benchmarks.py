@@ -0,0 +1,21 @@
+# Path: app/tests/test_benchmarks.py
+
+from benchmarks.pipeline import StageResult, find_regressions, run_benchmarks
+
+
+async def test_benchmark_parse_stage():
+    results = await run_benchmarks(["text-small", "pdf-small"], ["parse"], repeat=1)
+    assert [(r.corpus, r.stage, r.error) for r in results] == [
+        ("text-small", "parse", None),
+        ("pdf-small", "parse", None),
+    ]
+    assert all(r.seconds > 0 and r.items > 0 for r in results)
+
+
+def test_find_regressions():
+    baselines = {"text-small/parse": {"seconds": 1.0, "peak_mb": 10.0}}
+    fast = StageResult("text-small", "parse", 1.2, 9.0, 100, "bytes")
+    slow = StageResult("text-small", "parse", 2.0, 9.0, 100, "bytes")
+    failed = StageResult("text-small", "split", 0.0, 0.0, 0, "", "boom")
+    assert find_regressions([fast], baselines) == []
+    assert len(find_regressions([slow, failed], baselines)) == 2
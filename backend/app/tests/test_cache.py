@@ -0,0 +1,82 @@
+import os
+import time
+
+from app.core.cache import DiskCache, digest
+
+
+def test_digest():
+    assert digest("a", {"b": 1, "c": 2}) == digest("a", {"c": 2, "b": 1})
+    assert digest("a", "b") != digest("ab")
+    assert digest(b"bytes") == digest(b"bytes")
+
+
+def test_disk_cache_hit_and_miss(tmp_path):
+    cache = DiskCache(tmp_path)
+    assert cache.get("missing") is None
+    cache.set_json("key", {"data": [1, 2, 3]})
+    assert cache.get_json("key") == {"data": [1, 2, 3]}
+    assert cache.stats["hits"] == 1
+    assert cache.stats["misses"] == 1
+    assert cache.stats["entries"] == 1
+
+
+def test_disk_cache_compression(tmp_path):
+    cache = DiskCache(tmp_path, compress=True)
+    value = b"boilerplate " * 1000
+    cache.set("key", value)
+    assert cache.get("key") == value
+    assert (tmp_path / "key").stat().st_size < len(value)
+
+
+def test_disk_cache_ttl(tmp_path):
+    cache = DiskCache(tmp_path, ttl_seconds=0.01)
+    cache.set("key", b"value")
+    time.sleep(0.05)
+    assert cache.get("key") is None
+    assert not (tmp_path / "key").exists()
+
+
+def test_disk_cache_evicts_least_recently_used(tmp_path):
+    cache = DiskCache(tmp_path, max_entries=10)
+    for i in range(10):
+        cache.set(str(i), b"value")
+        os.utime(tmp_path / str(i), (i, i))
+    assert cache.get("0") == b"value"  # 0 is now the most recently used
+    cache.set("10", b"value")
+    # Evicted down to the low mark, the least recently used first
+    assert cache.evictions == 2
+    assert cache.get("1") is None and cache.get("2") is None
+    assert cache.get("0") == b"value"
+    assert cache.get("10") == b"value"
+
+
+def test_disk_cache_get_and_set_many(tmp_path):
+    cache = DiskCache(tmp_path, max_entries=10)
+    cache.set_many({str(i): str(i).encode() for i in range(12)})
+    assert len(cache.get_many([str(i) for i in range(12)])) == 9
+    assert cache.evictions == 3
+
+
+def test_disk_cache_eviction_skips_entries_removed_concurrently(tmp_path, monkeypatch):
+    cache = DiskCache(tmp_path, max_entries=1)
+    cache.set("a", b"1")
+    cache.set("b", b"2")
+    entries = cache._entries()
+    for entry in entries:  # removed by another worker after the scan
+        os.unlink(entry.path)
+    monkeypatch.setattr(cache, "_entries", lambda: entries)
+    cache.set("c", b"3")
+    assert cache.stats["entries"] == 0
+
+
+def test_disk_cache_scans_only_when_possibly_over_the_limits(tmp_path, monkeypatch):
+    cache = DiskCache(tmp_path, max_entries=10)
+    cache.set("a", b"1")
+    scans = []
+    scan = cache._scan
+    monkeypatch.setattr(cache, "_scan", lambda: scans.append(1) or scan())
+    for i in range(9):
+        cache.set(str(i), b"value")
+    assert not scans
+    cache.set("10", b"value")
+    assert len(scans) == 1
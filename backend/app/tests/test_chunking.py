@@ -0,0 +1,145 @@
+# Path: app/tests/test_chunking.py
+
+import asyncio
+
+import pytest
+
+from app.core.conf import settings
+from app.extractor.chunking import ChunkStats, iter_chunks, select_chunks
+from app.extractor.extraction_runnable import _iter_chunk_results
+
+
+class WordEncoding:
+    """Tokenize on whitespace, each word being one token."""
+
+    def encode_ordinary(self, text: str) -> list[str]:
+        return text.split()
+
+    def decode(self, tokens: list[str]) -> str:
+        return " ".join(tokens)
+
+
+def test_iter_chunks_overlaps_windows_of_tokens():
+    content = " ".join(str(i) for i in range(10))
+    chunks = list(iter_chunks(content, 4, chunk_overlap=1, encoding=WordEncoding()))
+    assert chunks == [("0 1 2 3", 4), ("3 4 5 6", 4), ("6 7 8 9", 4)]
+    assert list(iter_chunks("", 4, encoding=WordEncoding())) == []
+
+
+def test_iter_chunks_tokenizes_paragraphs_lazily(monkeypatch):
+    monkeypatch.setattr("app.extractor.chunking.PIECE_CHARS", 10)
+    encoding = WordEncoding()
+    encoded: list[str] = []
+    monkeypatch.setattr(
+        encoding, "encode_ordinary", lambda text: encoded.append(text) or text.split()
+    )
+    paragraphs = [" ".join(str(i + j) for j in range(5)) for i in range(0, 50, 5)]
+    chunks = iter_chunks("\n\n".join(paragraphs), 4, chunk_overlap=0, encoding=encoding)
+
+    assert next(chunks) == ("0 1 2 3", 4)
+    assert encoded == ["0 1 2 3 4\n\n5 6 7 8 9\n\n"]  # the first 10 characters
+    rest = list(chunks)
+    assert len(encoded) == 9 and rest[-1] == ("48 49", 2)
+    assert " ".join(text for text, _ in rest).split() == [str(i) for i in range(4, 50)]
+
+
+def test_iter_chunks_tokenizes_content_without_breaks_in_bounded_pieces(monkeypatch):
+    monkeypatch.setattr("app.extractor.chunking.PIECE_CHARS", 10)
+    encoding = WordEncoding()
+    encoded: list[str] = []
+    monkeypatch.setattr(
+        encoding, "encode_ordinary", lambda text: encoded.append(text) or text.split()
+    )
+    words = " ".join(str(i) for i in range(100))
+    chunks = list(iter_chunks(words, 4, chunk_overlap=1, encoding=encoding))
+    assert encoded and all(len(piece) <= 21 for piece in encoded)
+    assert "".join(encoded) == words
+    tokens = words.split()
+    windows = [tokens[start:][:4] for start in range(0, 97, 3)]
+    assert chunks == [(" ".join(window), len(window)) for window in windows]
+
+    encoded.clear()
+    list(iter_chunks("x" * 95, 4, encoding=encoding))
+    assert [len(piece) for piece in encoded] == [20, 20, 20, 20, 15]
+
+
+def test_select_chunks_stops_at_the_limits():
+    chunks = [(f"chunk {i}", 10) for i in range(10)]
+    stats = ChunkStats()
+    assert [i for i, _ in select_chunks(iter(chunks), stats, max_chunks=3)] == [0, 1, 2]
+    assert stats.extracted_chunks == 3 and stats.truncated
+
+    stats = ChunkStats()
+    assert len(list(select_chunks(iter(chunks), stats, max_tokens=25))) == 2
+    assert stats.tokens == 20 and stats.truncated
+
+    stats = ChunkStats()
+    assert len(list(select_chunks(iter(chunks), stats))) == 10
+    assert not stats.truncated
+
+
+def test_select_chunks_skips_near_duplicates():
+    text = "Senior Python engineer wanted to own our data pipeline, remote friendly."
+    chunks = [(text, 10), ("Free coffee and a ping pong table at the office.", 10)]
+    stats = ChunkStats()
+    selected = list(select_chunks(iter(chunks * 2), stats, dedup_similarity=0.95))
+    assert [i for i, _ in selected] == [0, 1]
+    assert stats.chunks == 4 and stats.near_duplicate_chunks == 2
+
+
+class FakeExtractor:
+    def __init__(self):
+        self.in_flight = self.max_in_flight = 0
+
+    async def ainvoke(self, text: str) -> dict:
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.001)
+        self.in_flight -= 1
+        if text == "fail":
+            raise ValueError(text)
+        return {"data": [text]}
+
+
+async def test_chunks_are_produced_as_workers_free_up(monkeypatch):
+    monkeypatch.setattr(settings, "MAX_CONCURRENCY", 2)
+    produced = []
+
+    def chunks():
+        for index in range(20):
+            produced.append(index)
+            yield index, str(index)
+
+    extractor = FakeExtractor()
+    results = _iter_chunk_results(extractor, chunks())  # type: ignore
+    async for _ in results:
+        # Only the chunks in flight and queued are split ahead of the results
+        assert len(produced) <= 5
+        break
+    await results.aclose()
+
+    extractor = FakeExtractor()
+    results = [r async for r in _iter_chunk_results(extractor, chunks())]  # type: ignore
+    assert sorted(index for index, _ in results) == list(range(20))
+    assert extractor.max_in_flight == 2
+
+
+async def test_chunks_are_extracted_without_max_concurrency(monkeypatch):
+    monkeypatch.setattr(settings, "MAX_CONCURRENCY", 0)
+    extractor = FakeExtractor()
+    chunks = iter([(0, "a"), (1, "b")])
+    results = _iter_chunk_results(extractor, chunks)  # type: ignore
+    done = await asyncio.wait_for(_collect(results), timeout=1)
+    assert sorted(done) == [(0, {"data": ["a"]}), (1, {"data": ["b"]})]
+    assert extractor.max_in_flight == 1
+
+
+async def _collect(results):
+    return [result async for result in results]
+
+
+async def test_failing_chunks_fail_the_extraction():
+    chunks = [(0, "ok"), (1, "fail"), (2, "ok")]
+    with pytest.raises(ValueError):
+        async for _ in _iter_chunk_results(FakeExtractor(), iter(chunks)):  # type: ignore
+            pass
@@ -0,0 +1,36 @@
+# Path: app/tests/test_db.py
+
+from sqlalchemy import (
+    JSON,
+    Column,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    create_engine,
+    inspect,
+)
+
+from app.core.db import _add_missing_columns
+
+
+def test_add_missing_columns():
+    engine = create_engine("sqlite://")
+    created = MetaData()
+    Table("events", created, Column("id", Integer, primary_key=True))
+    created.create_all(engine)
+
+    metadata = MetaData()
+    Table(
+        "events",
+        metadata,
+        Column("id", Integer, primary_key=True),
+        Column("metrics", JSON, nullable=True),
+        Column("name", String, nullable=False),
+    )
+    with engine.begin() as conn:
+        _add_missing_columns(conn, metadata)
+        _add_missing_columns(conn, metadata)  # columns are only added once
+
+    columns = [column["name"] for column in inspect(engine).get_columns("events")]
+    assert columns == ["id", "metrics"]  # required columns cannot be added
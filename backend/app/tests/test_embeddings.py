@@ -0,0 +1,64 @@
+# Path: app/tests/test_embeddings.py
+
+from app.core.cache import digest
+from app.core.embeddings import CachedEmbeddings, VectorStore, _to_bytes, embeddings_id
+from app.core.fake_llm import HashingEmbeddings
+
+
+class CountingEmbeddings(HashingEmbeddings):
+    def __init__(self):
+        super().__init__(size=8)
+        self.batches: list[list[str]] = []
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.batches.append(texts)
+        return super().embed_documents(texts)
+
+
+async def test_cached_embeddings_batch_and_deduplicate(tmp_path):
+    inner = CountingEmbeddings()
+    embeddings = CachedEmbeddings(inner, VectorStore(tmp_path), batch_size=2)
+    texts = ["apply now", "witcher wanted", "apply now", "equal opportunity"]
+
+    vectors = await embeddings.aembed_documents(texts)
+    assert len(vectors) == 4 and vectors[0] == vectors[2]
+    assert sorted(map(len, inner.batches)) == [1, 2]  # 3 distinct texts
+
+    assert embeddings.embed_documents(texts[::-1]) == vectors[::-1]
+    assert len(inner.batches) == 2  # served from the cache
+    assert embeddings_id(embeddings) == embeddings_id(inner)
+
+
+def test_cached_embeddings_without_cache():
+    inner = CountingEmbeddings()
+    embeddings = CachedEmbeddings(inner, None)
+    embeddings.embed_documents(["a", "a", "b"])
+    embeddings.embed_documents(["a"])
+    assert inner.batches == [["a", "b"], ["a"]]
+
+
+def test_vector_store_compaction(tmp_path):
+    keys = [digest(i) for i in range(12)]
+    # Records of 76 bytes, the shard is compacted to 9 records past 10
+    store = VectorStore(tmp_path, shards=1, max_bytes=760)
+    for i, key in enumerate(keys):
+        store.set_many({key: _to_bytes([float(i)] * 8)})
+    assert [path.name for path in tmp_path.iterdir()] == ["00.f32"]
+    assert store.stats["evictions"] == 2
+    assert store.stats["entries"] == 10 and store.stats["bytes"] == 760
+
+    values = VectorStore(tmp_path, shards=1).get_many(keys)
+    assert list(values) == keys[2:]  # the oldest were evicted
+    assert values[keys[5]] == _to_bytes([5.0] * 8)
+
+
+def test_vector_store_reads_appends_of_other_workers(tmp_path):
+    reader, writer = VectorStore(tmp_path), VectorStore(tmp_path)
+    key = "ab" * 32
+    assert reader.get_many([key]) == {}
+    writer.set_many({key: _to_bytes([1.0, 2.0])})
+    assert reader.get_many([key]) == {key: _to_bytes([1.0, 2.0])}
+    assert reader.stats["hits"] == 1 and reader.stats["entries"] == 1
+
+    reader.clear()
+    assert writer.get_many([key]) == {}
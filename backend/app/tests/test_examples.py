@@ -0,0 +1,52 @@
+# Path: app/tests/test_examples.py
+
+from app.core.conf import settings
+from app.extractor.compiler import compile_extractor
+from app.extractor.examples import ExampleSelector
+
+EXAMPLES = [
+    {
+        "text": "Geralt of Rivia hunts monsters for coin.",
+        "output": '[{"name": "Geralt"}]',
+    },
+    {
+        "text": "Yennefer of Vengerberg is a sorceress.",
+        "output": [{"name": "Yennefer"}],
+    },
+    {"text": "Dandelion sings ballads in taverns.", "output": [{"name": "Dandelion"}]},
+]
+
+SCHEMA = {
+    "title": "Person",
+    "type": "object",
+    "properties": {"name": {"type": "string"}},
+}
+
+
+def test_example_selector_picks_most_similar():
+    selector = ExampleSelector(EXAMPLES, k=1)
+    assert not selector.selects_all
+    assert selector.select("A sorceress from Vengerberg") == [EXAMPLES[1]]
+    assert selector.select("Monsters hunted for coin")[0] is EXAMPLES[0]
+
+
+def test_example_selector_token_budget():
+    max_tokens = max(ExampleSelector(EXAMPLES).tokens)
+    selector = ExampleSelector(EXAMPLES, k=3, max_tokens=max_tokens)
+    assert selector.select("Dandelion the bard sings") == [EXAMPLES[2]]
+
+
+def test_compiled_extractor_selects_examples_per_text(monkeypatch):
+    monkeypatch.setattr(settings, "EXTRACTION_MAX_EXAMPLES", 1)
+    compiled = compile_extractor(SCHEMA, None, EXAMPLES, None, key="top-1")
+    messages = compiled.prompt.format_messages(
+        **compiled.make_input("Ballads sung in taverns")
+    )
+    assert [m.content for m in messages[1:2]] == [EXAMPLES[2]["text"]]
+    assert len(messages) == 4  # system, example text, example call, text
+
+    monkeypatch.setattr(settings, "EXTRACTION_MAX_EXAMPLES", 5)
+    compiled = compile_extractor(SCHEMA, None, EXAMPLES, None, key="all")
+    assert compiled.example_selector is None  # every example fits
+    call = compiled.prompt.format_messages(text="x")[2].additional_kwargs
+    assert call["function_call"]["arguments"] == '{"data": [{"name": "Geralt"}]}'
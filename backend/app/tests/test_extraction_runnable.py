@@ -0,0 +1,118 @@
+# Path: app/tests/test_extraction_runnable.py
+
+import asyncio
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+
+from app.core.conf import openai, settings
+from app.extractor import extraction_runnable
+from app.extractor.cache import extraction_cache_key
+from app.extractor.extraction_runnable import extract_entire_document, is_complete
+
+LEADS = {
+    "0": [{"title": "Witcher", "url": None}],
+    "1": [{"title": "Witcher", "url": "https://kaermorhen.example/jobs/1"}],
+}
+
+
+class FakeExtractor:
+    def __init__(self):
+        self.invoked: list[str] = []
+        self.cancelled: list[str] = []
+
+    async def ainvoke(self, text: str) -> dict:
+        self.invoked.append(text)
+        try:
+            # Later chunks take longer, so chunk 1 completes while they run
+            await asyncio.sleep(0.01 * (int(text) + 1))
+        except asyncio.CancelledError:
+            self.cancelled.append(text)
+            raise
+        return {"data": LEADS.get(text, [{"title": f"Lead {text}", "url": None}])}
+
+
+@pytest.fixture
+def fake_extractor(monkeypatch) -> FakeExtractor:
+    compiled = FakeExtractor()
+    produced = []
+
+    def _split_document(content, llm_name, stats):
+        for index in range(20):
+            produced.append(index)
+            stats.chunks += 1
+            yield index, str(index)
+
+    async def _no_cache(*args):
+        return None
+
+    monkeypatch.setattr(settings, "MAX_CONCURRENCY", 3)
+    monkeypatch.setattr(extraction_runnable, "_split_document", _split_document)
+    monkeypatch.setattr(extraction_runnable, "get_cached_extraction", _no_cache)
+    monkeypatch.setattr(extraction_runnable, "cache_extraction", _no_cache)
+    monkeypatch.setattr(
+        extraction_runnable, "get_compiled_extractor", lambda *args: compiled
+    )
+    compiled.produced = produced  # type: ignore
+    return compiled
+
+
+def _extractor(json_schema: dict) -> Any:
+    return SimpleNamespace(
+        id=1, json_schema=json_schema, instruction="", description="", examples=[]
+    )
+
+
+def test_is_complete():
+    assert is_complete({"title": "Witcher", "url": "u"}, ["title", "url"])
+    assert not is_complete({"title": "Witcher", "url": ""}, ["title", "url"])
+    assert is_complete({"title": "Witcher", "url": None}, [])
+    assert not is_complete({"title": None}, [])
+
+
+async def test_single_entity_stops_at_the_first_complete_record(fake_extractor):
+    result = await extract_entire_document(
+        "content",
+        _extractor({"required": ["url"]}),
+        "gpt-3.5-turbo",
+        single_entity=True,
+        required_fields=["title", "url"],
+    )
+    assert result["data"][0] == LEADS["1"][0]
+    assert len(fake_extractor.invoked) < 20
+    assert len(fake_extractor.produced) < 20  # type: ignore
+    assert fake_extractor.cancelled  # chunks in flight were cancelled
+
+
+async def test_entire_document_without_single_entity(fake_extractor):
+    result = await extract_entire_document("content", _extractor({}), "gpt-3.5-turbo")
+    assert len(fake_extractor.invoked) == 20
+    assert result["data"][0] == LEADS["0"][0]
+
+
+async def test_cache_key_depends_on_the_examples_limits(fake_extractor, monkeypatch):
+    keys = []
+
+    async def _get_cached_extraction(key):
+        keys.append(key)
+
+    monkeypatch.setattr(
+        extraction_runnable, "get_cached_extraction", _get_cached_extraction
+    )
+    for max_examples in (5, 5, 2):
+        monkeypatch.setattr(settings, "EXTRACTION_MAX_EXAMPLES", max_examples)
+        await extract_entire_document("content", _extractor({}), "gpt-3.5-turbo")
+    assert keys[0] == keys[1] != keys[2]
+
+
+def test_cache_key_depends_on_the_backend(monkeypatch):
+    def _key() -> str:
+        return extraction_cache_key(
+            "content", _extractor({}), [], "gpt-3.5-turbo", "entire_document"
+        )
+
+    monkeypatch.setattr(openai, "BACKEND", "openai")
+    real = _key()
+    monkeypatch.setattr(openai, "BACKEND", "fake")
+    assert _key() != real
@@ -0,0 +1,213 @@
+# Path: app/tests/test_extractor_streams.py
+
+import asyncio
+import json
+import uuid
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import anyio
+import pytest
+
+from app import schemas
+from app.api import deps
+
+FAILED = schemas.OrchestrationEventStatusType.FAILED
+SUCCESS = schemas.OrchestrationEventStatusType.SUCCESS
+
+
+class FakeEvents:
+    """Stand in for the orchestration events of the database."""
+
+    def __init__(self):
+        self.event = SimpleNamespace(id=uuid.uuid4())
+        self.created: list[schemas.OrchestrationEventCreate] = []
+        self.updates: list[schemas.OrchestrationEventUpdate] = []
+
+    async def create(self, payload, *args, **kwargs):
+        self.created.append(payload)
+        return self.event
+
+    async def update(self, event_id, payload, db):
+        # Yield to the event loop, as the database would
+        await asyncio.sleep(0.01)
+        self.updates.append(payload)
+
+
+@pytest.fixture
+def events(monkeypatch) -> FakeEvents:
+    events = FakeEvents()
+
+    async def _pipeline(*args):
+        return SimpleNamespace(id=uuid.uuid4())
+
+    async def _text(payload):
+        return payload.text
+
+    @asynccontextmanager
+    async def _session_context():
+        yield None
+
+    monkeypatch.setattr(deps, "_get_or_create_extractor_pipeline", _pipeline)
+    monkeypatch.setattr(deps, "_load_extraction_text", _text)
+    monkeypatch.setattr(deps, "_create_extraction_event", events.create)
+    monkeypatch.setattr(deps, "create_orchestration_event", events.create)
+    monkeypatch.setattr(deps, "update_orchestration_event", events.update)
+    monkeypatch.setattr(deps, "session_context", _session_context)
+    return events
+
+
+EXTRACTOR = SimpleNamespace(id=1, name="witchers")
+USER = SimpleNamespace(id=1)
+
+
+def _payload(mode: str = "entire_document") -> schemas.ExtractorRun:
+    return schemas.ExtractorRun(mode=mode, text="Geralt of Rivia, witcher.")
+
+
+def _fake_stream(frames: int, closed: list[bool], fail: bool = False):
+    async def _stream(text, extractor, llm):
+        try:
+            for chunk in range(frames):
+                await asyncio.sleep(0.01)
+                yield {"event": "data", "chunk": chunk, "data": [{"name": "Geralt"}]}
+            if fail:
+                raise ValueError("model unavailable")
+            yield {"event": "summary", "content_too_long": False}
+        finally:
+            closed.append(True)
+
+    return _stream
+
+
+async def test_stream_extractor_frames(events, monkeypatch):
+    closed: list[bool] = []
+    monkeypatch.setattr(deps, "stream_entire_document", _fake_stream(2, closed))
+    frames = await deps.stream_extractor(EXTRACTOR, _payload(), USER)  # type: ignore
+    lines = [json.loads(line) async for line in frames]
+
+    assert [line["event"] for line in lines] == ["data", "data", "summary"]
+    assert {line["event_id"] for line in lines} == {str(events.event.id)}
+    assert [update.status for update in events.updates] == [SUCCESS]
+
+
+async def test_stream_extractor_error_frame(events, monkeypatch):
+    closed: list[bool] = []
+    stream = _fake_stream(1, closed, fail=True)
+    monkeypatch.setattr(deps, "stream_entire_document", stream)
+    frames = await deps.stream_extractor(EXTRACTOR, _payload(), USER)  # type: ignore
+    lines = [json.loads(line) async for line in frames]
+
+    assert lines[-1] == {"event": "error", "detail": "model unavailable"}
+    assert [update.status for update in events.updates] == [FAILED]
+
+
+async def test_stream_extractor_closed_by_client(events, monkeypatch):
+    closed: list[bool] = []
+    monkeypatch.setattr(deps, "stream_entire_document", _fake_stream(5, closed))
+    frames = await deps.stream_extractor(EXTRACTOR, _payload(), USER)  # type: ignore
+    assert json.loads(await frames.__anext__())["chunk"] == 0
+    await frames.aclose()
+
+    assert closed == [True]  # the extraction stream was closed too
+    assert [update.status for update in events.updates] == [FAILED]
+    assert "cancelled" in events.updates[0].message
+
+
+async def test_stream_extractor_cancelled_by_client(events, monkeypatch):
+    closed: list[bool] = []
+    monkeypatch.setattr(deps, "stream_entire_document", _fake_stream(5, closed))
+    frames = await deps.stream_extractor(EXTRACTOR, _payload(), USER)  # type: ignore
+
+    async def _consume():
+        async for _ in frames:
+            pass
+
+    # Like StreamingResponse when the client disconnects
+    async with anyio.create_task_group() as group:
+        group.start_soon(_consume)
+        await anyio.sleep(0.015)
+        group.cancel_scope.cancel()
+
+    assert closed == [True]
+    # The update was awaited to completion despite the cancellation
+    assert [update.status for update in events.updates] == [FAILED]
+
+
+class FakeSources:
+    """Extract from the texts of a batch, failing on "fail"."""
+
+    def __init__(self):
+        self.cancelled: list[str] = []
+
+    async def execute(self, extractor, mode, text, llm, semaphore=None):
+        try:
+            await asyncio.sleep(0.01 * len(text))
+        except asyncio.CancelledError:
+            self.cancelled.append(text)
+            raise
+        if text == "fail":
+            raise ValueError("model unavailable")
+        return {"data": [{"name": text}]}
+
+
+@pytest.fixture
+def sources(events, monkeypatch) -> FakeSources:
+    sources = FakeSources()
+    monkeypatch.setattr(deps, "execute_extraction", sources.execute)
+    return sources
+
+
+def _batch(*texts: str) -> list[schemas.ExtractorRun]:
+    return [schemas.ExtractorRun(mode="entire_document", text=t) for t in texts]
+
+
+async def test_batch_frames(sources, events):
+    frames = await deps.run_extractor_batch(
+        EXTRACTOR, _batch("Geralt", "fail", "Ciri"), USER, destination="witchers"  # type: ignore
+    )
+    results = [frame async for frame in frames]
+
+    summary = results.pop()
+    assert summary["event"] == "summary"
+    assert (summary["sources"], summary["failed"], summary["entities"]) == (3, 1, 2)
+    assert [frame["source"] for frame in results] == [1, 2, 0]  # as completed
+    assert [frame["name"] for frame in results] == ["text[1]", "text[2]", "text[0]"]
+    assert results[0]["error"] == "model unavailable"
+    assert events.created[0].destination_uri.name.endswith("#witchers")
+    assert [update.status for update in events.updates] == [SUCCESS]
+
+
+async def test_batch_of_failing_sources_fails(sources, events):
+    frames = await deps.run_extractor_batch(EXTRACTOR, _batch("fail"), USER)  # type: ignore
+    assert [frame["event"] async for frame in frames] == ["result", "summary"]
+    assert [update.status for update in events.updates] == [FAILED]
+
+
+async def test_batch_closed_by_client(sources, events):
+    frames = await deps.run_extractor_batch(
+        EXTRACTOR, _batch("Ciri", "Geralt of Rivia"), USER  # type: ignore
+    )
+    assert (await frames.__anext__())["source"] == 0
+    await frames.aclose()
+
+    assert sources.cancelled == ["Geralt of Rivia"]
+    assert [update.status for update in events.updates] == [FAILED]
+
+
+async def test_batch_cancelled_by_client(sources, events):
+    frames = await deps.run_extractor_batch(
+        EXTRACTOR, _batch("Ciri", "Geralt of Rivia"), USER  # type: ignore
+    )
+
+    async def _consume():
+        async for _ in frames:
+            pass
+
+    async with anyio.create_task_group() as group:
+        group.start_soon(_consume)
+        await anyio.sleep(0.06)
+        group.cancel_scope.cancel()
+
+    assert sources.cancelled == ["Geralt of Rivia"]
+    assert [update.status for update in events.updates] == [FAILED]
@@ -0,0 +1,83 @@
+# Path: app/tests/test_fake_llm.py
+
+import random
+
+import httpx
+import pytest
+from jsonschema import validate
+from langchain_openai import ChatOpenAI
+
+from app.core.fake_llm import (
+    FakeChatModel,
+    FakeLLMError,
+    HashingEmbeddings,
+    fake_value,
+    stand_in,
+)
+
+SCHEMA = {
+    "title": "Witcher",
+    "type": "object",
+    "properties": {
+        "name": {"type": "string"},
+        "school": {"enum": ["Wolf", "Cat", "Griffin"]},
+        "age": {"type": "integer", "minimum": 18, "maximum": 300},
+        "contracts": {"type": "array", "items": {"$ref": "#/$defs/Contract"}},
+    },
+    "$defs": {
+        "Contract": {
+            "type": "object",
+            "properties": {
+                "monster": {"type": "string"},
+                "reward": {"type": ["number", "null"]},
+                "completed_on": {"type": "string", "format": "date"},
+            },
+        }
+    },
+}
+
+
+def test_fake_value_conforms_to_schema():
+    for seed in range(20):
+        validate(fake_value(SCHEMA, random.Random(seed)), SCHEMA)
+
+
+async def test_fake_chat_model_structured_output_is_deterministic():
+    model = FakeChatModel(model_name="gpt-3.5-turbo").with_structured_output(SCHEMA)
+    first = await model.ainvoke("Geralt of Rivia, school of the Wolf")
+    validate(first, SCHEMA)
+    assert await model.ainvoke("Geralt of Rivia, school of the Wolf") == first
+    assert await model.ainvoke("Lambert, school of the Wolf") != first
+
+
+async def test_fake_chat_model_simulates_errors():
+    model = FakeChatModel(error_rate=1.0)
+    with pytest.raises(FakeLLMError):
+        await model.ainvoke("Who hunts monsters?")
+
+
+async def test_stand_in_serves_openai_client():
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=stand_in))
+    model = ChatOpenAI(
+        model="gpt-3.5-turbo",
+        api_key="sk-test",  # type: ignore
+        base_url="http://stand-in/v1",
+        http_async_client=client,
+        max_retries=0,
+    )
+    structured = model.with_structured_output(SCHEMA, method="function_calling")
+    validate(await structured.ainvoke("Geralt of Rivia"), SCHEMA)
+    assert (await model.ainvoke("Geralt of Rivia")).usage_metadata["input_tokens"] > 0
+
+
+def test_hashing_embeddings_similarity():
+    embeddings = HashingEmbeddings(size=64)
+    query = embeddings.embed_query("witcher monster contract")
+    similar, unrelated = embeddings.embed_documents(
+        ["a monster contract for a witcher", "bread recipe with flour"]
+    )
+
+    def dot(a, b):
+        return sum(x * y for x, y in zip(a, b))
+
+    assert dot(query, similar) > dot(query, unrelated)
@@ -0,0 +1,62 @@
+import asyncio
+
+from app.core.governor import LLMGovernor, TokenBucket
+
+
+async def test_governor_bounds_in_flight_calls():
+    governor = LLMGovernor(max_in_flight=2)
+    peak = 0
+
+    async def call():
+        nonlocal peak
+        async with governor.slot():
+            peak = max(peak, governor.in_flight)
+            await asyncio.sleep(0.01)
+
+    await asyncio.gather(*[call() for _ in range(10)])
+    assert peak == 2
+    assert governor.in_flight == 0
+    assert governor.waiting == 0
+
+
+async def test_governor_serves_users_round_robin():
+    governor = LLMGovernor(max_in_flight=1)
+    order = []
+
+    async def call(user):
+        async with governor.slot(user=user):
+            order.append(user)
+            await asyncio.sleep(0)
+
+    # The first user queues many calls before the second user queues one
+    tasks = [asyncio.create_task(call("a")) for _ in range(4)]
+    tasks.append(asyncio.create_task(call("b")))
+    await asyncio.gather(*tasks)
+    assert order.index("b") <= 2
+
+
+async def test_governor_releases_cancelled_waiters():
+    governor = LLMGovernor(max_in_flight=1)
+    release = asyncio.Event()
+
+    async def hold():
+        async with governor.slot():
+            await release.wait()
+
+    holder = asyncio.create_task(hold())
+    await asyncio.sleep(0)
+    waiter = asyncio.create_task(hold())
+    await asyncio.sleep(0)
+    waiter.cancel()
+    release.set()
+    await holder
+    assert governor.in_flight == 0
+    async with governor.slot():
+        assert governor.in_flight == 1
+
+
+def test_token_bucket_delay():
+    bucket = TokenBucket(per_minute=60)
+    assert bucket.delay(10) == 0
+    bucket.consume(60)
+    assert 0.9 < bucket.delay(1) <= 1.0
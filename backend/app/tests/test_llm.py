@@ -0,0 +1,75 @@
+# Path: app/tests/test_llm.py
+
+import asyncio
+
+import httpx
+import pytest
+
+from app.core import conf
+from app.core.llm import ModelRegistry
+
+
+@pytest.fixture
+def registry(monkeypatch) -> ModelRegistry:
+    monkeypatch.setattr(conf.openai, "BACKEND", "openai")
+    return ModelRegistry()
+
+
+async def test_models_are_created_once_and_share_http_clients(registry):
+    first = registry.get_model("gpt-3.5-turbo")
+    assert registry.get_model("gpt-3.5-turbo") is first
+    other = registry.get_model("gpt-4-0125-preview")
+    assert other is not first
+    assert first.http_async_client is other.http_async_client  # type: ignore
+    assert first.http_async_client is registry.async_http_client  # type: ignore
+    assert registry.get_embeddings() is registry.get_embeddings()
+
+    await registry.close()
+    assert registry.get_model("gpt-3.5-turbo") is not first
+
+
+async def test_backend_change_creates_new_models(registry, monkeypatch):
+    real = registry.get_model("gpt-3.5-turbo")
+    monkeypatch.setattr(conf.openai, "BACKEND", "fake")
+    fake = registry.get_model("gpt-3.5-turbo")
+    assert fake is not real and fake._llm_type == "fake"
+
+
+async def test_warm_opens_connections(registry):
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, json={"data": []})
+
+    registry._async_http_client = httpx.AsyncClient(
+        transport=httpx.MockTransport(handler)
+    )
+    await registry.warm(2)
+    assert len(requests) == 2
+    assert requests[0].url.path.endswith("/models")
+    await registry.close()
+
+
+async def test_warm_in_background_does_not_wait_for_the_provider(registry):
+    started = asyncio.Event()
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        assert request.extensions["timeout"]["read"] == 0.5
+        started.set()
+        await asyncio.sleep(60)  # an unresponsive provider
+        return httpx.Response(200)
+
+    registry._async_http_client = httpx.AsyncClient(
+        transport=httpx.MockTransport(handler)
+    )
+    registry.warm_in_background(1, timeout=0.5)
+    await asyncio.wait_for(started.wait(), timeout=1)
+    await asyncio.wait_for(registry.close(), timeout=1)  # cancels the warm up
+
+
+def test_supported_models_does_not_create_clients(monkeypatch):
+    from app.core.llm import model_registry
+
+    monkeypatch.setattr(model_registry, "_create_model", None)
+    assert "gpt-3.5-turbo" in conf.openai.SUPPORTED_MODELS
@@ -0,0 +1,65 @@
+# Path: app/tests/test_metrics.py
+
+import pytest
+from langchain_core.language_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+
+from app.core.conf import openai
+from app.core.governor import governed, llm_user
+from app.core.metrics import llm_metrics, set_llm_labels
+
+
+@pytest.fixture(autouse=True)
+def metrics():
+    llm_metrics.reset()
+    yield llm_metrics
+    llm_metrics.reset()
+
+
+def _fake_model(count: int) -> GenericFakeChatModel:
+    usage = {"input_tokens": 120, "output_tokens": 30, "total_tokens": 150}
+    return GenericFakeChatModel(
+        messages=iter(
+            AIMessage(content="Geralt", usage_metadata=usage) for _ in range(count)
+        )
+    )
+
+
+async def test_governed_calls_are_recorded(metrics):
+    llm_user.set("geralt")
+    set_llm_labels(extractor="witchers", event="event-1")
+    model = governed(_fake_model(2))
+    await model.ainvoke("Who hunts monsters?")
+    await model.ainvoke("Who hunts monsters for coin?")
+
+    stats = metrics.stats
+    assert stats["total"]["calls"] == 2
+    assert stats["total"]["prompt_tokens"] == 240
+    assert stats["total"]["completion_tokens"] == 60
+    assert stats["by_user"]["geralt"]["calls"] == 2
+    assert stats["by_extractor"]["witchers"]["total_tokens"] == 300
+
+    event = metrics.pop_event("event-1")
+    assert event is not None and event["calls"] == 2
+    assert metrics.pop_event("event-1") is None
+
+
+def test_event_counts_are_reported_with_the_event(metrics):
+    metrics.count("event-1", chunks=4, near_duplicate_chunks=1)
+    metrics.count("event-1", chunks=2, near_duplicate_chunks=0)
+    event = metrics.pop_event("event-1")
+    assert event is not None and event["calls"] == 0
+    assert event["chunks"] == 6 and event["near_duplicate_chunks"] == 1
+    assert metrics.pop_event("event-1") is None
+
+
+async def test_failed_calls_are_recorded(metrics):
+    model = governed(_fake_model(0))
+    with pytest.raises(Exception):
+        await model.ainvoke("Who hunts monsters?")
+    assert metrics.stats["total"]["errors"] == 1
+
+
+def test_get_cost():
+    assert openai.get_cost("gpt-3.5-turbo", 1_000_000, 1_000_000) == 2.0
+    assert openai.get_cost("unknown", 1_000, 1_000) == 0.0
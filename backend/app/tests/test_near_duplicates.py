@@ -0,0 +1,36 @@
+# Path: app/tests/test_near_duplicates.py
+
+from app.extractor.near_duplicates import NearDuplicateFilter, simhash, similarity
+
+POSTING = (
+    "Senior Python engineer wanted to own our data pipeline. You will design "
+    "ingestion jobs, review pull requests, mentor two junior engineers and "
+    "work with the analytics team on reporting. Salary 120k, remote friendly, "
+    "four weeks of paid vacation and a yearly learning budget."
+)
+OTHER = (
+    "Our office has free coffee, a ping pong table and a rooftop terrace. We "
+    "host a team lunch every Friday and a summer party for families."
+)
+
+
+def test_simhash_of_similar_texts_share_most_bits():
+    edited = POSTING.replace("two junior", "three junior")
+    assert simhash(POSTING) == simhash(POSTING.upper())
+    assert similarity(simhash(POSTING), simhash(edited)) > similarity(
+        simhash(POSTING), simhash(OTHER)
+    )
+    assert simhash("") == 0
+
+
+def test_near_duplicate_filter_keeps_the_first_copy():
+    near_duplicates = NearDuplicateFilter(threshold=0.9)
+    chunks = [POSTING, OTHER, POSTING + " Apply now.", POSTING.lower()]
+    assert [near_duplicates.add(chunk) for chunk in chunks] == [None, None, 0, 0]
+
+
+def test_near_duplicate_filter_disabled():
+    disabled = NearDuplicateFilter(threshold=0)
+    assert [disabled.add(POSTING) for _ in range(2)] == [None, None]
+    identical = NearDuplicateFilter(threshold=1)
+    assert [identical.add(POSTING) for _ in range(2)] == [None, 0]
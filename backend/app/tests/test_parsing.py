@@ -0,0 +1,177 @@
+# Path: app/tests/test_parsing.py
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import Path
+
+import pytest
+from fastapi import HTTPException
+from langchain_core.documents.base import Blob
+
+from app.core.conf import settings
+from app.extractor import parsing
+from app.extractor.cache import parsed_document_cache
+from app.extractor.pdf import (
+    PAGES_DELIMITER,
+    PDFPageRangeParser,
+    extract_page_texts_pypdf,
+    page_ranges,
+)
+from app.utils import pdf_to_dict
+from benchmarks.corpora import make_pdf
+
+
+@pytest.fixture
+def text_file() -> BytesIO:
+    data = BytesIO(b"Geralt of Rivia\nMonster slayer, Kaer Morhen.\n")
+    data.name = "resume.txt"
+    return data
+
+
+@pytest.fixture(autouse=True)
+def parser_pool(monkeypatch, tmp_path):
+    monkeypatch.setattr(parsed_document_cache, "directory", tmp_path)
+    yield
+    parsing.shutdown_parser_pool()
+
+
+async def test_aparse_binary_input_in_process_pool(text_file: BytesIO):
+    documents = await parsing.aparse_binary_input(text_file)
+    assert "Geralt of Rivia" in documents[0].page_content
+    assert documents[0].metadata["source"] == "resume.txt"
+
+
+async def test_aparse_binary_input_in_thread(monkeypatch, text_file: BytesIO):
+    monkeypatch.setattr(settings, "PARSER_MAX_WORKERS", 0)
+    documents = await parsing.aparse_binary_input(text_file)
+    assert "Geralt of Rivia" in documents[0].page_content
+    assert parsing._parser_pool is None
+
+
+async def test_aparse_binary_input_cached_by_digest(monkeypatch, text_file: BytesIO):
+    await parsing.aparse_binary_input(text_file, "resume.txt")
+
+    async def _parse(blob):
+        raise AssertionError("identical file parsed twice")
+
+    monkeypatch.setattr(parsing, "aparse_blob", _parse)
+    documents = await parsing.aparse_binary_input(text_file, "copy.txt")
+    assert "Geralt of Rivia" in documents[0].page_content
+    assert documents[0].metadata["source"] == "copy.txt"
+    assert parsed_document_cache.stats["hits"] >= 1
+    assert parsing.parse_binary_input(text_file)[0].page_content == (
+        documents[0].page_content
+    )
+
+
+async def test_aparse_binary_input_timeout(monkeypatch, text_file: BytesIO):
+    monkeypatch.setattr(settings, "PARSER_TIMEOUT_SECONDS", 0.001)
+    with pytest.raises(HTTPException) as e:
+        await parsing.aparse_binary_input(text_file)
+    assert e.value.status_code == 422
+    assert parsing._parser_pool is None  # the stuck pool was discarded
+
+
+def test_spool_binary_input_sniffs_header(monkeypatch):
+    sniffed = []
+    monkeypatch.setattr(
+        parsing,
+        "_guess_mimetype",
+        lambda header: sniffed.append(header) or "text/plain",
+    )
+    data = BytesIO(b"x" * (parsing.MIME_SNIFF_BYTES * 2))
+    with parsing.spool_binary_input(data, "notes.txt") as blob:
+        path = blob.path
+        assert blob.data is None  # backed by the spooled file
+        assert blob.source == "notes.txt"
+        assert blob.as_bytes() == data.getvalue()
+    assert sniffed == [b"x" * parsing.MIME_SNIFF_BYTES]
+    assert not Path(path).exists()  # type: ignore
+
+
+def test_spool_binary_input_size_limit(monkeypatch):
+    monkeypatch.setattr(parsing, "MAX_FILE_SIZE_MB", 1)
+    monkeypatch.setattr(parsing, "SPOOL_CHUNK_SIZE", 64 * 1024)
+    data = BytesIO(b"x" * (1024 * 1024 + 1))
+    with pytest.raises(HTTPException) as e:
+        with parsing.spool_binary_input(data):
+            pass
+    assert e.value.status_code == 413
+
+
+def test_page_ranges():
+    assert page_ranges(100, parts=4, min_pages=20) == [
+        (0, 25),
+        (25, 50),
+        (50, 75),
+        (75, 100),
+    ]
+    assert page_ranges(30, parts=4, min_pages=20) == [(0, 20), (20, 30)]
+    assert page_ranges(10, parts=4, min_pages=20) == [(0, 10)]
+    assert page_ranges(0, parts=4, min_pages=20) == []
+
+
+async def test_pdf_pages_are_parsed_by_ranges_in_order(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "PARSER_PDF_MIN_PAGES_PER_RANGE", 2)
+    path = tmp_path / "report.pdf"
+    path.write_bytes(make_pdf("report", 5))
+    expected = PDFPageRangeParser().parse(Blob.from_path(path))[0]
+
+    with path.open("rb") as file:
+        documents = await parsing.aparse_binary_input(file, "report.pdf")
+    assert documents[0].page_content == expected.page_content
+    assert documents[0].metadata["total_pages"] == 5
+    assert documents[0].page_content.count(PAGES_DELIMITER) == 4
+
+    pdf = await pdf_to_dict(path)
+    assert pdf["numPages"] == 5
+    assert pdf["content"] == extract_page_texts_pypdf(str(path), 0, 5)
+
+
+class CountingPool(ThreadPoolExecutor):
+    """Stand in for the parser pool, recording how many tasks were submitted
+    and not done yet at most."""
+
+    def __init__(self):
+        super().__init__(max_workers=8)
+        self.pending = self.max_pending = 0
+        self.lock = threading.Lock()
+
+    def submit(self, fn, /, *args, **kwargs):
+        with self.lock:
+            self.pending += 1
+            self.max_pending = max(self.max_pending, self.pending)
+        future = super().submit(fn, *args, **kwargs)
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        with self.lock:
+            self.pending -= 1
+
+
+async def test_pdf_ranges_hold_a_parser_slot_each(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "PARSER_MAX_WORKERS", 2)
+    monkeypatch.setattr(settings, "PARSER_PDF_MIN_PAGES_PER_RANGE", 1)
+    monkeypatch.setattr(parsing, "_parser_slots", None)
+    pool = CountingPool()
+    monkeypatch.setattr(parsing, "_get_parser_pool", lambda: pool)
+    path = tmp_path / "report.pdf"
+    path.write_bytes(make_pdf("report", 6))
+
+    def _extract(source, start, stop):
+        time.sleep(0.02)
+        return extract_page_texts_pypdf(source, start, stop)
+
+    try:
+        results = await asyncio.gather(
+            *(parsing.aparse_pdf_pages(path, _extract) for _ in range(3))
+        )
+    finally:
+        pool.shutdown()
+    # Never more tasks submitted than workers, so none is timed while queued
+    assert pool.max_pending == 2
+    assert results == [extract_page_texts_pypdf(str(path), 0, 6)] * 3
@@ -0,0 +1,102 @@
+# Path: app/tests/test_queue.py
+
+from datetime import timedelta
+
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import conf
+from app.core.queue import (
+    FAILED,
+    PENDING,
+    RUNNING,
+    SUCCESS,
+    WORKER_LOST,
+    claim_job,
+    complete_job,
+    enqueue_job,
+    fail_job,
+    heartbeat_job,
+)
+from app.models import User
+
+
+async def _enqueue(db: AsyncSession, user: User):
+    return await enqueue_job(
+        db,
+        extractor_id=None,  # type: ignore
+        user_id=user.id,  # type: ignore
+        event_id=None,  # type: ignore
+        mode="entire_document",
+        llm="gpt-3.5-turbo",
+        text="Geralt of Rivia is a witcher.",
+    )
+
+
+async def test_claim_job_hands_out_each_job_once(db: AsyncSession, default_user: User):
+    first = await _enqueue(db, default_user)
+    second = await _enqueue(db, default_user)
+
+    claimed = [await claim_job(db), await claim_job(db)]
+
+    assert {job.id for job in claimed} == {first.id, second.id}
+    assert all(job.status == RUNNING and job.attempts == 1 for job in claimed)
+    assert await claim_job(db) is None
+
+    for job in claimed:
+        job = await complete_job(db, job, {"data": [{"name": "Geralt"}]})
+        assert job.status == SUCCESS and job.result == {"data": [{"name": "Geralt"}]}
+
+
+async def test_failed_job_is_retried_until_max_attempts(
+    db: AsyncSession, default_user: User
+):
+    job = await _enqueue(db, default_user)
+    for attempt in range(1, conf.settings.JOB_MAX_ATTEMPTS + 1):
+        job = await claim_job(db)
+        assert job is not None and job.attempts == attempt
+        job = await fail_job(db, job, "rate limited")
+        if attempt < conf.settings.JOB_MAX_ATTEMPTS:
+            assert job.status == PENDING
+    assert job.status == FAILED
+    assert await claim_job(db) is None
+
+
+async def test_client_errors_are_not_retried(db: AsyncSession, default_user: User):
+    await _enqueue(db, default_user)
+    job = await claim_job(db)
+    job = await fail_job(db, job, "invalid schema", retry=False)  # type: ignore
+    assert job.status == FAILED
+    assert await claim_job(db) is None
+
+
+async def test_heartbeat_keeps_running_jobs_claimed(
+    db: AsyncSession, default_user: User
+):
+    job = await _enqueue(db, default_user)
+    assert not await heartbeat_job(db, job.id)  # type: ignore
+    job = await claim_job(db)
+    lock_timeout = timedelta(seconds=conf.settings.JOB_LOCK_TIMEOUT_SECONDS + 1)
+    job.locked_at = func.now() - lock_timeout  # type: ignore
+    await db.commit()
+
+    assert await heartbeat_job(db, job.id)  # type: ignore
+    assert await claim_job(db) is None  # not reclaimed while its worker is alive
+    job = await complete_job(db, job, {"data": []})  # type: ignore
+    assert not await heartbeat_job(db, job.id)  # type: ignore
+
+
+async def test_lost_jobs_out_of_attempts_are_failed(
+    db: AsyncSession, default_user: User
+):
+    job = await _enqueue(db, default_user)
+    job = await claim_job(db)
+    lock_timeout = timedelta(seconds=conf.settings.JOB_LOCK_TIMEOUT_SECONDS + 1)
+    job.attempts = conf.settings.JOB_MAX_ATTEMPTS  # type: ignore
+    job.locked_at = func.now() - lock_timeout  # type: ignore
+    await db.commit()
+
+    assert await claim_job(db) is None  # its worker died on the last attempt
+    await db.refresh(job)
+    assert job.status == FAILED and job.error == WORKER_LOST
+    assert job.attempts == conf.settings.JOB_MAX_ATTEMPTS
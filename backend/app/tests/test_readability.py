@@ -0,0 +1,55 @@
+# Path: app/tests/test_readability.py
+
+from app.core.readability import BoilerplateReport, extract_main_content
+
+POSTING = """
+<html><head><title>Senior Witcher</title><script>track()</script></head><body>
+<div id="cookie-banner">We use cookies to improve your experience, accept them all?</div>
+<nav><a href="/jobs">Jobs</a><a href="/companies">Companies</a></nav>
+<div class="layout">
+  <div class="job-description">
+    <h1>Senior Witcher</h1>
+    <p>Kaer Morhen is hiring a senior witcher to take monster contracts, with
+    travel, silver and steel provided.</p>
+    <ul><li>Five years of experience hunting necrophages, wraiths and relicts.</li>
+    <li>Proficiency with signs, alchemy and potions, including Swallow.</li></ul>
+  </div>
+  <div class="similar-jobs"><h2>Similar jobs</h2><ul>
+    <li><a href="/1">Junior Witcher at Kaer Morhen, apply today</a></li>
+    <li><a href="/2">Alchemist at Oxenfurt Academy, apply today</a></li></ul></div>
+</div>
+<footer>Copyright Novigrad Guild. All rights reserved. Privacy policy.</footer>
+</body></html>
+"""
+
+
+def test_extract_main_content_strips_boilerplate():
+    content = extract_main_content(POSTING)
+    assert content.title == "Senior Witcher"
+    assert content.text.splitlines()[0] == "Senior Witcher"
+    assert "Proficiency with signs" in content.text
+    for boilerplate in (
+        "cookies",
+        "Companies",
+        "Similar jobs",
+        "Alchemist",
+        "Copyright",
+    ):
+        assert boilerplate not in content.text
+    assert "track()" not in content.text
+    assert 0 < content.removed_tokens < content.tokens
+
+
+def test_extract_main_content_keeps_whole_text():
+    content = extract_main_content(POSTING, strip_boilerplate=False)
+    assert "Similar jobs" in content.text and content.removed_tokens == 0
+    # Pages without a main content as long as min_chars are kept whole
+    content = extract_main_content(POSTING, min_chars=10_000)
+    assert "Similar jobs" in content.text
+
+
+def test_boilerplate_report():
+    report = BoilerplateReport()
+    report.record(100, 40)
+    report.record(100, 0)
+    assert report.stats["removed_ratio"] == 0.2
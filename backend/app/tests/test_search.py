@@ -0,0 +1,49 @@
+# Path: app/tests/test_search.py
+
+import numpy as np
+
+from app.extractor.search import BM25Index, fuse, hybrid_search, top_k
+
+CHUNKS = [
+    "Apply now! We are an equal opportunity employer.",
+    "Senior Python engineer wanted, salary 120k, remote friendly.",
+    "Our office has free coffee and a ping pong table.",
+    "The Python engineer will own the data pipeline.",
+]
+
+
+def test_bm25_ranks_chunks_by_query_terms():
+    index = BM25Index(CHUNKS)
+    scores = index.scores("python engineer salary")
+    assert top_k(scores, 2) == [1, 3]
+    assert scores[2] == 0
+    coverage = index.coverage("python engineer salary")
+    assert coverage[1] == 1.0 and 0 < coverage[3] < 1
+
+
+def test_fuse():
+    lexical = np.array([3.0, 2.0, 1.0])
+    dense = np.array([0.0, 1.0, 2.0])
+    assert top_k(fuse(lexical, dense, "weighted", lexical_weight=0.9), 1) == [0]
+    assert top_k(fuse(lexical, dense, "weighted", lexical_weight=0.1), 1) == [2]
+    # Ranked 2nd lexically and 1st densely, the others 3rd by one of them
+    assert top_k(fuse(lexical, np.array([1.0, 3.0, 2.0]), "rrf"), 1) == [1]
+
+
+async def test_hybrid_search_skips_dense_scores_when_lexical_suffices():
+    calls = []
+
+    async def dense_scores():
+        calls.append(True)
+        return np.array([0.0, 0.0, 1.0, 0.0])
+
+    found = await hybrid_search(
+        CHUNKS, "python engineer", 2, dense_scores, min_lexical_coverage=0.5
+    )
+    assert sorted(found) == [1, 3] and calls == []
+
+    found = await hybrid_search(CHUNKS, "coffee salary", 1, dense_scores)
+    assert calls == [True]
+    assert found == [2]  # first by dense, and tied by lexical with chunk 1
+
+    assert await hybrid_search(CHUNKS, "anything", 10, dense_scores) == [0, 1, 2, 3]
@@ -0,0 +1,23 @@
+# Path: app/tests/test_startup.py
+
+from benchmarks.startup import (
+    StartupResult,
+    eager_packages,
+    find_violations,
+    measure_import,
+)
+
+
+def test_routes_import_heavy_dependencies_lazily():
+    seconds, modules = measure_import("app.api.api")
+    assert seconds > 0
+    assert eager_packages(modules) == []
+
+
+def test_find_violations():
+    fast = StartupResult("api", "app.main", 1.0, 2.0, [])
+    slow = StartupResult("api", "app.main", 3.0, 2.0, [])
+    eager = StartupResult("worker", "app.worker", 1.0, 2.0, ["openai"])
+    failed = StartupResult("api", "app.main", 0.0, 2.0, [], "boom")
+    assert find_violations([fast]) == []
+    assert len(find_violations([slow, eager, failed])) == 3
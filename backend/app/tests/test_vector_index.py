@@ -0,0 +1,52 @@
+# Path: app/tests/test_vector_index.py
+
+import os
+
+from langchain_community.vectorstores import FAISS
+
+from app.core.fake_llm import HashingEmbeddings
+from app.extractor.vector_index import VectorIndexCache, vector_index_key
+
+CHUNKS = ["geralt hunts monsters", "yennefer casts spells", "dandelion plays the lute"]
+
+
+async def test_vector_index_round_trip(tmp_path):
+    embeddings = HashingEmbeddings()
+    cache = VectorIndexCache(tmp_path)
+    assert cache.load("key", embeddings) is None
+
+    vectorstore = await FAISS.afrom_texts(
+        CHUNKS, embedding=embeddings, ids=[str(i) for i in range(len(CHUNKS))]
+    )
+    cache.save("key", vectorstore, CHUNKS)
+    loaded = cache.load("key", embeddings)
+    assert loaded is not None and loaded.index.ntotal == len(CHUNKS)
+    [document] = await loaded.asimilarity_search("who casts spells", k=1)
+    assert document.page_content == "yennefer casts spells"
+    assert cache.stats["hits"] == 1 and cache.stats["entries"] == 1
+
+
+async def test_vector_index_evicts_least_recently_used(tmp_path):
+    embeddings = HashingEmbeddings()
+    cache = VectorIndexCache(tmp_path, max_entries=10)
+    vectorstore = await FAISS.afrom_texts(CHUNKS, embedding=embeddings)
+    for i in range(10):
+        cache.save(str(i), vectorstore, CHUNKS)
+        os.utime(tmp_path / str(i), (i, i))
+    assert cache.load("0", embeddings) is not None  # 0 is now the most recent
+    cache.save("10", vectorstore, CHUNKS)
+    # Evicted down to the low mark, the least recently used first
+    assert cache.evictions == 2
+    assert cache.load("1", embeddings) is None
+    assert cache.load("0", embeddings) is not None
+    assert cache.stats["entries"] == 9
+
+
+def test_vector_index_key():
+    embeddings = HashingEmbeddings()
+    key = vector_index_key("text", embeddings, {"chunk_size": 1000})
+    assert key == vector_index_key("text", embeddings, {"chunk_size": 1000})
+    assert key != vector_index_key("text", embeddings, {"chunk_size": 500})
+    assert key != vector_index_key(
+        "text", HashingEmbeddings(size=64), {"chunk_size": 1000}
+    )
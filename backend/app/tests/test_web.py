@@ -0,0 +1,188 @@
+# Path: app/tests/test_web.py
+
+import httpx
+import pytest
+
+from app.core import web
+from app.extractor.cache import parsed_document_cache
+from benchmarks.corpora import make_pdf
+
+ARTICLE = "<p>" + "Senior witcher wanted for monster contracts. " * 20 + "</p>"
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.closed = False
+
+    def is_connected(self) -> bool:
+        return not self.closed
+
+    async def new_context(self, **kwargs):
+        return FakeContext()
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeContext:
+    async def new_page(self):
+        return object()
+
+    async def close(self):
+        pass
+
+
+class FakePlaywright:
+    def __init__(self):
+        self.browsers: list[FakeBrowser] = []
+        self.chromium = self
+
+    async def launch(self, **kwargs) -> FakeBrowser:
+        self.browsers.append(FakeBrowser())
+        return self.browsers[-1]
+
+    async def stop(self):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def url_cache(monkeypatch, tmp_path):
+    monkeypatch.setattr(web.url_cache, "directory", tmp_path)
+    return web.url_cache
+
+
+@pytest.fixture
+def http_pages(monkeypatch):
+    """Map urls to responses, or to functions of the request returning responses."""
+    pages: dict = {}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        page = pages[str(request.url)]
+        return page(request) if callable(page) else page
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(web, "get_http_client", lambda: client)
+    return pages
+
+
+@pytest.fixture
+def rendered_pages(monkeypatch):
+    pages: dict[str, str] = {}
+
+    async def fetch_html(url: str) -> str:
+        return pages[url]
+
+    monkeypatch.setattr(web.browser_pool, "fetch_html", fetch_html)
+    return pages
+
+
+async def test_fetch_text_static_page(http_pages, rendered_pages):
+    url = "https://jobs.example.com/1"
+    http_pages[url] = httpx.Response(
+        200, html=ARTICLE, headers={"content-type": "text/html"}
+    )
+    text = await web.fetch_text(url)
+    assert "Senior witcher wanted" in text
+    assert not rendered_pages  # the browser was not needed
+
+
+async def test_fetch_text_falls_back_to_browser(http_pages, rendered_pages):
+    url = "https://jobs.example.com/2"
+    http_pages[url] = httpx.Response(
+        200,
+        html="<div id='root'>Please enable JavaScript</div>",
+        headers={"content-type": "text/html"},
+    )
+    rendered_pages[url] = ARTICLE
+    assert "Senior witcher wanted" in await web.fetch_text(url)
+
+    http_pages[url] = httpx.Response(403)
+    assert "Senior witcher wanted" in await web.fetch_text(url)
+
+
+async def test_fetch_text_parses_other_documents(
+    http_pages, rendered_pages, monkeypatch, tmp_path
+):
+    monkeypatch.setattr(parsed_document_cache, "directory", tmp_path)
+    url = "https://jobs.example.com/posting.pdf"
+    http_pages[url] = httpx.Response(
+        200, content=make_pdf("posting", 1), headers={"content-type": "application/pdf"}
+    )
+    assert len(await web.fetch_text(url)) > web.conf.settings.URL_MIN_STATIC_TEXT_CHARS
+
+    url = "https://jobs.example.com/title.txt"
+    http_pages[url] = httpx.Response(
+        200, content=b"Witcher", headers={"content-type": "text/plain"}
+    )
+    assert await web.fetch_text(url) == "Witcher"  # short, but not rendered
+
+    url = "https://jobs.example.com/posting.bin"
+    http_pages[url] = httpx.Response(
+        200,
+        content=bytes(range(256)),
+        headers={"content-type": "application/octet-stream"},
+    )
+    with pytest.raises(ValueError):
+        await web.fetch_text(url)
+    assert not rendered_pages  # the browser is only used for HTML
+
+
+async def test_fetch_text_revalidates_cached_text(
+    http_pages, rendered_pages, url_cache
+):
+    url = "https://jobs.example.com/3"
+    http_pages[url] = httpx.Response(
+        200, html=ARTICLE, headers={"content-type": "text/html", "etag": '"v1"'}
+    )
+    text = await web.fetch_text(url)
+
+    def not_modified(request: httpx.Request) -> httpx.Response:
+        assert request.headers["if-none-match"] == '"v1"'
+        return httpx.Response(304)
+
+    http_pages[url] = not_modified
+    hits = url_cache.hits
+    assert await web.fetch_text(url) == text
+    assert url_cache.hits == hits + 1
+
+
+async def test_fetch_text_does_not_revalidate_rendered_text(
+    http_pages, rendered_pages, monkeypatch
+):
+    url = "https://jobs.example.com/4"
+    shell = httpx.Response(
+        200,
+        html="<div id='root'></div>",
+        headers={"content-type": "text/html", "etag": '"shell"'},
+    )
+    requests: list[httpx.Request] = []
+    http_pages[url] = lambda request: requests.append(request) or shell
+    rendered_pages[url] = ARTICLE
+    assert "Senior witcher wanted" in await web.fetch_text(url)
+
+    # Served from the cache for a while, without fetching the shell
+    rendered_pages[url] = "<p>" + "Contract filled, thanks for applying. " * 20 + "</p>"
+    assert "Senior witcher wanted" in await web.fetch_text(url)
+    assert len(requests) == 1
+
+    # Then rendered again, the shell's ETag saying nothing of its content
+    monkeypatch.setattr(web.conf.settings, "URL_RENDERED_CACHE_TTL_SECONDS", 0)
+    assert "Contract filled" in await web.fetch_text(url)
+    assert "if-none-match" not in requests[-1].headers
+
+
+async def test_browser_pool_recycles_browser():
+    pool = web.BrowserPool(max_pages=2, max_uses=2)
+    playwright = pool._playwright = FakePlaywright()
+
+    async with pool.page():
+        async with pool.page():
+            pass
+        assert len(playwright.browsers) == 1
+    async with pool.page():
+        pass
+
+    first, second = playwright.browsers
+    assert first.closed and not second.closed
+    await pool.close()
+    assert second.closed
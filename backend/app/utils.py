@@ -3,17 +3,17 @@
 import json
 import re
 import textwrap
-from io import BytesIO
 from pathlib import Path
-from typing import Any, Type
+from typing import TYPE_CHECKING, Any, Type
 
 import aiofiles
-from bs4 import BeautifulSoup
 from jsonschema import exceptions
 from jsonschema.validators import Draft202012Validator
 from langchain_core.utils.json_schema import dereference_refs
 from pydantic import BaseModel
-from PyPDF2 import PdfReader
+
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup
 
 
 def clean_text(text: str) -> str:
@@ -34,14 +34,14 @@ def wrap_text(text: str, width: int = 120) -> str:
     return "\n".join(textwrap.wrap(text, width=width))
 
 
-def split_soup_lines(soup: BeautifulSoup) -> list[str]:
+def split_soup_lines(soup: "BeautifulSoup") -> list[str]:
     """
     Splits the HTML of the loaded source document into a list of strings.
     """
     return [line.strip() for line in soup.get_text().splitlines() if line.strip()]
 
 
-def extract_soup_hrefs(soup: BeautifulSoup) -> list[str]:
+def extract_soup_hrefs(soup: "BeautifulSoup") -> list[str]:
     """
     Extracts all links from a BeautifulSoup object.
     """
@@ -124,22 +124,15 @@ async def pdf_to_dict(pdf_path: str | Path) -> dict:
     if not pdf_path.exists():
         raise FileNotFoundError(f"File not found at {pdf_path}")
 
-    # Read the PDF file asynchronously
-    async with aiofiles.open(pdf_path, "rb") as file:
-        content = await file.read()  # Read the entire file content
-
-    # Use PdfReader with the read content
-    reader = PdfReader(BytesIO(content))
-    text_content = []
+    from app.extractor.parsing import aparse_pdf_pages
+    from app.extractor.pdf import extract_page_texts_pypdf
 
-    # Extract text from each page
-    for page_num in range(len(reader.pages)):
-        page = reader.pages[page_num]
-        text_content.append(page.extract_text())
+    # Extract the text of each page, large files by ranges of pages in parallel
+    text_content = await aparse_pdf_pages(pdf_path, extract_page_texts_pypdf)
 
     return {
         "content": text_content,
-        "numPages": len(reader.pages),
+        "numPages": len(text_content),
         "name": str(pdf_path.stem),
     }
 
@@ -0,0 +1,208 @@
+# Path: app/worker.py
+
+"""
+Extraction worker process.
+
+Runs queued extraction jobs outside of the API workers, so HTTP latency is
+decoupled from LLM latency and extraction can be scaled independently:
+
+    python -m app.worker --concurrency 8
+
+Each worker runs ``--concurrency`` consumer loops that claim jobs from the
+extraction_jobs table. On SIGINT/SIGTERM the worker stops claiming new jobs
+and exits once the jobs in progress have finished.
+"""
+import argparse
+import asyncio
+import signal
+from typing import Any, Awaitable, Callable
+
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+
+from app import models, schemas
+from app.api.deps import create_skill, execute_extraction, update_orchestration_event
+from app.core import conf
+from app.core.db import AsyncSession, create_db_and_tables, session_context
+from app.core.governor import llm_user
+from app.core.langchain import extract_text_from_url
+from app.core.llm import close_model_clients, warm_model_clients
+from app.core.metrics import llm_metrics, set_llm_labels
+from app.core.queue import FAILED, claim_job, complete_job, fail_job, heartbeat_job
+from app.core.web import close_web_clients
+from app.logging import console_log
+
+
+async def _save_skills(
+    records: list[dict[str, Any]], job: models.ExtractionJob, db: AsyncSession
+) -> None:
+    user = await db.get(models.User, job.user_id)
+    for record in records:
+        await create_skill(
+            schemas.SkillCreate(**record), db=db, user=user, commit=False  # type: ignore
+        )
+
+
+# Tables a job can save its extracted records to. Sinks do not commit, the
+# records are committed together with the result of the job
+SINKS: dict[
+    str,
+    Callable[[list[dict[str, Any]], models.ExtractionJob, AsyncSession], Awaitable],
+] = {
+    "skills": _save_skills,
+}
+
+
+async def _update_event(
+    job: models.ExtractionJob,
+    db: AsyncSession,
+    status: schemas.OrchestrationEventStatusType,
+    message: str | None = None,
+) -> None:
+    if job.event_id is None:
+        return
+    payload = schemas.OrchestrationEventUpdate(status=status)
+    if message is not None:
+        payload.message = message
+    if status != schemas.OrchestrationEventStatusType.RUNNING:
+        payload.metrics = llm_metrics.pop_event(job.event_id)
+    await update_orchestration_event(
+        job.event_id,  # type: ignore
+        payload=payload,
+        db=db,
+    )
+
+
+async def _get_extractor(
+    job: models.ExtractionJob, db: AsyncSession
+) -> schemas.ExtractorRead:
+    query = (
+        select(models.Extractor)
+        .where(models.Extractor.id == job.extractor_id)
+        .options(selectinload(models.Extractor.extractor_examples))
+    )
+    extractor = (await db.execute(query)).scalars().first()
+    if extractor is None:
+        raise HTTPException(
+            status_code=404, detail=f"Extractor {job.extractor_id} not found"
+        )
+    return schemas.ExtractorRead.from_orm(extractor)
+
+
+async def _heartbeat(job_id: Any, interval: float) -> None:
+    """Refresh the lock of a running job on its own session until cancelled."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with session_context() as db:
+                if not await heartbeat_job(db, job_id):
+                    return
+        except Exception as e:  # retried on the next beat
+            console_log.error(f"Heartbeat of extraction job {job_id} failed: {e}")
+
+
+async def _execute_job(job: models.ExtractionJob, db: AsyncSession) -> None:
+    console_log.info(f"Running extraction job {job.id} (attempt {job.attempts})")
+    llm_user.set(job.user_id)
+    set_llm_labels(extractor=job.extractor_id, event=job.event_id)
+    await _update_event(job, db, schemas.OrchestrationEventStatusType.RUNNING)
+    try:
+        extractor = await _get_extractor(job, db)
+        text = job.text or await extract_text_from_url(job.url)  # type: ignore
+        res = await execute_extraction(extractor, job.mode, text, job.llm)  # type: ignore
+        if job.sink:
+            await SINKS[job.sink](res["data"], job, db)
+        await complete_job(db, job, res)
+    except Exception as e:
+        console_log.error(f"Extraction job {job.id} failed: {e}")
+        await db.rollback()
+        await db.refresh(job)
+        # Client errors (missing extractor, invalid schema) will not succeed on retry
+        job = await fail_job(db, job, str(e), retry=not isinstance(e, HTTPException))
+        if job.status == FAILED:
+            await _update_event(
+                job,
+                db,
+                schemas.OrchestrationEventStatusType.FAILED,
+                f"Failure to extract orchestration event: {e}",
+            )
+        return
+
+    await _update_event(
+        job,
+        db,
+        schemas.OrchestrationEventStatusType.SUCCESS,
+        f"Success! Extracted res: {res}",
+    )
+    console_log.info(f"Extraction job {job.id} succeeded")
+
+
+async def execute_job(job: models.ExtractionJob, db: AsyncSession) -> None:
+    """Run a claimed job, recording the outcome on the job and its event.
+
+    The job's lock is refreshed while it runs, so long extractions are not
+    claimed again by another worker.
+    """
+    heartbeat = asyncio.create_task(
+        _heartbeat(job.id, conf.settings.JOB_HEARTBEAT_SECONDS)
+    )
+    try:
+        await _execute_job(job, db)
+    finally:
+        heartbeat.cancel()
+        await asyncio.gather(heartbeat, return_exceptions=True)
+
+
+async def _consume(stop: asyncio.Event, poll_interval: float) -> None:
+    while not stop.is_set():
+        try:
+            async with session_context() as db:
+                job = await claim_job(db)
+                if job is not None:
+                    await execute_job(job, db)
+                    continue
+        except Exception as e:  # keep the loop alive, e.g. if the database restarts
+            console_log.error(f"Extraction worker error: {e}")
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=poll_interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_worker(concurrency: int, poll_interval: float) -> None:
+    """Run concurrency consumer loops until the process is signalled to stop."""
+    await create_db_and_tables()
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    warm_model_clients()
+    console_log.info(f"Extraction worker started with concurrency {concurrency}")
+    await asyncio.gather(*[_consume(stop, poll_interval) for _ in range(concurrency)])
+    await close_web_clients()
+    await close_model_clients()
+    console_log.info("Extraction worker stopped")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run queued extraction jobs.")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=conf.settings.WORKER_CONCURRENCY,
+        help="Number of jobs to run concurrently.",
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=conf.settings.WORKER_POLL_INTERVAL_SECONDS,
+        help="Seconds to wait before polling an empty queue again.",
+    )
+    args = parser.parse_args()
+    asyncio.run(run_worker(args.concurrency, args.poll_interval))
+
+
+if __name__ == "__main__":
+    main()
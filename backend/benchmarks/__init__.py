@@ -0,0 +1,6 @@
+"""
+Benchmarks of the extraction pipeline.
+
+Run with ``python -m benchmarks`` from the backend directory, see
+``python -m benchmarks --help``.
+"""
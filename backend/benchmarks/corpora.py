@@ -0,0 +1,95 @@
+# Path: benchmarks/corpora.py
+
+"""
+Fixed benchmark corpora.
+
+Documents are generated from a seeded random generator rather than checked in,
+so every run benchmarks byte-identical inputs: job postings and resumes as
+plain text, HTML pages with navigation boilerplate, and PDFs of increasing size.
+"""
+import random
+from functools import lru_cache
+from io import BytesIO
+from typing import Callable
+
+NAMES = ["Geralt", "Yennefer", "Ciri", "Dandelion", "Triss", "Zoltan", "Vesemir"]
+TITLES = ["Witcher", "Sorceress", "Bard", "Alchemist", "Blacksmith", "Scout"]
+COMPANIES = ["Kaer Morhen", "Oxenfurt Academy", "Novigrad Guild", "Vizima Court"]
+SKILLS = ["swordsmanship", "alchemy", "signs", "tracking", "negotiation", "lute"]
+WORDS = (
+    "the a contract monster village reward silver steel potion travel road "
+    "experience team project lead deliver client report schedule budget"
+).split()
+
+
+def _paragraph(rng: random.Random) -> str:
+    name, title = rng.choice(NAMES), rng.choice(TITLES)
+    company, skill = rng.choice(COMPANIES), rng.choice(SKILLS)
+    filler = " ".join(rng.choice(WORDS) for _ in range(rng.randint(40, 80)))
+    return (
+        f"{name} worked as a {title} at {company} for {rng.randint(1, 20)} years, "
+        f"specializing in {skill}. {filler.capitalize()}."
+    )
+
+
+def make_text(seed: str, size: int) -> str:
+    """Paragraphs of postings and resumes totalling about size characters."""
+    rng = random.Random(seed)
+    paragraphs: list[str] = []
+    total = 0
+    while total < size:
+        paragraphs.append(_paragraph(rng))
+        total += len(paragraphs[-1]) + 2
+    return "\n\n".join(paragraphs)
+
+
+def make_html(seed: str, size: int) -> bytes:
+    """An HTML page with navigation, scripts and articles of the generated text."""
+    articles = "".join(
+        f"<article><h2>Posting {i}</h2><p>{paragraph}</p></article>"
+        for i, paragraph in enumerate(make_text(seed, size).split("\n\n"))
+    )
+    navigation = "".join(f"<li><a href='/{word}'>{word}</a></li>" for word in WORDS)
+    return (
+        "<!DOCTYPE html><html><head><title>Postings</title>"
+        "<script>window.analytics = {};</script></head><body>"
+        f"<nav><ul>{navigation}</ul></nav><main>{articles}</main>"
+        "<footer>Copyright Novigrad Guild</footer></body></html>"
+    ).encode()
+
+
+def make_pdf(seed: str, pages: int) -> bytes:
+    """A PDF of pages of generated text."""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import PageBreak, Paragraph, SimpleDocTemplate
+
+    style = getSampleStyleSheet()["BodyText"]
+    rng = random.Random(seed)
+    flowables = []
+    for _ in range(pages):
+        flowables.extend(Paragraph(_paragraph(rng), style) for _ in range(6))
+        flowables.append(PageBreak())
+    output = BytesIO()
+    SimpleDocTemplate(output, pagesize=A4, invariant=True).build(flowables)
+    return output.getvalue()
+
+
+# Corpus name -> (file name, generator of the file content)
+CORPORA: dict[str, tuple[str, Callable[[], bytes]]] = {
+    "text-small": ("small.txt", lambda: make_text("text-small", 4_000).encode()),
+    "text-medium": ("medium.txt", lambda: make_text("text-medium", 200_000).encode()),
+    "text-huge": ("huge.txt", lambda: make_text("text-huge", 4_000_000).encode()),
+    "html-small": ("small.html", lambda: make_html("html-small", 8_000)),
+    "html-medium": ("medium.html", lambda: make_html("html-medium", 400_000)),
+    "pdf-small": ("small.pdf", lambda: make_pdf("pdf-small", 2)),
+    "pdf-medium": ("medium.pdf", lambda: make_pdf("pdf-medium", 40)),
+    "pdf-huge": ("huge.pdf", lambda: make_pdf("pdf-huge", 400)),
+}
+
+
+@lru_cache(maxsize=None)
+def load_corpus(name: str) -> tuple[str, bytes]:
+    """Return the file name and content of a corpus."""
+    file_name, generate = CORPORA[name]
+    return file_name, generate()
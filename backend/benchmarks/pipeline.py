@@ -0,0 +1,331 @@
+# Path: benchmarks/pipeline.py
+
+"""
+Time each stage of the extraction pipeline over the fixed corpora.
+
+Stages run in order on the output of the previous one:
+
+- parse: parse the file with ``parse_binary_input`` (parsed document cache off)
+- split: chunk the text with the extractor's token splitter, ``iter_chunks``
+- prompt: compile the extractor and build the prompt of every chunk
+- extract: ``abatch`` the chunks against the fake model backend
+- dedupe: ``deduplicate`` the chunk responses
+- persist: write and read back the result in the extraction cache
+
+Each stage reports its median wall time over the repeats, its throughput and
+the peak memory it allocated (traced in a separate run). Results can be saved
+as baselines and later runs compared against them, failing on regressions.
+"""
+import asyncio
+import inspect
+import json
+import statistics
+import tempfile
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from io import BytesIO
+from pathlib import Path
+from typing import Any, Callable, Iterator, Sequence
+
+from app.core import conf
+from app.core.llm import model_registry
+from app.extractor.cache import (
+    cache_extraction,
+    extraction_cache,
+    get_cached_extraction,
+)
+from app.extractor.chunking import iter_chunks
+from app.extractor.compiler import compile_extractor
+from app.extractor.extraction_runnable import deduplicate
+from app.extractor.parsing import parse_binary_input
+from benchmarks.corpora import CORPORA, load_corpus
+
+STAGES = ("parse", "split", "prompt", "extract", "dedupe", "persist")
+
+BASELINES_PATH = Path(__file__).parent / "baselines.json"
+
+SCHEMA = {
+    "title": "Employment",
+    "description": "A person's employment.",
+    "type": "object",
+    "properties": {
+        "name": {"type": "string", "description": "The person's name"},
+        "title": {"type": "string", "description": "The job title"},
+        "company": {"type": "string", "description": "The employer"},
+        "years": {"type": "integer", "description": "Years of employment"},
+        "skills": {"type": "array", "items": {"type": "string"}},
+    },
+}
+INSTRUCTIONS = "Extract every employment of a person mentioned in the text."
+EXAMPLES = [
+    {
+        "text": "Geralt worked as a Witcher at Kaer Morhen for 9 years.",
+        "output": [{"name": "Geralt", "title": "Witcher", "company": "Kaer Morhen"}],
+    },
+]
+
+
+@dataclass
+class StageResult:
+    corpus: str
+    stage: str
+    seconds: float
+    peak_mb: float
+    items: int
+    unit: str
+    error: str | None = None
+
+    @property
+    def throughput(self) -> float:
+        return self.items / self.seconds if self.seconds else 0.0
+
+
+@contextmanager
+def _overrides(target: Any, **values: Any) -> Iterator[None]:
+    previous = {name: getattr(target, name) for name in values}
+    for name, value in values.items():
+        setattr(target, name, value)
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            setattr(target, name, value)
+
+
+async def _call(function: Callable[[], Any]) -> Any:
+    result = function()
+    return await result if inspect.isawaitable(result) else result
+
+
+async def _measure(
+    function: Callable[[], Any], repeat: int
+) -> tuple[Any, float, float]:
+    """Run function, returning its result, median seconds and peak MB allocated."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = await _call(function)
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        await _call(function)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, statistics.median(timings), peak / 1024 / 1024
+
+
+async def benchmark_corpus(
+    corpus: str,
+    stages: Sequence[str] = STAGES,
+    repeat: int = 3,
+    llm: str = "gpt-3.5-turbo",
+) -> list[StageResult]:
+    """Run the pipeline stages over a corpus, stopping at the first failing stage."""
+    file_name, data = load_corpus(corpus)
+    state: dict[str, Any] = {}
+
+    def parse() -> str:
+        documents = parse_binary_input(BytesIO(data), file_name)
+        return "\n\n".join(document.page_content for document in documents)
+
+    def split() -> list[str]:
+        chunk_size = conf.openai.get_chunk_size(llm)
+        return [chunk for chunk, _ in iter_chunks(state["text"], chunk_size)]
+
+    def prompt() -> Any:
+        compiled = compile_extractor(
+            SCHEMA, INSTRUCTIONS, EXAMPLES, llm, key=uuid.uuid4().hex
+        )
+        for chunk in state["chunks"]:
+            compiled.prompt.format_messages(**compiled.make_input(chunk))
+        return compiled
+
+    async def extract() -> list[Any]:
+        return await state["compiled"].abatch(
+            state["chunks"], conf.settings.MAX_CONCURRENCY
+        )
+
+    def dedupe() -> Any:
+        return deduplicate(state["responses"])
+
+    async def persist() -> Any:
+        key = uuid.uuid4().hex
+        await cache_extraction(key, state["result"])
+        return await get_cached_extraction(key)
+
+    plan: dict[str, tuple[Callable[[], Any], str | None, Callable[[], tuple]]] = {
+        # stage: (function, state key of its result, (items, unit) processed)
+        "parse": (parse, "text", lambda: (len(data), "bytes")),
+        "split": (split, "chunks", lambda: (len(state["text"]), "chars")),
+        "prompt": (prompt, "compiled", lambda: (len(state["chunks"]), "chunks")),
+        "extract": (extract, "responses", lambda: (len(state["chunks"]), "chunks")),
+        "dedupe": (dedupe, "result", lambda: (len(state["responses"]), "responses")),
+        "persist": (persist, None, lambda: (len(state["result"]["data"]), "records")),
+    }
+    # Stages before the requested ones run untimed, to produce their inputs
+    last = max(STAGES.index(stage) for stage in stages)
+    results = []
+    for stage in STAGES[: last + 1]:
+        function, key, count = plan[stage]
+        try:
+            if stage in stages:
+                result, seconds, peak_mb = await _measure(function, repeat)
+            else:
+                result = await _call(function)
+        except Exception as e:
+            results.append(StageResult(corpus, stage, 0.0, 0.0, 0, "", repr(e)))
+            break
+        if key is not None:
+            state[key] = result
+        if stage in stages:
+            items, unit = count()
+            results.append(StageResult(corpus, stage, seconds, peak_mb, items, unit))
+    return results
+
+
+async def run_benchmarks(
+    corpora: Sequence[str],
+    stages: Sequence[str] = STAGES,
+    repeat: int = 3,
+    latency_ms: float = 0,
+    latency_jitter_ms: float = 0,
+) -> list[StageResult]:
+    """Benchmark corpora against the fake model backend with the given latency."""
+    with tempfile.TemporaryDirectory() as cache_dir, _overrides(
+        conf.openai,
+        BACKEND="fake",
+        FAKE_LATENCY_MS=latency_ms,
+        FAKE_LATENCY_JITTER_MS=latency_jitter_ms,
+        FAKE_ERROR_RATE=0,
+    ), _overrides(conf.settings, PARSED_DOCUMENT_CACHE_MAX_ENTRIES=0), _overrides(
+        extraction_cache, directory=Path(cache_dir)
+    ):
+        model_registry.clear()  # create fake models with the overridden latency
+        try:
+            results = []
+            for corpus in corpora:
+                results.extend(await benchmark_corpus(corpus, stages, repeat))
+            return results
+        finally:
+            model_registry.clear()
+
+
+def load_baselines(path: Path = BASELINES_PATH) -> dict[str, dict[str, float]]:
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text())
+
+
+def save_baselines(results: Sequence[StageResult], path: Path = BASELINES_PATH):
+    baselines = load_baselines(path)
+    for result in results:
+        if result.error is None:
+            baselines[f"{result.corpus}/{result.stage}"] = {
+                "seconds": round(result.seconds, 6),
+                "peak_mb": round(result.peak_mb, 3),
+            }
+    path.write_text(json.dumps(baselines, indent=2, sort_keys=True) + "\n")
+
+
+def find_regressions(
+    results: Sequence[StageResult],
+    baselines: dict[str, dict[str, float]],
+    tolerance: float = 0.5,
+) -> list[str]:
+    """Describe the stages slower or larger than their baseline beyond tolerance."""
+    regressions = []
+    for result in results:
+        baseline = baselines.get(f"{result.corpus}/{result.stage}")
+        if result.error is not None:
+            regressions.append(f"{result.corpus}/{result.stage} failed: {result.error}")
+        elif baseline is not None:
+            for metric in ("seconds", "peak_mb"):
+                value, limit = getattr(result, metric), baseline[metric]
+                if limit > 0 and value > limit * (1 + tolerance):
+                    regressions.append(
+                        f"{result.corpus}/{result.stage} {metric}: "
+                        f"{value:.4f} > {limit:.4f} (+{tolerance:.0%})"
+                    )
+    return regressions
+
+
+def format_results(
+    results: Sequence[StageResult], baselines: dict[str, dict[str, float]]
+) -> str:
+    lines = [
+        f"{'corpus':<12} {'stage':<8} {'seconds':>10} {'vs base':>8} "
+        f"{'throughput':>22} {'peak MB':>9}"
+    ]
+    for result in results:
+        if result.error is not None:
+            lines.append(f"{result.corpus:<12} {result.stage:<8} {result.error}")
+            continue
+        baseline = baselines.get(f"{result.corpus}/{result.stage}")
+        ratio = (
+            f"{result.seconds / baseline['seconds']:.2f}x"
+            if baseline and baseline["seconds"]
+            else "-"
+        )
+        throughput = f"{result.throughput:,.1f} {result.unit}/s"
+        lines.append(
+            f"{result.corpus:<12} {result.stage:<8} {result.seconds:>10.4f} "
+            f"{ratio:>8} {throughput:>22} {result.peak_mb:>9.2f}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument(
+        "--corpus",
+        action="append",
+        choices=sorted(CORPORA),
+        help="Corpora to benchmark, all but the huge ones by default.",
+    )
+    parser.add_argument("--stage", action="append", choices=STAGES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--latency-ms", type=float, default=200, help="Mean fake model latency."
+    )
+    parser.add_argument("--latency-jitter-ms", type=float, default=50)
+    parser.add_argument("--tolerance", type=float, default=0.5)
+    parser.add_argument("--baselines", type=Path, default=BASELINES_PATH)
+    parser.add_argument(
+        "--save-baselines",
+        action="store_true",
+        help="Store the results as the baselines of their stages.",
+    )
+    parser.add_argument("--json", action="store_true", help="Print results as JSON.")
+    args = parser.parse_args(argv)
+
+    corpora = args.corpus or [name for name in CORPORA if not name.endswith("huge")]
+    stages = [stage for stage in STAGES if stage in (args.stage or STAGES)]
+    results = asyncio.run(
+        run_benchmarks(
+            corpora, stages, args.repeat, args.latency_ms, args.latency_jitter_ms
+        )
+    )
+    baselines = load_baselines(args.baselines)
+    if args.json:
+        print(
+            json.dumps(
+                [{**asdict(r), "throughput": r.throughput} for r in results], indent=2
+            )
+        )
+    else:
+        print(format_results(results, baselines))
+
+    if args.save_baselines:
+        save_baselines(results, args.baselines)
+        return 0
+    regressions = find_regressions(results, baselines, args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
@@ -0,0 +1,160 @@
+# Path: benchmarks/startup.py
+
+"""
+Time the imports of the API and the worker against a budget.
+
+Each entry point is imported in a fresh interpreter, so the timings include
+every dependency it pulls in. Dependencies only some requests need (the model
+provider SDK, vector stores, document parsers, PDF generation) are imported on
+first use, and importing one at startup fails the benchmark like exceeding the
+import-time budget does.
+"""
+import json
+import statistics
+import subprocess
+import sys
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Sequence
+
+BACKEND_DIR = Path(__file__).parent.parent
+
+# Entry point -> (module imported at startup, import-time budget in seconds)
+ENTRY_POINTS: dict[str, tuple[str, float]] = {
+    "api": ("app.main", 3.0),
+    "worker": ("app.worker", 3.0),
+}
+
+# Packages that must only be imported on first use
+LAZY_PACKAGES = (
+    "faiss",
+    "langchain_community",
+    "langchain_openai",
+    "openai",
+    "pdfminer",
+    "playwright",
+    "PyPDF2",
+    "reportlab",
+)
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(json.dumps({{"seconds": seconds, "modules": sorted(sys.modules)}}))
+"""
+
+
+@dataclass
+class StartupResult:
+    entry_point: str
+    module: str
+    seconds: float
+    budget: float
+    eager: list[str]
+    error: str | None = None
+
+    @property
+    def over_budget(self) -> bool:
+        return self.seconds > self.budget
+
+
+def measure_import(module: str) -> tuple[float, list[str]]:
+    """Import module in a fresh interpreter, returning the seconds it took and
+    the modules it imported."""
+    process = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(module=module)],
+        capture_output=True,
+        cwd=BACKEND_DIR,
+        text=True,
+    )
+    if process.returncode != 0:
+        raise RuntimeError(process.stderr.strip().splitlines()[-1])
+    # Settings may print to stdout while importing, the probe prints last
+    probe = json.loads(process.stdout.strip().splitlines()[-1])
+    return probe["seconds"], probe["modules"]
+
+
+def eager_packages(modules: Sequence[str]) -> list[str]:
+    """The lazy packages among imported modules."""
+    imported = {module.split(".")[0] for module in modules}
+    return [package for package in LAZY_PACKAGES if package in imported]
+
+
+def run_startup_benchmarks(
+    entry_points: Sequence[str], repeat: int = 3, budget: float | None = None
+) -> list[StartupResult]:
+    """Import entry points repeat times, reporting their median import time."""
+    results = []
+    for entry_point in entry_points:
+        module, default_budget = ENTRY_POINTS[entry_point]
+        limit = default_budget if budget is None else budget
+        try:
+            timings, eager = [], []
+            for _ in range(repeat):
+                seconds, modules = measure_import(module)
+                timings.append(seconds)
+                eager = eager_packages(modules)
+        except Exception as e:
+            results.append(StartupResult(entry_point, module, 0.0, limit, [], repr(e)))
+            continue
+        results.append(
+            StartupResult(entry_point, module, statistics.median(timings), limit, eager)
+        )
+    return results
+
+
+def find_violations(results: Sequence[StartupResult]) -> list[str]:
+    """Describe the entry points failing to import, over budget or eager."""
+    violations = []
+    for result in results:
+        if result.error is not None:
+            violations.append(f"{result.entry_point} failed: {result.error}")
+            continue
+        if result.over_budget:
+            violations.append(
+                f"{result.entry_point} imports in {result.seconds:.2f}s "
+                f"> {result.budget:.2f}s"
+            )
+        if result.eager:
+            violations.append(
+                f"{result.entry_point} imports {', '.join(result.eager)} at startup"
+            )
+    return violations
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--entry-point", action="append", choices=sorted(ENTRY_POINTS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--budget",
+        type=float,
+        help="Import-time budget in seconds, overriding the per entry point ones.",
+    )
+    parser.add_argument("--json", action="store_true", help="Print results as JSON.")
+    args = parser.parse_args(argv)
+
+    results = run_startup_benchmarks(
+        args.entry_point or list(ENTRY_POINTS), args.repeat, args.budget
+    )
+    if args.json:
+        print(json.dumps([asdict(r) for r in results], indent=2))
+    else:
+        print(f"{'entry point':<12} {'module':<12} {'seconds':>8} {'budget':>8}")
+        for r in results:
+            print(
+                f"{r.entry_point:<12} {r.module:<12} {r.seconds:>8.3f} {r.budget:>8.2f}"
+            )
+
+    violations = find_violations(results)
+    for violation in violations:
+        print(f"REGRESSION {violation}")
+    return 1 if violations else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
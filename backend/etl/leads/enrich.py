@@ -3,6 +3,7 @@ from pathlib import Path
 
 from app import schemas, utils
 from app.core import conf, openai
+from app.core.governor import estimate_tokens, governor
 from app.etl.base import Job
 from app.logging import console_log
 
@@ -42,11 +43,12 @@ async def enrich_lead(lead) -> Job:
     ]
 
     # Generate completion
-    completion = await openai.chat_completion(
-        model=conf.openai.COMPLETION_MODEL,
-        messages=messages,
-        stop=None,
-    )
+    async with governor.slot(estimate_tokens(messages)):
+        completion = await openai.chat_completion(
+            model=conf.openai.COMPLETION_MODEL,
+            messages=messages,
+            stop=None,
+        )
 
     try:
         completion_dict = json.loads(completion)